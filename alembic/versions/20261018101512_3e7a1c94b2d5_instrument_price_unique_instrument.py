@@ -0,0 +1,33 @@
+"""instrument price unique instrument
+
+Revision ID: 3e7a1c94b2d5
+Revises: 97127c8d3d1b
+Create Date: 2026-10-18 10:15:12.418203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3e7a1c94b2d5"
+down_revision: Union[str, None] = "97127c8d3d1b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        DELETE FROM instrument_price ip
+        USING instrument_price newer
+        WHERE ip.instrument_id = newer.instrument_id AND ip.id < newer.id
+        """
+    )
+    op.create_unique_constraint("instrument_price_instrument_id_key", "instrument_price", ["instrument_id"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("instrument_price_instrument_id_key", "instrument_price", type_="unique")
@@ -0,0 +1,61 @@
+"""secondary indexes
+
+Revision ID: 8d2f6b0a91c7
+Revises: 3e7a1c94b2d5
+Create Date: 2026-10-18 11:20:40.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8d2f6b0a91c7"
+down_revision: Union[str, None] = "3e7a1c94b2d5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# instrument_price.instrument_id is covered by its unique constraint.
+# The partial index predicate repeats SubscriptionAlchemyRepo conditions verbatim so the planner can match it.
+indexes = [
+    {
+        "index_name": "ix_subscription_instrument_id_price_triggerable",
+        "table_name": "subscription",
+        "columns": ["instrument_id", "price"],
+        "postgresql_where": sa.text("is_active IS true AND crossing_disabled IS false"),
+    },
+    {
+        "index_name": "ix_subscription_user_id_instrument_id",
+        "table_name": "subscription",
+        "columns": ["user_id", "instrument_id"],
+    },
+    {
+        "index_name": "ix_instrument_ticker",
+        "table_name": "instrument",
+        "columns": ["ticker"],
+    },
+    {
+        "index_name": "ix_user_username",
+        "table_name": "user",
+        "columns": ["username"],
+    },
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for index in indexes:
+            op.create_index(**index, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for index in indexes:
+            op.drop_index(
+                index["index_name"],
+                table_name=index["table_name"],
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
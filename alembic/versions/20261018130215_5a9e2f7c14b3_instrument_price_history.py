@@ -0,0 +1,73 @@
+"""instrument price history
+
+Revision ID: 5a9e2f7c14b3
+Revises: 8d2f6b0a91c7
+Create Date: 2026-10-18 13:02:15.331740
+
+"""
+import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5a9e2f7c14b3"
+down_revision: Union[str, None] = "8d2f6b0a91c7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Later partitions are created ahead of time by the maintain_price_history_partitions task.
+INITIAL_PARTITION_DAYS = 7
+
+candleresolutionenum = sa.Enum("MINUTE", "HOUR", name="candleresolutionenum")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "instrument_price_history",
+        sa.Column("instrument_id", sa.Integer(), nullable=False),
+        sa.Column("price", sa.Numeric(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    op.create_index(
+        "ix_instrument_price_history_instrument_id_created_at",
+        "instrument_price_history",
+        ["instrument_id", "created_at"],
+    )
+    op.create_index("ix_instrument_price_history_created_at", "instrument_price_history", ["created_at"])
+    today = datetime.datetime.now(tz=datetime.timezone.utc).date()
+    for i in range(INITIAL_PARTITION_DAYS):
+        day = today + datetime.timedelta(days=i)
+        op.execute(
+            f"CREATE TABLE IF NOT EXISTS instrument_price_history_p{day:%Y%m%d} "
+            f"PARTITION OF instrument_price_history "
+            f"FOR VALUES FROM ('{day} 00:00+00') TO ('{day + datetime.timedelta(days=1)} 00:00+00')"
+        )
+
+    op.create_table(
+        "instrument_price_candle",
+        sa.Column("instrument_id", sa.Integer(), nullable=False),
+        sa.Column("resolution", candleresolutionenum, nullable=False),
+        sa.Column("bucket", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("open", sa.Numeric(), nullable=False),
+        sa.Column("high", sa.Numeric(), nullable=False),
+        sa.Column("low", sa.Numeric(), nullable=False),
+        sa.Column("close", sa.Numeric(), nullable=False),
+        sa.PrimaryKeyConstraint("instrument_id", "resolution", "bucket"),
+    )
+    op.create_index(
+        "ix_instrument_price_candle_resolution_bucket",
+        "instrument_price_candle",
+        ["resolution", "bucket"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_instrument_price_candle_resolution_bucket", table_name="instrument_price_candle")
+    op.drop_table("instrument_price_candle")
+    candleresolutionenum.drop(op.get_bind())
+    # Dropping the partitioned table drops its partitions and their indexes.
+    op.drop_table("instrument_price_history")
@@ -0,0 +1,56 @@
+"""subscription unique active price
+
+Revision ID: e4c8a1f5d962
+Revises: b71d3e05c8a2
+Create Date: 2026-10-18 16:31:22.537914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e4c8a1f5d962"
+down_revision: Union[str, None] = "b71d3e05c8a2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Duplicate active subscriptions are deactivated rather than deleted, so they stay in the user's history.
+    op.execute(
+        """
+        UPDATE subscription s
+        SET is_active = false
+        FROM subscription older
+        WHERE s.user_id = older.user_id
+            AND s.instrument_id = older.instrument_id
+            AND s.price = older.price
+            AND s.is_active IS true
+            AND older.is_active IS true
+            AND s.id > older.id
+        """
+    )
+    # autocommit_block commits the update first; building CONCURRENTLY doesn't block writes to subscription.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ux_subscription_user_id_instrument_id_price_active",
+            "subscription",
+            ["user_id", "instrument_id", "price"],
+            unique=True,
+            postgresql_where=sa.text("is_active IS true"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ux_subscription_user_id_instrument_id_price_active",
+            table_name="subscription",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
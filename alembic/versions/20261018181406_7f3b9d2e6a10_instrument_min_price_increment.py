@@ -0,0 +1,26 @@
+"""instrument min price increment
+
+Revision ID: 7f3b9d2e6a10
+Revises: e4c8a1f5d962
+Create Date: 2026-10-18 18:14:06.284751
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7f3b9d2e6a10"
+down_revision: Union[str, None] = "e4c8a1f5d962"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("instrument", sa.Column("min_price_increment", sa.Numeric(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("instrument", "min_price_increment")
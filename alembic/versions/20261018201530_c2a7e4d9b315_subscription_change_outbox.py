@@ -0,0 +1,34 @@
+"""subscription change outbox
+
+Revision ID: c2a7e4d9b315
+Revises: 7f3b9d2e6a10
+Create Date: 2026-10-18 20:15:30.417209
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c2a7e4d9b315"
+down_revision: Union[str, None] = "7f3b9d2e6a10"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "subscription_change_outbox",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("instrument_id", sa.Integer(), nullable=True),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("subscription_change_outbox")
@@ -31,3 +31,20 @@ class CommandTypeEnum(str, enum.Enum):
 class LocaleEnum(str, enum.Enum):
     RU = "RU"
     EN = "EN"
+
+
+class PriceSourceEnum(str, enum.Enum):
+    POLLING = "POLLING"
+    STREAM = "STREAM"
+
+    @classmethod
+    def _missing_(cls, value: object) -> "PriceSourceEnum | None":
+        # PRICE_SOURCE=stream in the environment means the same as PRICE_SOURCE=STREAM.
+        if isinstance(value, str) and value.upper() != value:
+            return cls.__members__.get(value.upper())
+        return None
+
+
+class CandleResolutionEnum(str, enum.Enum):
+    MINUTE = "MINUTE"
+    HOUR = "HOUR"
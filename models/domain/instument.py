@@ -1,3 +1,5 @@
+import decimal
+
 from enums import InstrumentTypeEnum
 from models.domain.base import BaseDomain
 
@@ -8,3 +10,4 @@ class Instrument(BaseDomain):
     isin: str
     type: InstrumentTypeEnum
     precision: int
+    min_price_increment: decimal.Decimal | None = None
@@ -0,0 +1,6 @@
+from models.domain.base import BaseDomain
+
+
+class OutboxMessage(BaseDomain):
+    chat_id: int
+    message: str
@@ -0,0 +1,6 @@
+from models.domain.base import BaseDomain
+
+
+class OutboxSubscriptionChange(BaseDomain):
+    user_id: int
+    instrument_id: int | None
@@ -1,11 +1,18 @@
 from .instrument import InstrumentORM
 from .instrument_price import InstrumentPriceORM
+from .instrument_price_history import instrument_price_candle, instrument_price_history
+from .notification_outbox import NotificationOutboxORM
 from .subscription import SubscriptionORM
+from .subscription_change_outbox import SubscriptionChangeOutboxORM
 from .user import UserORM
 
 __all__ = (
     "InstrumentORM",
     "InstrumentPriceORM",
+    "NotificationOutboxORM",
+    "SubscriptionChangeOutboxORM",
     "SubscriptionORM",
     "UserORM",
+    "instrument_price_candle",
+    "instrument_price_history",
 )
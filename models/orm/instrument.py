@@ -1,4 +1,6 @@
-from sqlalchemy.orm import Mapped, relationship
+import decimal
+
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from enums import InstrumentTypeEnum
 from models.orm.base import BaseORM
@@ -7,11 +9,12 @@ from models.orm.base import BaseORM
 class InstrumentORM(BaseORM):
     __tablename__ = "instrument"
 
-    ticker: Mapped[str]
+    ticker: Mapped[str] = mapped_column(index=True)
     figi: Mapped[str]
     isin: Mapped[str]
     type: Mapped[InstrumentTypeEnum]
     precision: Mapped[int]
+    min_price_increment: Mapped[decimal.Decimal | None]
 
     subscriptions: Mapped["SubscriptionORM"] = relationship(back_populates="instrument")
     instrument_price = relationship("InstrumentPriceORM", back_populates="instrument")
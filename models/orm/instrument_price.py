@@ -9,7 +9,7 @@ from models.orm.base import BaseORM
 class InstrumentPriceORM(BaseORM):
     __tablename__ = "instrument_price"
 
-    instrument_id: Mapped[int] = mapped_column(ForeignKey("instrument.id"))
+    instrument_id: Mapped[int] = mapped_column(ForeignKey("instrument.id"), unique=True)
     instrument: Mapped["InstrumentORM"] = relationship(back_populates="instrument_price")
 
     price: Mapped[decimal.Decimal]
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, DateTime, Enum, Index, Integer, Numeric, PrimaryKeyConstraint, Table
+
+from enums import CandleResolutionEnum
+from models.orm.base import BaseORM
+
+# Plain tables rather than mapped classes: rows are only ever bulk loaded and aggregated,
+# and the partitioned history table has no primary key.
+instrument_price_history = Table(
+    "instrument_price_history",
+    BaseORM.metadata,
+    Column("instrument_id", Integer, nullable=False),
+    Column("price", Numeric, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Index("ix_instrument_price_history_instrument_id_created_at", "instrument_id", "created_at"),
+    Index("ix_instrument_price_history_created_at", "created_at"),
+    postgresql_partition_by="RANGE (created_at)",
+)
+
+instrument_price_candle = Table(
+    "instrument_price_candle",
+    BaseORM.metadata,
+    Column("instrument_id", Integer, nullable=False),
+    Column("resolution", Enum(CandleResolutionEnum), nullable=False),
+    Column("bucket", DateTime(timezone=True), nullable=False),
+    Column("open", Numeric, nullable=False),
+    Column("high", Numeric, nullable=False),
+    Column("low", Numeric, nullable=False),
+    Column("close", Numeric, nullable=False),
+    PrimaryKeyConstraint("instrument_id", "resolution", "bucket"),
+    Index("ix_instrument_price_candle_resolution_bucket", "resolution", "bucket"),
+)
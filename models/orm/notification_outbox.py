@@ -0,0 +1,22 @@
+import datetime
+
+from sqlalchemy import BigInteger, DateTime, Index, Text, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models.orm.base import BaseORM
+
+
+class NotificationOutboxORM(BaseORM):
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index("ix_notification_outbox_pending", "id", postgresql_where=text("delivered_at IS NULL")),
+        Index(
+            "ix_notification_outbox_delivered_at",
+            "delivered_at",
+            postgresql_where=text("delivered_at IS NOT NULL"),
+        ),
+    )
+
+    chat_id: Mapped[int] = mapped_column(BigInteger)
+    message: Mapped[str] = mapped_column(Text)
+    delivered_at: Mapped[datetime.datetime | None] = mapped_column(DateTime(timezone=True))
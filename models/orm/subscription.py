@@ -1,6 +1,6 @@
 import decimal
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from enums import SubscriptionTypeEnum
@@ -9,6 +9,23 @@ from models.orm.base import BaseORM
 
 class SubscriptionORM(BaseORM):
     __tablename__ = "subscription"
+    __table_args__ = (
+        Index(
+            "ix_subscription_instrument_id_price_triggerable",
+            "instrument_id",
+            "price",
+            postgresql_where=text("is_active IS true AND crossing_disabled IS false"),
+        ),
+        Index("ix_subscription_user_id_instrument_id", "user_id", "instrument_id"),
+        Index(
+            "ux_subscription_user_id_instrument_id_price_active",
+            "user_id",
+            "instrument_id",
+            "price",
+            unique=True,
+            postgresql_where=text("is_active IS true"),
+        ),
+    )
 
     user_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
     user: Mapped["UserORM"] = relationship(back_populates="subscriptions")
@@ -0,0 +1,10 @@
+from sqlalchemy.orm import Mapped
+
+from models.orm.base import BaseORM
+
+
+class SubscriptionChangeOutboxORM(BaseORM):
+    __tablename__ = "subscription_change_outbox"
+
+    user_id: Mapped[int]
+    instrument_id: Mapped[int | None]
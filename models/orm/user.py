@@ -9,7 +9,7 @@ class UserORM(BaseORM):
     __tablename__ = "user"
 
     chat_id: Mapped[int] = mapped_column(BigInteger, unique=True)
-    username: Mapped[str | None]
+    username: Mapped[str | None] = mapped_column(index=True)
     phone: Mapped[str | None]
 
     subscriptions: Mapped["SubscriptionORM"] = relationship(back_populates="user")
@@ -0,0 +1,99 @@
+"""
+Local stand-in for the Tinkoff MarketDataStream websocket gateway.
+
+Accepts subscribeLastPriceRequest messages and streams random-walk lastPrice updates for the
+subscribed FIGIs, so the streaming mode can be run and tested without a Tinkoff token:
+
+    python price_stream_stub.py --port 8081
+    TINKOFF_STREAM_URL=ws://localhost:8081/ws python streamer.py
+
+--drop-after closes every connection after the given number of seconds to exercise reconnects.
+"""
+import argparse
+import asyncio
+import datetime
+import decimal
+import random
+
+from aiohttp import WSMsgType, web
+
+
+def to_quotation(price: decimal.Decimal) -> dict[str, str | int]:
+    units = int(price)
+    return {"units": str(units), "nano": int((price - units) * 1_000_000_000)}
+
+
+async def stream_handler(request: web.Request) -> web.WebSocketResponse:
+    ws = web.WebSocketResponse(protocols=("json",))
+    await ws.prepare(request)
+    prices: dict[str, decimal.Decimal] = {}
+    interval: float = request.app["interval"]
+    drop_after: float | None = request.app["drop_after"]
+
+    async def publish() -> None:
+        while True:
+            await asyncio.sleep(interval)
+            for figi in random.sample(list(prices), k=max(1, len(prices) // 3)) if prices else []:
+                prices[figi] = max(decimal.Decimal("0.01"), prices[figi] + decimal.Decimal(random.randint(-50, 50)) / 100)
+                await ws.send_json(
+                    {
+                        "lastPrice": {
+                            "figi": figi,
+                            "price": to_quotation(prices[figi]),
+                            "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                        }
+                    }
+                )
+
+    async def drop() -> None:
+        await asyncio.sleep(drop_after)
+        await ws.close()
+
+    tasks = [asyncio.create_task(publish())]
+    if drop_after:
+        tasks.append(asyncio.create_task(drop()))
+    try:
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            request_data = msg.json().get("subscribeLastPriceRequest")
+            if request_data is None:
+                continue
+            figis = [row["instrumentId"] for row in request_data.get("instruments", [])]
+            if request_data["subscriptionAction"] == "SUBSCRIPTION_ACTION_SUBSCRIBE":
+                for figi in figis:
+                    prices.setdefault(figi, decimal.Decimal(random.randint(1000, 20000)) / 100)
+            else:
+                for figi in figis:
+                    prices.pop(figi, None)
+            await ws.send_json(
+                {
+                    "subscribeLastPriceResponse": {
+                        "lastPriceSubscriptions": [
+                            {"figi": figi, "subscriptionStatus": "SUBSCRIPTION_STATUS_SUCCESS"} for figi in figis
+                        ]
+                    }
+                }
+            )
+    finally:
+        for task in tasks:
+            task.cancel()
+    return ws
+
+
+def create_app(interval: float, drop_after: float | None = None) -> web.Application:
+    app = web.Application()
+    app["interval"] = interval
+    app["drop_after"] = drop_after
+    app.router.add_get("/ws", stream_handler)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--interval", type=float, default=0.2)
+    parser.add_argument("--drop-after", type=float, default=None)
+    args = parser.parse_args()
+    web.run_app(create_app(interval=args.interval, drop_after=args.drop_after), host=args.host, port=args.port)
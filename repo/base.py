@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 
 from models.orm.base import BaseORM
 from models.types import DomainModel
+from repo.cache import RepositoryCache, cached_lookup
 
 
 class GenericRepository(Generic[DomainModel], ABC):
@@ -24,14 +25,17 @@ class AlchemyGenericRepository(GenericRepository[DomainModel]):
         session: Session,
         domain_model: type[DomainModel],
         orm_model: type[BaseORM],
+        cache: RepositoryCache | None = None,
     ) -> None:
         self._session = session
         self._domain_model = domain_model
         self._orm_model = orm_model
+        self._cache = cache
 
     def _construct_get_stmt(self, id_: int) -> Select:
         return select(self._orm_model).where(self._orm_model.id == id_)
 
+    @cached_lookup
     def get_by_id(self, id_: int) -> DomainModel | None:
         stmt = self._construct_get_stmt(id_)
         result = self._session.execute(stmt).first()
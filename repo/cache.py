@@ -0,0 +1,175 @@
+import functools
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Iterable, TypeVar
+
+import redis
+from cachetools import TTLCache
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from services.metrics import Metrics, NullMetrics
+
+logger = logging.getLogger(__name__)
+
+WRITTEN_TABLES_KEY = "written_tables"
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class RepositoryCache:
+    """
+    Two-tier cache of repository lookups: a per-process TTL cache in front of an optional Redis one.
+
+    Entries are grouped by table, and invalidating a table drops all of its entries from the local tier
+    of this process and from Redis. The local tier of other processes keeps serving them for up to ttl
+    seconds, so ttl bounds how stale a read can be after a commit made elsewhere.
+    In Redis a table is one hash whose values carry their own expiry time.
+    Local hits cost no round trip, so they are counted in process and added to the metrics
+    at most once per metrics_flush_interval seconds.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 30,
+        maxsize: int = 10_000,
+        redis_client: redis.Redis | None = None,
+        redis_ttl: int = 3600,
+        key_prefix: str = "repo_cache",
+        metrics: Metrics | None = None,
+        metrics_flush_interval: float = 10,
+    ) -> None:
+        self._local: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._redis = redis_client
+        self._redis_ttl = redis_ttl
+        self._key_prefix = key_prefix
+        self._metrics = metrics or NullMetrics()
+        self._metrics_flush_interval = metrics_flush_interval
+        self._local_hits: dict[str, int] = defaultdict(int)
+        self._local_hits_flushed_at = time.monotonic()
+
+    def get(self, table: str, key: str) -> str | None:
+        with self._lock:
+            value = self._local.get((table, key))
+        if value is not None:
+            self._count_local_hit(table)
+            return value
+        if self._redis is not None:
+            value = self._redis_get(table, key)
+            if value is not None:
+                with self._lock:
+                    self._local[(table, key)] = value
+                self._metrics.inc("repo_cache_hits_total", labels={"table": table, "tier": "redis"})
+                return value
+        self._metrics.inc("repo_cache_misses_total", labels={"table": table})
+        return None
+
+    def set(self, table: str, key: str, value: str) -> None:
+        with self._lock:
+            self._local[(table, key)] = value
+        if self._redis is None:
+            return
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.hset(self._table_key(table), key, f"{time.time() + self._redis_ttl}\t{value}")
+            pipe.expire(self._table_key(table), self._redis_ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Repository cache write failed: {e!r}")
+
+    def invalidate(self, tables: Iterable[str]) -> None:
+        tables = set(tables)
+        if not tables:
+            return
+        with self._lock:
+            for cache_key in [cache_key for cache_key in self._local if cache_key[0] in tables]:
+                self._local.pop(cache_key, None)
+        if self._redis is not None:
+            try:
+                self._redis.delete(*(self._table_key(table) for table in tables))
+            except redis.RedisError as e:
+                logger.warning(f"Repository cache invalidation failed: {e!r}")
+        logger.debug(f"Repository cache invalidated: {sorted(tables)}.")
+
+    def _count_local_hit(self, table: str) -> None:
+        with self._lock:
+            self._local_hits[table] += 1
+            if time.monotonic() - self._local_hits_flushed_at < self._metrics_flush_interval:
+                return
+            hits, self._local_hits = self._local_hits, defaultdict(int)
+            self._local_hits_flushed_at = time.monotonic()
+        for hit_table, count in hits.items():
+            self._metrics.inc("repo_cache_hits_total", count, labels={"table": hit_table, "tier": "local"})
+
+    def _redis_get(self, table: str, key: str) -> str | None:
+        try:
+            raw = self._redis.hget(self._table_key(table), key)
+        except redis.RedisError as e:
+            logger.warning(f"Repository cache read failed: {e!r}")
+            return None
+        if raw is None:
+            return None
+        expires_at, value = raw.decode().split("\t", 1)
+        return value if float(expires_at) > time.time() else None
+
+    def _table_key(self, table: str) -> str:
+        return f"{self._key_prefix}:{table}"
+
+
+def cached_lookup(func: F) -> F:
+    """
+    Cache the positive results of an AlchemyGenericRepository lookup method in the repository's cache.
+
+    The method takes a single key argument and returns a domain model, None or a sequence of models;
+    None and empty sequences are not cached, so a row created later is found right away.
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, *args: Any, **kwargs: Any) -> Any:
+        cache: RepositoryCache | None = self._cache
+        if cache is None:
+            return func(self, *args, **kwargs)
+        (key,) = (*args, *kwargs.values())
+        table = self._orm_model.__tablename__
+        cache_key = f"{func.__name__}:{key}"
+        cached = cache.get(table, cache_key)
+        if cached is not None:
+            data = json.loads(cached)
+            models = [self._domain_model.model_validate(row) for row in data["rows"]]
+            return models if data["many"] else models[0]
+        result = func(self, *args, **kwargs)
+        if result:
+            many = not isinstance(result, self._domain_model)
+            rows = [model.model_dump(mode="json", by_alias=True) for model in (result if many else [result])]
+            cache.set(table, cache_key, json.dumps({"many": many, "rows": rows}))
+        return result
+
+    return wrapper  # type: ignore[return-value]
+
+
+def _record_orm_execute(orm_execute_state: ORMExecuteState) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            orm_execute_state.session.info.setdefault(WRITTEN_TABLES_KEY, set()).add(table.name)
+
+
+def _record_flush(session: Session, flush_context: Any, instances: Any) -> None:
+    written = session.info.setdefault(WRITTEN_TABLES_KEY, set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        written.add(obj.__tablename__)
+
+
+def track_written_tables(session: Session) -> None:
+    """Record in session.info the names of the tables the session writes to"""
+    if not event.contains(session, "do_orm_execute", _record_orm_execute):
+        event.listen(session, "do_orm_execute", _record_orm_execute)
+        event.listen(session, "before_flush", _record_flush)
+
+
+def pop_written_tables(session: Session) -> set[str]:
+    return session.info.pop(WRITTEN_TABLES_KEY, set())
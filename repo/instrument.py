@@ -1,12 +1,14 @@
 import abc
+import decimal
 
-from sqlalchemy import insert, select
+from sqlalchemy import Integer, Numeric, column, insert, select, update, values
 from sqlalchemy.orm import Session
 
 from enums import InstrumentTypeEnum
 from models.domain.instument import Instrument
 from models.orm.instrument import InstrumentORM
 from repo.base import AlchemyGenericRepository
+from repo.cache import RepositoryCache, cached_lookup
 
 
 class InstrumentRepo(abc.ABC):
@@ -22,18 +24,25 @@ class InstrumentRepo(abc.ABC):
         isin: str,
         type_: InstrumentTypeEnum,
         precision: int,
+        min_price_increment: decimal.Decimal | None = None,
     ) -> None:
         pass
 
     @abc.abstractmethod
-    def find_by(self) -> list[Instrument]:
+    def find_by(self, id_in: list[int] | None = None) -> list[Instrument]:
+        pass
+
+    @abc.abstractmethod
+    def update_min_price_increments(self, rows: list[tuple[int, decimal.Decimal, int]]) -> None:
+        """Set min price increment and precision from (instrument_id, min_price_increment, precision) rows"""
         pass
 
 
 class InstrumentAlchemyRepo(InstrumentRepo, AlchemyGenericRepository[Instrument]):
-    def __init__(self, session: Session) -> None:
-        super().__init__(session, Instrument, InstrumentORM)
+    def __init__(self, session: Session, cache: RepositoryCache | None = None) -> None:
+        super().__init__(session, Instrument, InstrumentORM, cache)
 
+    @cached_lookup
     def get_by_ticker(self, ticker: str) -> Instrument | None:
         stmt = select(InstrumentORM).where(InstrumentORM.ticker == ticker)
         orm_obj = self._session.execute(stmt).scalar_one_or_none()
@@ -46,6 +55,7 @@ class InstrumentAlchemyRepo(InstrumentRepo, AlchemyGenericRepository[Instrument]
         isin: str,
         type_: InstrumentTypeEnum,
         precision: int,
+        min_price_increment: decimal.Decimal | None = None,
     ) -> None:
         stmt = insert(self._orm_model).values(
             {
@@ -54,9 +64,29 @@ class InstrumentAlchemyRepo(InstrumentRepo, AlchemyGenericRepository[Instrument]
                 "isin": isin,
                 "type": type_,
                 "precision": precision,
+                "min_price_increment": min_price_increment,
             }
         )
         self._session.execute(stmt)
 
-    def find_by(self) -> list[Instrument]:
-        return [Instrument.model_validate(x) for x in self._session.query(InstrumentORM).all()]
+    def find_by(self, id_in: list[int] | None = None) -> list[Instrument]:
+        query = self._session.query(InstrumentORM)
+        if id_in is not None:
+            query = query.filter(InstrumentORM.id.in_(id_in))
+        return [Instrument.model_validate(x) for x in query.all()]
+
+    def update_min_price_increments(self, rows: list[tuple[int, decimal.Decimal, int]]) -> None:
+        if not rows:
+            return
+        increments = values(
+            column("instrument_id", Integer),
+            column("min_price_increment", Numeric),
+            column("precision", Integer),
+            name="increments",
+        ).data(rows)
+        self._session.execute(
+            update(InstrumentORM)
+            .where(InstrumentORM.id == increments.c.instrument_id)
+            .values(min_price_increment=increments.c.min_price_increment, precision=increments.c.precision),
+            execution_options={"synchronize_session": False},
+        )
@@ -1,7 +1,8 @@
 import abc
 import decimal
 
-from sqlalchemy import select
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
 from models.domain.instrument_price import InstrumentPrice
@@ -15,6 +16,11 @@ class InstrumentPriceRepo(abc.ABC):
         """Return old price"""
         pass
 
+    @abc.abstractmethod
+    def bulk_create_or_update(self, prices: dict[int, decimal.Decimal]) -> dict[int, decimal.Decimal | None]:
+        """Return old price for every instrument id"""
+        pass
+
     @abc.abstractmethod
     def get_by_instrument_id(self, instrument_id: int) -> InstrumentPrice | None:
         pass
@@ -39,6 +45,30 @@ class InstrumentPriceAlchemyRepo(InstrumentPriceRepo, AlchemyGenericRepository[I
         )
         return instrument_price.price
 
+    def bulk_create_or_update(self, prices: dict[int, decimal.Decimal]) -> dict[int, decimal.Decimal | None]:
+        if not prices:
+            return {}
+        old_prices = (
+            select(InstrumentPriceORM.instrument_id, InstrumentPriceORM.price)
+            .where(InstrumentPriceORM.instrument_id.in_(list(prices)))
+            .cte("old_prices")
+        )
+        stmt = insert(InstrumentPriceORM).values(
+            [{"instrument_id": instrument_id, "price": price} for instrument_id, price in prices.items()]
+        )
+        upserted = (
+            stmt.on_conflict_do_update(
+                index_elements=[InstrumentPriceORM.instrument_id],
+                set_={"price": stmt.excluded.price, "updated_at": func.now()},
+            )
+            .returning(InstrumentPriceORM.instrument_id)
+            .cte("upserted")
+        )
+        query = select(upserted.c.instrument_id, old_prices.c.price).outerjoin(
+            old_prices, old_prices.c.instrument_id == upserted.c.instrument_id
+        )
+        return {instrument_id: old_price for instrument_id, old_price in self._session.execute(query)}
+
     def get_by_instrument_id(self, instrument_id: int) -> InstrumentPrice | None:
         orm_obj = self._get_orm_obj_by_instrument_id(instrument_id=instrument_id)
         return InstrumentPrice.model_validate(orm_obj) if orm_obj else None
@@ -0,0 +1,138 @@
+import abc
+import datetime
+import decimal
+import io
+
+from sqlalchemy import Select, cast, func, literal, select, text
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlalchemy.orm import Session
+
+from enums import CandleResolutionEnum
+from models.orm.instrument_price_history import instrument_price_candle, instrument_price_history
+
+PARTITION_PREFIX = f"{instrument_price_history.name}_p"
+
+
+def history_partition_name(day: datetime.date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+class InstrumentPriceHistoryRepo(abc.ABC):
+    @abc.abstractmethod
+    def append(self, prices: dict[int, decimal.Decimal], created_at: datetime.datetime) -> None:
+        pass
+
+    @abc.abstractmethod
+    def rollup(self, resolution: CandleResolutionEnum, since: datetime.datetime) -> None:
+        """Recompute candles of the given resolution for every bucket starting at or after since"""
+        pass
+
+    @abc.abstractmethod
+    def create_partitions(self, start: datetime.date, days: int) -> None:
+        pass
+
+    @abc.abstractmethod
+    def drop_partitions_before(self, day: datetime.date) -> list[str]:
+        """Return names of the dropped partitions"""
+        pass
+
+
+class InstrumentPriceHistoryAlchemyRepo(InstrumentPriceHistoryRepo):
+    def __init__(self, session: Session) -> None:
+        self._session = session
+
+    def append(self, prices: dict[int, decimal.Decimal], created_at: datetime.datetime) -> None:
+        """Load the rows with a single COPY inside a savepoint, so a failure leaves the outer transaction usable"""
+        if not prices:
+            return
+        timestamp = created_at.isoformat()
+        buffer = io.StringIO(
+            "".join(f"{instrument_id}\t{price}\t{timestamp}\n" for instrument_id, price in prices.items())
+        )
+        with self._session.begin_nested():
+            cursor = self._session.connection().connection.cursor()
+            try:
+                cursor.copy_expert(
+                    f"COPY {instrument_price_history.name} (instrument_id, price, created_at) FROM STDIN",
+                    buffer,
+                )
+            finally:
+                cursor.close()
+
+    def rollup(self, resolution: CandleResolutionEnum, since: datetime.datetime) -> None:
+        if resolution == CandleResolutionEnum.MINUTE:
+            source = self._minute_candles_query(since)
+        else:
+            source = self._hour_candles_query(since)
+        stmt = insert(instrument_price_candle).from_select(
+            ["instrument_id", "resolution", "bucket", "open", "high", "low", "close"],
+            source,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["instrument_id", "resolution", "bucket"],
+            set_={name: stmt.excluded[name] for name in ("open", "high", "low", "close")},
+        )
+        self._session.execute(stmt)
+
+    @staticmethod
+    def _minute_candles_query(since: datetime.datetime) -> Select:
+        history = instrument_price_history.c
+        bucket = func.date_trunc("minute", history.created_at)
+        return (
+            select(
+                history.instrument_id,
+                cast(literal(CandleResolutionEnum.MINUTE), instrument_price_candle.c.resolution.type),
+                bucket,
+                func.array_agg(aggregate_order_by(history.price, history.created_at))[1],
+                func.max(history.price),
+                func.min(history.price),
+                func.array_agg(aggregate_order_by(history.price, history.created_at.desc()))[1],
+            )
+            .where(history.created_at >= since)
+            .group_by(history.instrument_id, bucket)
+        )
+
+    @staticmethod
+    def _hour_candles_query(since: datetime.datetime) -> Select:
+        candle = instrument_price_candle.c
+        bucket = func.date_trunc("hour", candle.bucket)
+        return (
+            select(
+                candle.instrument_id,
+                cast(literal(CandleResolutionEnum.HOUR), candle.resolution.type),
+                bucket,
+                func.array_agg(aggregate_order_by(candle.open, candle.bucket))[1],
+                func.max(candle.high),
+                func.min(candle.low),
+                func.array_agg(aggregate_order_by(candle.close, candle.bucket.desc()))[1],
+            )
+            .where(candle.resolution == CandleResolutionEnum.MINUTE, candle.bucket >= since)
+            .group_by(candle.instrument_id, bucket)
+        )
+
+    def create_partitions(self, start: datetime.date, days: int) -> None:
+        for i in range(days):
+            day = start + datetime.timedelta(days=i)
+            self._session.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {history_partition_name(day)} "
+                    f"PARTITION OF {instrument_price_history.name} "
+                    f"FOR VALUES FROM ('{day} 00:00+00') TO ('{day + datetime.timedelta(days=1)} 00:00+00')"
+                )
+            )
+
+    def drop_partitions_before(self, day: datetime.date) -> list[str]:
+        partitions = self._session.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE parent.relname = :parent"
+            ),
+            {"parent": instrument_price_history.name},
+        ).scalars()
+        oldest_kept = history_partition_name(day)
+        dropped = [name for name in partitions if name.startswith(PARTITION_PREFIX) and name < oldest_kept]
+        for name in dropped:
+            self._session.execute(text(f"DROP TABLE {name}"))
+        return dropped
@@ -0,0 +1,70 @@
+import abc
+import datetime
+from typing import Iterable
+
+from sqlalchemy import ARRAY, Integer, any_, delete, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from models.domain.notification_outbox import OutboxMessage
+from models.orm.notification_outbox import NotificationOutboxORM
+
+
+class NotificationOutboxRepo(abc.ABC):
+    @abc.abstractmethod
+    def add_many(self, messages: Iterable[tuple[int, str]]) -> None:
+        """Add (chat_id, message) pairs"""
+        pass
+
+    @abc.abstractmethod
+    def claim_pending(self, limit: int) -> list[OutboxMessage]:
+        """Lock up to limit undelivered messages, skipping ones locked by another transaction"""
+        pass
+
+    @abc.abstractmethod
+    def mark_delivered(self, ids: list[int]) -> None:
+        pass
+
+    @abc.abstractmethod
+    def delete_delivered_before(self, dt: datetime.datetime) -> int:
+        """Delete messages delivered before the timezone-aware dt"""
+        pass
+
+
+class NotificationOutboxAlchemyRepo(NotificationOutboxRepo):
+    def __init__(self, session: Session) -> None:
+        self._session = session
+
+    def add_many(self, messages: Iterable[tuple[int, str]]) -> None:
+        rows = [{"chat_id": chat_id, "message": message} for chat_id, message in messages]
+        if rows:
+            self._session.execute(insert(NotificationOutboxORM), rows)
+
+    def claim_pending(self, limit: int) -> list[OutboxMessage]:
+        stmt = (
+            select(NotificationOutboxORM.id, NotificationOutboxORM.chat_id, NotificationOutboxORM.message)
+            .where(NotificationOutboxORM.delivered_at.is_(None))
+            .order_by(NotificationOutboxORM.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        return [OutboxMessage.model_validate(row._mapping) for row in self._session.execute(stmt)]
+
+    def mark_delivered(self, ids: list[int]) -> None:
+        if not ids:
+            return
+        self._session.execute(
+            update(NotificationOutboxORM)
+            .where(NotificationOutboxORM.id == any_(literal(ids, ARRAY(Integer))))
+            .values(delivered_at=func.now()),
+            execution_options={"synchronize_session": False},
+        )
+
+    def delete_delivered_before(self, dt: datetime.datetime) -> int:
+        result = self._session.execute(
+            delete(NotificationOutboxORM).where(
+                NotificationOutboxORM.delivered_at.is_not(None),
+                NotificationOutboxORM.delivered_at < dt,
+            ),
+            execution_options={"synchronize_session": False},
+        )
+        return result.rowcount
@@ -2,14 +2,35 @@ import abc
 import decimal
 from typing import Any, Iterable
 
-from sqlalchemy import delete, select
+from sqlalchemy import (
+    ARRAY,
+    Integer,
+    Numeric,
+    and_,
+    any_,
+    cast,
+    column,
+    delete,
+    func,
+    literal,
+    select,
+    true,
+    tuple_,
+    values,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
 from sqlalchemy.orm import Session, joinedload
 
 from enums import SubscriptionTypeEnum
 from models.domain.subscription import Subscription
+from models.orm.instrument import InstrumentORM
 from models.orm.subscription import SubscriptionORM
+from models.orm.user import UserORM
 from repo.base import AlchemyGenericRepository
 
+# First key of the (class, user_id) transaction-level advisory locks on a user's subscriptions.
+USER_SUBSCRIPTIONS_LOCK = 1
+
 
 class SubscriptionRepo(abc.ABC):
     @abc.abstractmethod
@@ -24,9 +45,23 @@ class SubscriptionRepo(abc.ABC):
         price_lt: decimal.Decimal | None = None,
         crossing_disabled: bool | None = None,
         type_: SubscriptionTypeEnum | None = None,
+        user_id_in: Iterable[int] | None = None,
+        user_instrument_in: Iterable[tuple[int, int]] | None = None,
+        id_in: Iterable[int] | None = None,
     ) -> list[Subscription]:
         pass
 
+    @abc.abstractmethod
+    def find_triggered(
+        self,
+        price_ranges: Iterable[tuple[int, decimal.Decimal, decimal.Decimal]],
+    ) -> list[Subscription]:
+        """Active not crossing-disabled subscriptions with min_price <= price < max_price of their instrument.
+
+        price_ranges holds (instrument_id, min_price, max_price) rows.
+        """
+        pass
+
     @abc.abstractmethod
     def create(
         self,
@@ -38,6 +73,51 @@ class SubscriptionRepo(abc.ABC):
     ) -> None:
         pass
 
+    @abc.abstractmethod
+    def create_many(
+        self,
+        user_id: int,
+        instrument_id: int,
+        prices: Iterable[decimal.Decimal],
+        type_: SubscriptionTypeEnum,
+    ) -> list[decimal.Decimal]:
+        """Create active subscriptions for the prices the user has no active subscription for yet.
+
+        Returns the prices that were created.
+        """
+        pass
+
+    @abc.abstractmethod
+    def create_range(
+        self,
+        user_id: int,
+        instrument_id: int,
+        price_from: decimal.Decimal,
+        price_to: decimal.Decimal,
+        step: decimal.Decimal,
+        precision: int,
+        type_: SubscriptionTypeEnum,
+    ) -> tuple[int, list[decimal.Decimal]]:
+        """Create active subscriptions for the levels from price_from to price_to with step, rounded to precision,
+        that the user has no active subscription for yet.
+
+        Returns the number of distinct levels and the created prices.
+        """
+        pass
+
+    @abc.abstractmethod
+    def count_by(self, user_id: int | None = None, is_active: bool | None = None) -> int:
+        pass
+
+    @abc.abstractmethod
+    def lock_user(self, user_id: int) -> None:
+        """Wait for and hold the user's subscriptions lock until the end of the transaction.
+
+        Transactions that check a limit on the user's subscriptions before adding more take it first,
+        so two of them can't both pass the check.
+        """
+        pass
+
     @abc.abstractmethod
     def delete_by(
         self,
@@ -60,6 +140,8 @@ class SubscriptionRepo(abc.ABC):
         is_active: bool | None = None,
         crossing_disabled: bool | None = None,
         type_: SubscriptionTypeEnum | None = None,
+        id_in: Iterable[int] | None = None,
+        user_instrument_in: Iterable[tuple[int, int]] | None = None,
     ) -> int:
         pass
 
@@ -79,6 +161,9 @@ class SubscriptionAlchemyRepo(SubscriptionRepo, AlchemyGenericRepository[Subscri
         is_active: bool | None = None,
         crossing_disabled: bool | None = None,
         type_: SubscriptionTypeEnum | None = None,
+        user_id_in: Iterable[int] | None = None,
+        user_instrument_in: Iterable[tuple[int, int]] | None = None,
+        id_in: Iterable[int] | None = None,
     ) -> list[Subscription]:
         query = select(SubscriptionORM).options(
             joinedload(SubscriptionORM.instrument),
@@ -94,6 +179,9 @@ class SubscriptionAlchemyRepo(SubscriptionRepo, AlchemyGenericRepository[Subscri
             is_active=is_active,
             crossing_disabled=crossing_disabled,
             type_=type_,
+            user_id_in=user_id_in,
+            user_instrument_in=user_instrument_in,
+            id_in=id_in,
         )
         result = self._session.execute(query.where(*conditions)).scalars()
         return [
@@ -113,6 +201,48 @@ class SubscriptionAlchemyRepo(SubscriptionRepo, AlchemyGenericRepository[Subscri
             for r in result
         ]
 
+    def find_triggered(
+        self,
+        price_ranges: Iterable[tuple[int, decimal.Decimal, decimal.Decimal]],
+    ) -> list[Subscription]:
+        price_ranges = list(price_ranges)
+        if not price_ranges:
+            return []
+        moved = values(
+            column("instrument_id", Integer),
+            column("min_price", Numeric),
+            column("max_price", Numeric),
+            name="moved",
+        ).data(price_ranges)
+        query = (
+            select(
+                SubscriptionORM.id.label("id"),
+                SubscriptionORM.user_id,
+                UserORM.chat_id.label("user_chat_id"),
+                UserORM.locale.label("user_locale"),
+                SubscriptionORM.instrument_id,
+                InstrumentORM.ticker.label("instrument_ticker"),
+                InstrumentORM.precision.label("instrument_precision"),
+                SubscriptionORM.price,
+                SubscriptionORM.type,
+                SubscriptionORM.crossing_disabled,
+                SubscriptionORM.is_active,
+            )
+            .select_from(SubscriptionORM)
+            .join(
+                moved,
+                and_(
+                    SubscriptionORM.instrument_id == moved.c.instrument_id,
+                    SubscriptionORM.price >= moved.c.min_price,
+                    SubscriptionORM.price < moved.c.max_price,
+                ),
+            )
+            .join(UserORM, UserORM.id == SubscriptionORM.user_id)
+            .join(InstrumentORM, InstrumentORM.id == SubscriptionORM.instrument_id)
+            .where(SubscriptionORM.is_active.is_(True), SubscriptionORM.crossing_disabled.is_(False))
+        )
+        return [Subscription.model_validate(row._mapping) for row in self._session.execute(query)]
+
     def create(
         self,
         user_id: int,
@@ -130,6 +260,81 @@ class SubscriptionAlchemyRepo(SubscriptionRepo, AlchemyGenericRepository[Subscri
         )
         self._session.add(new_subscription)
 
+    def create_many(
+        self,
+        user_id: int,
+        instrument_id: int,
+        prices: Iterable[decimal.Decimal],
+        type_: SubscriptionTypeEnum,
+    ) -> list[decimal.Decimal]:
+        rows = [
+            {"user_id": user_id, "instrument_id": instrument_id, "price": price, "type": type_, "is_active": True}
+            for price in prices
+        ]
+        if not rows:
+            return []
+        stmt = (
+            insert(SubscriptionORM)
+            .values(rows)
+            .on_conflict_do_nothing(
+                index_elements=["user_id", "instrument_id", "price"],
+                index_where=SubscriptionORM.is_active.is_(True),
+            )
+            .returning(SubscriptionORM.price)
+        )
+        return list(self._session.execute(stmt).scalars())
+
+    def create_range(
+        self,
+        user_id: int,
+        instrument_id: int,
+        price_from: decimal.Decimal,
+        price_to: decimal.Decimal,
+        step: decimal.Decimal,
+        precision: int,
+        type_: SubscriptionTypeEnum,
+    ) -> tuple[int, list[decimal.Decimal]]:
+        series = func.generate_series(
+            literal(price_from, Numeric),
+            literal(price_to, Numeric),
+            literal(step, Numeric),
+        ).alias("level")
+        # round(numeric, int) rounds half away from zero, as round_price does for ADD.
+        levels = select(func.round(column("level", Numeric), precision).label("price")).select_from(series)
+        levels = levels.distinct().cte("levels")
+        created = (
+            insert(SubscriptionORM)
+            .from_select(
+                ["user_id", "instrument_id", "price", "type", "is_active"],
+                select(
+                    literal(user_id),
+                    literal(instrument_id),
+                    levels.c.price,
+                    cast(literal(type_), SubscriptionORM.type.type),
+                    true(),
+                ),
+            )
+            .on_conflict_do_nothing(
+                index_elements=["user_id", "instrument_id", "price"],
+                index_where=SubscriptionORM.is_active.is_(True),
+            )
+            .returning(SubscriptionORM.price)
+            .cte("created")
+        )
+        stmt = select(
+            select(func.count()).select_from(levels).scalar_subquery(),
+            select(func.array_agg(aggregate_order_by(created.c.price, created.c.price))).scalar_subquery(),
+        )
+        levels_count, prices = self._session.execute(stmt).one()
+        return levels_count, prices or []
+
+    def count_by(self, user_id: int | None = None, is_active: bool | None = None) -> int:
+        conditions = self._find_conditions(user_id=user_id, is_active=is_active)
+        return self._session.execute(select(func.count()).select_from(SubscriptionORM).where(*conditions)).scalar_one()
+
+    def lock_user(self, user_id: int) -> None:
+        self._session.execute(select(func.pg_advisory_xact_lock(USER_SUBSCRIPTIONS_LOCK, user_id)))
+
     def delete_by(
         self,
         user_id: int | None = None,
@@ -161,6 +366,8 @@ class SubscriptionAlchemyRepo(SubscriptionRepo, AlchemyGenericRepository[Subscri
         is_active: bool | None = None,
         crossing_disabled: bool | None = None,
         type_: SubscriptionTypeEnum | None = None,
+        id_in: Iterable[int] | None = None,
+        user_instrument_in: Iterable[tuple[int, int]] | None = None,
     ) -> int:
         conditions = self._find_conditions(
             id_=id_,
@@ -172,6 +379,8 @@ class SubscriptionAlchemyRepo(SubscriptionRepo, AlchemyGenericRepository[Subscri
             is_active=is_active,
             crossing_disabled=crossing_disabled,
             type_=type_,
+            id_in=id_in,
+            user_instrument_in=user_instrument_in,
         )
         qry = self._session.query(SubscriptionORM)
         if conditions:
@@ -189,6 +398,9 @@ class SubscriptionAlchemyRepo(SubscriptionRepo, AlchemyGenericRepository[Subscri
         is_active: bool | None = None,
         crossing_disabled: bool | None = None,
         type_: SubscriptionTypeEnum | None = None,
+        user_id_in: Iterable[int] | None = None,
+        user_instrument_in: Iterable[tuple[int, int]] | None = None,
+        id_in: Iterable[int] | None = None,
     ) -> list[bool]:
         conditions = []
         if id_ is not None:
@@ -209,4 +421,10 @@ class SubscriptionAlchemyRepo(SubscriptionRepo, AlchemyGenericRepository[Subscri
             conditions.append(SubscriptionORM.crossing_disabled.is_(crossing_disabled))
         if type_ is not None:
             conditions.append(SubscriptionORM.type == type_)
+        if id_in is not None:
+            conditions.append(SubscriptionORM.id == any_(literal(list(id_in), ARRAY(Integer))))
+        if user_id_in is not None:
+            conditions.append(SubscriptionORM.user_id.in_(user_id_in))
+        if user_instrument_in is not None:
+            conditions.append(tuple_(SubscriptionORM.user_id, SubscriptionORM.instrument_id).in_(user_instrument_in))
         return conditions
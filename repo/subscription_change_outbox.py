@@ -0,0 +1,57 @@
+import abc
+from typing import Iterable
+
+from sqlalchemy import ARRAY, Integer, any_, delete, insert, literal, select
+from sqlalchemy.orm import Session
+
+from models.domain.subscription_change_outbox import OutboxSubscriptionChange
+from models.orm.subscription_change_outbox import SubscriptionChangeOutboxORM
+
+
+class SubscriptionChangeOutboxRepo(abc.ABC):
+    @abc.abstractmethod
+    def add_many(self, changes: Iterable[tuple[int, int | None]]) -> None:
+        """Add (user_id, instrument_id) pairs"""
+        pass
+
+    @abc.abstractmethod
+    def claim_pending(self, limit: int) -> list[OutboxSubscriptionChange]:
+        """Lock up to limit changes, skipping ones locked by another transaction"""
+        pass
+
+    @abc.abstractmethod
+    def delete_many(self, ids: list[int]) -> None:
+        pass
+
+
+class SubscriptionChangeOutboxAlchemyRepo(SubscriptionChangeOutboxRepo):
+    def __init__(self, session: Session) -> None:
+        self._session = session
+
+    def add_many(self, changes: Iterable[tuple[int, int | None]]) -> None:
+        rows = [{"user_id": user_id, "instrument_id": instrument_id} for user_id, instrument_id in changes]
+        if rows:
+            self._session.execute(insert(SubscriptionChangeOutboxORM), rows)
+
+    def claim_pending(self, limit: int) -> list[OutboxSubscriptionChange]:
+        stmt = (
+            select(
+                SubscriptionChangeOutboxORM.id,
+                SubscriptionChangeOutboxORM.user_id,
+                SubscriptionChangeOutboxORM.instrument_id,
+            )
+            .order_by(SubscriptionChangeOutboxORM.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        return [OutboxSubscriptionChange.model_validate(row._mapping) for row in self._session.execute(stmt)]
+
+    def delete_many(self, ids: list[int]) -> None:
+        if not ids:
+            return
+        self._session.execute(
+            delete(SubscriptionChangeOutboxORM).where(
+                SubscriptionChangeOutboxORM.id == any_(literal(ids, ARRAY(Integer)))
+            ),
+            execution_options={"synchronize_session": False},
+        )
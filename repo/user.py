@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 from models.domain.user import User
 from models.orm.user import UserORM
 from repo.base import AlchemyGenericRepository, GenericRepository
+from repo.cache import RepositoryCache, cached_lookup
 
 
 class UserRepo(GenericRepository[User], abc.ABC):
@@ -24,13 +25,14 @@ class UserRepo(GenericRepository[User], abc.ABC):
 
 
 class UserAlchemyRepo(UserRepo, AlchemyGenericRepository[User]):
-    def __init__(self, session: Session) -> None:
-        super().__init__(session, User, UserORM)
+    def __init__(self, session: Session, cache: RepositoryCache | None = None) -> None:
+        super().__init__(session, User, UserORM, cache)
 
     def create(self, chat_id: int, username: str | None, phone: str | None) -> None:
         stmt = insert(self._orm_model).values({"chat_id": chat_id, "username": username, "phone": phone})
         self._session.execute(stmt)
 
+    @cached_lookup
     def find_by_chat_id(self, chat_id: int) -> Sequence[User]:
         stmt = select(UserORM).where(UserORM.chat_id == chat_id)
         return [User.model_validate(x) for x in self._session.execute(stmt).scalars().all()]
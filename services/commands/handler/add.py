@@ -6,6 +6,8 @@ from pydantic import BaseModel
 from repo.subscription import SubscriptionRepo
 from services.commands.dto import CommandAddData
 from services.instrument import InstrumentService
+from services.price import round_price
+from services.subscription_changes import SubscriptionChange, SubscriptionChangesPublisher
 from services.uow import UoW
 
 
@@ -13,6 +15,8 @@ class AddCommandResult(BaseModel):
     added: list[decimal.Decimal]
     errors: list[decimal.Decimal]
     precision: int
+    # Set when the command was rejected because the user would exceed it.
+    subscriptions_limit: int | None = None
 
 
 class AddCommandHandler(abc.ABC):
@@ -22,36 +26,63 @@ class AddCommandHandler(abc.ABC):
 
 
 class DefaultAddCommandHandler(AddCommandHandler):
+    """
+    A command is rejected if the user's active subscriptions together with the requested prices
+    would exceed max_subscriptions; the check and the insert run under the user's subscriptions lock.
+    """
+
     def __init__(
         self,
         instrument_svc: InstrumentService,
         uow: UoW,
         subscription_repo: SubscriptionRepo,
+        changes_publisher: SubscriptionChangesPublisher,
+        max_subscriptions: int | None = None,
     ) -> None:
         self._instrument_svc = instrument_svc
         self._subscription_repo = subscription_repo
         self._uow = uow
+        self._changes_publisher = changes_publisher
+        self._max_subscriptions = max_subscriptions
 
     def handle(self, user_id: int, data: CommandAddData) -> AddCommandResult:
-        added, errors = [], []
         instrument = self._instrument_svc.get_or_create_by_ticker(data.ticker)
-        for price in data.prices:
-            rouded_price: decimal.Decimal = round(price, instrument.precision)  # noqa
-            if not self._subscription_repo.find_by(
-                user_id=user_id,
-                instrument_id=instrument.identity,
-                price=rouded_price,
-                is_active=True,
-            ):
-                self._subscription_repo.create(
-                    user_id=user_id,
-                    instrument_id=instrument.identity,
-                    price=rouded_price,
-                    type_=data.type,
-                    is_active=True,
+        prices: list[decimal.Decimal] = [round_price(price, instrument.precision) for price in data.prices]
+        if self._max_subscriptions is not None:
+            self._subscription_repo.lock_user(user_id)
+            active = self._subscription_repo.count_by(user_id=user_id, is_active=True)
+            if active + len(set(prices)) > self._max_subscriptions:
+                self._uow.rollback()
+                return AddCommandResult(
+                    added=[],
+                    errors=[],
+                    precision=instrument.precision,
+                    subscriptions_limit=self._max_subscriptions,
                 )
-                added.append(rouded_price)
-            else:
-                errors.append(rouded_price)
+        created = self._subscription_repo.create_many(
+            user_id=user_id,
+            instrument_id=instrument.identity,
+            prices=dict.fromkeys(prices),
+            type_=data.type,
+        )
+        added, errors = split_created(prices, created)
+        if added:
+            self._changes_publisher.publish([SubscriptionChange(user_id=user_id, instrument_id=instrument.identity)])
         self._uow.commit()
         return AddCommandResult(added=added, errors=errors, precision=instrument.precision)
+
+
+def split_created(
+    prices: list[decimal.Decimal],
+    created: list[decimal.Decimal],
+) -> tuple[list[decimal.Decimal], list[decimal.Decimal]]:
+    """Split prices into created ones and the rest, keeping their order; a repeated price is created only once"""
+    pending = set(created)
+    added, errors = [], []
+    for price in prices:
+        if price in pending:
+            added.append(price)
+            pending.discard(price)
+        else:
+            errors.append(price)
+    return added, errors
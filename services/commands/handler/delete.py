@@ -5,6 +5,7 @@ from pydantic import BaseModel
 from repo.subscription import SubscriptionRepo
 from services.commands.dto import CommandDeleteData
 from services.instrument import InstrumentService
+from services.subscription_changes import SubscriptionChange, SubscriptionChangesPublisher
 from services.uow import UoW
 
 
@@ -24,10 +25,12 @@ class DefaultDeleteCommandHandler(DeleteCommandHandler):
         instrument_svc: InstrumentService,
         uow: UoW,
         subscription_repo: SubscriptionRepo,
+        changes_publisher: SubscriptionChangesPublisher,
     ) -> None:
         self._instrument_svc = instrument_svc
         self._subscription_repo = subscription_repo
         self._uow = uow
+        self._changes_publisher = changes_publisher
 
     def handle(self, user_id: int, data: CommandDeleteData) -> DeleteCommandResult:
         instrument = self._instrument_svc.get_or_create_by_ticker(data.ticker)
@@ -35,5 +38,7 @@ class DefaultDeleteCommandHandler(DeleteCommandHandler):
         if not data.is_all:
             kwargs["price_in"] = data.prices
         deleted_rows = self._subscription_repo.delete_by(**kwargs)
+        if deleted_rows:
+            self._changes_publisher.publish([SubscriptionChange(user_id=user_id, instrument_id=instrument.identity)])
         self._uow.commit()
         return DeleteCommandResult(deleted_count=deleted_rows)
@@ -4,6 +4,7 @@ from pydantic import BaseModel
 
 from repo.subscription import SubscriptionRepo
 from services.commands.dto import CommandDeleteAllData
+from services.subscription_changes import SubscriptionChange, SubscriptionChangesPublisher
 from services.uow import UoW
 
 
@@ -22,11 +23,15 @@ class DefaultDeleteAllCommandHandler(DeleteAllCommandHandler):
         self,
         uow: UoW,
         subscription_repo: SubscriptionRepo,
+        changes_publisher: SubscriptionChangesPublisher,
     ) -> None:
         self._subscription_repo = subscription_repo
         self._uow = uow
+        self._changes_publisher = changes_publisher
 
     def handle(self, user_id: int, data: CommandDeleteAllData) -> DeleteCommandResult:
         deleted_rows = self._subscription_repo.delete_by(user_id=user_id)
+        if deleted_rows:
+            self._changes_publisher.publish([SubscriptionChange(user_id=user_id)])
         self._uow.commit()
         return DeleteCommandResult(deleted_count=deleted_rows)
@@ -1,4 +1,5 @@
 import abc
+import datetime
 import decimal
 
 from pydantic import BaseModel
@@ -6,6 +7,9 @@ from pydantic import BaseModel
 from repo.instrument import InstrumentRepo
 from repo.instrument_price import InstrumentPriceRepo
 from services.commands.dto import CommandPriceData
+from services.price import PriceService
+from services.price_cache import CachedPrice, HotPriceCache
+from services.watched_instruments import WatchedInstruments
 
 
 class PriceCommandResult(BaseModel):
@@ -24,21 +28,70 @@ class PriceCommandHandler(abc.ABC):
 
 
 class DefaultPriceCommandHandler(PriceCommandHandler):
+    """
+    Serves prices from the hot price cache, falling back to the database.
+
+    With watched_instruments set, every request keeps its instrument polled for a while. Prices of
+    instruments the last tick didn't poll may be arbitrarily old, so they are fetched from price_service.
+    Only such live prices are written to the cache: a stored price has no time of its own to cache it with.
+    """
+
     def __init__(
         self,
         instrument_repo: InstrumentRepo,
         instrument_price_repo: InstrumentPriceRepo,
+        price_cache: HotPriceCache | None = None,
+        watched_instruments: WatchedInstruments | None = None,
+        price_service: PriceService | None = None,
     ) -> None:
         self._instrument_repo = instrument_repo
         self._instrument_price_repo = instrument_price_repo
+        self._price_cache = price_cache
+        self._watched_instruments = watched_instruments
+        self._price_service = price_service
 
     def handle(self, user_id: int, data: CommandPriceData) -> PriceCommandResult:
+        # watch() refreshes the instrument's polling, so it is called once per request and its answer reused.
+        polled = None
+        cached = self._price_cache.get(data.ticker) if self._price_cache is not None else None
+        if cached is not None:
+            polled = self._watch(cached.instrument_id)
+            if polled:
+                return PriceCommandResult(ticker=cached.ticker, price=cached.price, precision=cached.precision)
+
         instrument = self._instrument_repo.get_by_ticker(data.ticker)
         if instrument is None:
             raise self.InstrumentNotFoundError
-        instrument_price = self._instrument_price_repo.get_by_instrument_id(instrument_id=instrument.identity)
+        if polled is None:
+            polled = self._watch(instrument.identity)
+        price = None
+        if self._price_service is not None and not polled:
+            prices = self._price_service.get_prices([instrument])
+            price = prices[0].new_price if prices else None
+        if price is not None and self._price_cache is not None:
+            self._price_cache.set_many(
+                [
+                    CachedPrice(
+                        instrument_id=instrument.identity,
+                        ticker=instrument.ticker,
+                        price=price,
+                        precision=instrument.precision,
+                        updated_at=datetime.datetime.now(tz=datetime.timezone.utc),
+                    )
+                ]
+            )
+        if price is None:
+            instrument_price = self._instrument_price_repo.get_by_instrument_id(instrument_id=instrument.identity)
+            if instrument_price is None:
+                raise self.InstrumentNotFoundError
+            price = instrument_price.price
         return PriceCommandResult(
-            ticker=instrument_price.instrument.ticker,
-            price=instrument_price.price,
+            ticker=instrument.ticker,
+            price=price,
             precision=instrument.precision,
         )
+
+    def _watch(self, instrument_id: int) -> bool:
+        if self._watched_instruments is None:
+            return True
+        return self._watched_instruments.watch(instrument_id)
@@ -1,19 +1,21 @@
 import abc
 import decimal
-from typing import Generator
 
 from pydantic import BaseModel
 
 from repo.subscription import SubscriptionRepo
 from services.commands.dto import CommandStepData
 from services.instrument import InstrumentService
+from services.subscription_changes import SubscriptionChange, SubscriptionChangesPublisher
 from services.uow import UoW
 
 
 class StepCommandResult(BaseModel):
     added: list[decimal.Decimal]
-    errors: list[decimal.Decimal]
+    existing_count: int
     precision: int
+    # Set when the command was rejected because the user would exceed it.
+    subscriptions_limit: int | None = None
 
 
 class StepCommandHandler(abc.ABC):
@@ -23,46 +25,60 @@ class StepCommandHandler(abc.ABC):
 
 
 class DefaultStepCommandHandler(StepCommandHandler):
+    """
+    Levels are generated and inserted by the database in one statement.
+    A command is rejected before any level is generated if the user's active subscriptions
+    together with the requested levels would exceed max_subscriptions; the check and the insert
+    run under the user's subscriptions lock.
+    """
+
     def __init__(
         self,
         instrument_svc: InstrumentService,
         uow: UoW,
         subscription_repo: SubscriptionRepo,
+        changes_publisher: SubscriptionChangesPublisher,
+        max_subscriptions: int | None = None,
     ) -> None:
         self._instrument_svc = instrument_svc
         self._subscription_repo = subscription_repo
         self._uow = uow
+        self._changes_publisher = changes_publisher
+        self._max_subscriptions = max_subscriptions
 
     def handle(self, user_id: int, data: CommandStepData) -> StepCommandResult:
-        added, errors = [], []
         instrument = self._instrument_svc.get_or_create_by_ticker(data.ticker)
-        for price in self._generate_prices(from_=data.price_from, to=data.price_to, step=data.step):
-            price: decimal.Decimal = round(price, instrument.precision)  # noqa
-            if not self._subscription_repo.find_by(
-                user_id=user_id,
-                instrument_id=instrument.identity,
-                price=price,
-                is_active=True,
-            ):
-                self._subscription_repo.create(
-                    user_id=user_id,
-                    instrument_id=instrument.identity,
-                    price=price,
-                    type_=data.type,
-                    is_active=True,
+        levels = self._count_levels(from_=data.price_from, to=data.price_to, step=data.step)
+        if not levels:
+            return StepCommandResult(added=[], existing_count=0, precision=instrument.precision)
+        if self._max_subscriptions is not None:
+            self._subscription_repo.lock_user(user_id)
+            active = self._subscription_repo.count_by(user_id=user_id, is_active=True)
+            if active + levels > self._max_subscriptions:
+                self._uow.rollback()
+                return StepCommandResult(
+                    added=[],
+                    existing_count=0,
+                    precision=instrument.precision,
+                    subscriptions_limit=self._max_subscriptions,
                 )
-                added.append(price)
-            else:
-                errors.append(price)
-
+        levels, added = self._subscription_repo.create_range(
+            user_id=user_id,
+            instrument_id=instrument.identity,
+            price_from=data.price_from,
+            price_to=data.price_to,
+            step=data.step,
+            precision=instrument.precision,
+            type_=data.type,
+        )
+        if added:
+            self._changes_publisher.publish([SubscriptionChange(user_id=user_id, instrument_id=instrument.identity)])
         self._uow.commit()
-        return StepCommandResult(added=added, errors=errors, precision=instrument.precision)
+        return StepCommandResult(added=added, existing_count=levels - len(added), precision=instrument.precision)
 
-    @classmethod
-    def _generate_prices(
-        cls, from_: decimal.Decimal, to: decimal.Decimal, step: decimal.Decimal
-    ) -> Generator[decimal.Decimal, None, None]:
-        current_price = from_
-        while current_price <= to:
-            yield current_price
-            current_price += step
+    @staticmethod
+    def _count_levels(from_: decimal.Decimal, to: decimal.Decimal, step: decimal.Decimal) -> int:
+        """Number of levels before rounding; rounding to the instrument precision can only merge them"""
+        if step <= 0 or from_ > to:
+            return 0
+        return int((to - from_) // step) + 1
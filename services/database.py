@@ -1,9 +1,70 @@
+import os
+import threading
 from typing import Any
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine
 from sqlalchemy.orm import sessionmaker
 
+_lock = threading.Lock()
+_engines: dict[str, Engine] = {}
+_session_factories: dict[str, sessionmaker[Any]] = {}
 
-def session_factory(database_url: str) -> sessionmaker[Any]:
-    engine = create_engine(database_url)
-    return sessionmaker(bind=engine)
+
+def get_engine(
+    database_url: str,
+    pool_size: int = 5,
+    max_overflow: int = 10,
+    pool_pre_ping: bool = True,
+    pool_recycle: int = 1800,
+) -> Engine:
+    """
+    Return the process-wide engine for database_url, creating it on first use.
+
+    Pool options are only applied when the engine is created; later calls with the same URL
+    get the existing engine and its pool.
+    """
+    engine = _engines.get(database_url)
+    if engine is not None:
+        return engine
+    with _lock:
+        if database_url not in _engines:
+            _engines[database_url] = create_engine(
+                database_url,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_pre_ping=pool_pre_ping,
+                pool_recycle=pool_recycle,
+            )
+        return _engines[database_url]
+
+
+def session_factory(database_url: str, **pool_options: Any) -> sessionmaker[Any]:
+    factory = _session_factories.get(database_url)
+    if factory is None:
+        engine = get_engine(database_url, **pool_options)
+        with _lock:
+            factory = _session_factories.setdefault(database_url, sessionmaker(bind=engine))
+    return factory
+
+
+def pool_stats() -> dict[str, dict[str, int]]:
+    result = {}
+    for engine in list(_engines.values()):
+        pool = engine.pool
+        result[engine.url.render_as_string(hide_password=True)] = {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        }
+    return result
+
+
+def _reset_pools_after_fork() -> None:
+    # Connections inherited from the parent (e.g. a Celery prefork master) must not be shared;
+    # close=False drops them from the child's pool without closing the parent's sockets.
+    for engine in list(_engines.values()):
+        engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
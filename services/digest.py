@@ -0,0 +1,204 @@
+import abc
+import contextlib
+import logging
+import time
+import uuid
+from collections import defaultdict
+from typing import ContextManager, Iterator
+
+import redis
+
+from services.subscriptions import SubscriptionMessage
+
+logger = logging.getLogger(__name__)
+
+MESSAGES_SEPARATOR = "\n\n"
+
+# KEYS: due zset, messages hash. ARGV: due at, then chat_id, encoded messages pairs.
+# Appends the messages to the chat's field and starts the chat's window if it isn't running.
+ADD_SCRIPT = """
+for i = 2, #ARGV, 2 do
+    local buffered = redis.call('HGET', KEYS[2], ARGV[i]) or ''
+    redis.call('HSET', KEYS[2], ARGV[i], buffered .. ARGV[i + 1])
+    redis.call('ZADD', KEYS[1], 'NX', ARGV[1], ARGV[i])
+end
+"""
+
+# Shared by the scripts below, whose KEYS are: due zset, messages hash, leased hash, lease expiry zset.
+# A leased field is "<lease token>:<chat_id>". Restoring it puts its messages back in front of the chat's
+# newer ones and makes the chat due at due_at unless it is due earlier.
+RESTORE_LEASED = """
+local function restore(field, due_at)
+    local leased = redis.call('HGET', KEYS[3], field)
+    if leased then
+        local chat_id = string.match(field, ':(.*)$')
+        redis.call('HSET', KEYS[2], chat_id, leased .. (redis.call('HGET', KEYS[2], chat_id) or ''))
+        local score = redis.call('ZSCORE', KEYS[1], chat_id)
+        if not score or tonumber(score) > tonumber(due_at) then
+            redis.call('ZADD', KEYS[1], due_at, chat_id)
+        end
+        redis.call('HDEL', KEYS[3], field)
+    end
+    redis.call('ZREM', KEYS[4], field)
+end
+"""
+
+# ARGV: now, max chats, lease token, lease expires at.
+# Restores expired leases, then moves the due chats' messages under the lease and returns them
+# as a flat [chat_id, encoded messages, ...] list.
+POP_DUE_SCRIPT = (
+    RESTORE_LEASED
+    + """
+for _, field in ipairs(redis.call('ZRANGEBYSCORE', KEYS[4], '-inf', ARGV[1])) do
+    restore(field, ARGV[1])
+end
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local result = {}
+for _, chat_id in ipairs(due) do
+    local messages = redis.call('HGET', KEYS[2], chat_id) or ''
+    local field = ARGV[3] .. ':' .. chat_id
+    redis.call('HSET', KEYS[3], field, (redis.call('HGET', KEYS[3], field) or '') .. messages)
+    redis.call('ZADD', KEYS[4], ARGV[4], field)
+    redis.call('HDEL', KEYS[2], chat_id)
+    redis.call('ZREM', KEYS[1], chat_id)
+    table.insert(result, chat_id)
+    table.insert(result, messages)
+end
+return result
+"""
+)
+
+# ARGV: now, then the leased fields to put back.
+RELEASE_SCRIPT = (
+    RESTORE_LEASED
+    + """
+for i = 2, #ARGV do
+    restore(ARGV[i], ARGV[1])
+end
+"""
+)
+
+
+def encode_messages(messages: list[str]) -> bytes:
+    """Encode messages as length-prefixed strings, so encoded lists can be concatenated"""
+    encoded = [message.encode() for message in messages]
+    return b"".join(b"%d:%s" % (len(message), message) for message in encoded)
+
+
+def decode_messages(raw: bytes) -> list[str]:
+    messages = []
+    pos = 0
+    while pos < len(raw):
+        colon = raw.index(b":", pos)
+        end = colon + 1 + int(raw[pos:colon])
+        messages.append(raw[colon + 1 : end].decode())
+        pos = end
+    return messages
+
+
+def pack_messages(messages: list[str], max_length: int) -> list[str]:
+    """Join messages into as few texts as possible, splitting only between messages."""
+    packed: list[str] = []
+    current = ""
+    for message in messages:
+        candidate = current + MESSAGES_SEPARATOR + message if current else message
+        if current and len(candidate) > max_length:
+            packed.append(current)
+            current = message
+        else:
+            current = candidate
+    if current:
+        packed.append(current)
+    return packed
+
+
+class AlertDigestBuffer(abc.ABC):
+    @abc.abstractmethod
+    def add(self, messages: list[SubscriptionMessage]) -> None:
+        pass
+
+    @abc.abstractmethod
+    def pop_due(self) -> ContextManager[list[SubscriptionMessage]]:
+        """
+        Yield packed messages of every chat whose window has elapsed. They are removed from the buffer
+        when the block exits normally and put back if it raises.
+        """
+        pass
+
+
+class RedisAlertDigestBuffer(AlertDigestBuffer):
+    """
+    Buffers alerts per chat in Redis. A chat's window starts with its first buffered alert,
+    so alerts from several ticks that fall into the window are delivered together.
+    All chats share one hash of buffered messages, so the scripts declare every key they touch.
+
+    Popped messages are leased rather than deleted until the caller has published them. A lease the caller
+    neither confirms nor releases, e.g. because its process died, is put back by a pop after lease_timeout seconds.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        window: float,
+        max_message_length: int,
+        max_chats_per_pop: int = 10_000,
+        lease_timeout: float = 300,
+        key_prefix: str = "digest",
+    ) -> None:
+        self._redis = redis_client
+        self._window = window
+        self._max_message_length = max_message_length
+        self._max_chats_per_pop = max_chats_per_pop
+        self._lease_timeout = lease_timeout
+        self._due_key = f"{key_prefix}:due"
+        self._messages_key = f"{key_prefix}:messages"
+        self._leased_key = f"{key_prefix}:leased"
+        self._leases_key = f"{key_prefix}:leases"
+        self._add_script = redis_client.register_script(ADD_SCRIPT)
+        self._pop_due_script = redis_client.register_script(POP_DUE_SCRIPT)
+        self._release_script = redis_client.register_script(RELEASE_SCRIPT)
+
+    def add(self, messages: list[SubscriptionMessage]) -> None:
+        if not messages:
+            return
+        by_chat: dict[int, list[str]] = defaultdict(list)
+        for msg in messages:
+            by_chat[msg.user_chat_id].append(msg.message)
+        args: list[float | int | bytes] = [time.time() + self._window]
+        for chat_id, texts in by_chat.items():
+            args += [chat_id, encode_messages(texts)]
+        self._add_script(keys=[self._due_key, self._messages_key], args=args)
+
+    @contextlib.contextmanager
+    def pop_due(self) -> Iterator[list[SubscriptionMessage]]:
+        token = uuid.uuid4().hex
+        keys = [self._due_key, self._messages_key, self._leased_key, self._leases_key]
+        fields: list[str] = []
+        result = []
+        while True:
+            now = time.time()
+            popped = self._pop_due_script(
+                keys=keys,
+                args=[now, self._max_chats_per_pop, token, now + self._lease_timeout],
+            )
+            for chat_id, encoded in zip(popped[::2], popped[1::2]):
+                fields.append(f"{token}:{int(chat_id)}")
+                result += [
+                    SubscriptionMessage(user_chat_id=int(chat_id), message=text)
+                    for text in pack_messages(decode_messages(encoded), self._max_message_length)
+                ]
+            if len(popped) // 2 < self._max_chats_per_pop:
+                break
+        logger.debug(f"Popped {len(result)} digest messages.")
+        try:
+            yield result
+        except BaseException:
+            if fields:
+                self._release_script(keys=keys, args=[time.time(), *fields])
+                logger.warning(f"Put {len(result)} digest messages back into the buffer.")
+            raise
+        if fields:
+            pipe = self._redis.pipeline()
+            pipe.hdel(self._leased_key, *fields)
+            pipe.zrem(self._leases_key, *fields)
+            pipe.execute()
@@ -55,6 +55,7 @@ class DefaultInstrumentService(InstrumentService):
                     isin=obj.isin,
                     type_=obj.type,
                     precision=obj.precision,
+                    min_price_increment=obj.min_price_increment,
                 )
                 self._uow.commit()
                 return self._instrument_repo.get_by_ticker(ticker)
@@ -1,11 +1,42 @@
 import abc
-import datetime
+import decimal
+import logging
+import time
+from typing import Iterable
 
+import redis
 import requests
-from cachetools.func import ttl_cache
+from pydantic import ValidationError
 
 from enums import InstrumentTypeEnum
 from models.domain.instument import Instrument
+from services.metrics import Metrics, NullMetrics
+from services.price import quotation_to_decimal
+
+logger = logging.getLogger(__name__)
+
+NOT_FOUND = b""
+# For instruments without a known min price increment.
+DEFAULT_PRECISION = 2
+
+# KEYS: entries hash, written at zset. ARGV: ticker, entry, now, max entries, oldest written at to keep.
+# Stores the entry and evicts expired and then the oldest entries beyond max entries.
+SET_ENTRY_SCRIPT = """
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('ZADD', KEYS[2], tonumber(ARGV[3]), ARGV[1])
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', '(' .. ARGV[5])
+for _, ticker in ipairs(expired) do
+    redis.call('HDEL', KEYS[1], ticker)
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', '(' .. ARGV[5])
+local excess = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[4])
+if excess > 0 then
+    local evicted = redis.call('ZPOPMIN', KEYS[2], excess)
+    for i = 1, #evicted, 2 do
+        redis.call('HDEL', KEYS[1], evicted[i])
+    end
+end
+"""
 
 
 class InstrumentNotFoundError(Exception):
@@ -17,13 +48,33 @@ class InstrumentFinderService(abc.ABC):
     def find_instrument_info(self, ticker: str) -> Instrument:
         pass
 
+    @abc.abstractmethod
+    def find_min_price_increments(self, figis: Iterable[str]) -> dict[str, decimal.Decimal]:
+        """Min price increments of the instruments with the given FIGIs, unknown FIGIs are left out"""
+        pass
+
+
+def precision_from_increment(min_price_increment: decimal.Decimal | None) -> int:
+    """Number of decimal places of the price increment, e.g. 2 for 0.01 and 0 for 10"""
+    if not min_price_increment:
+        return DEFAULT_PRECISION
+    return max(0, -min_price_increment.normalize().as_tuple().exponent)
+
 
 class TinkoffInstrumentFinderService(InstrumentFinderService):
     """
     Implementation of the InstrumentFinderService that retrieves instrument information from the Tinkoff API.
 
+    Precision comes from the instrument's min price increment, requested with GetInstrumentBy for the FIGI
+    that FindInstrument returned. Bulk lookups read the catalogs of all instruments of a type (Shares, Bonds, ...)
+    instead, one request per catalog, kept for catalog_ttl seconds. A failed catalog request is not repeated
+    for catalog_retry_interval seconds.
+
     Args:
         token (str): The authentication token used to access the Tinkoff API.
+        catalog_ttl (float): Seconds a loaded instruments catalog is used before it is requested again.
+        catalog_retry_interval (float): Seconds to wait after a failed catalog request before the next one.
+        timeout (float): Timeout of a single API request in seconds.
 
     Attributes:
         _headers (dict): The headers containing the authentication token.
@@ -31,12 +82,22 @@ class TinkoffInstrumentFinderService(InstrumentFinderService):
 
     """
 
-    CONST_CANDLE_INTERVAL = "CANDLE_INTERVAL_4_HOUR"
-    CANDLE_PRICE_NAMES = ("open", "high", "low", "close")
+    CATALOG_METHODS = {
+        InstrumentTypeEnum.SHARE: "Shares",
+        InstrumentTypeEnum.BOND: "Bonds",
+        InstrumentTypeEnum.FUTURES: "Futures",
+        InstrumentTypeEnum.CURRENCY: "Currencies",
+        InstrumentTypeEnum.ETF: "Etfs",
+    }
 
-    def __init__(self, token: str):
+    def __init__(self, token: str, catalog_ttl: float = 86400, catalog_retry_interval: float = 60, timeout: float = 30):
         self._headers = {"Authorization": f"Bearer {token}"}
         self._base_url = "https://invest-public-api.tinkoff.ru/rest/"
+        self._catalog_ttl = catalog_ttl
+        self._catalog_retry_interval = catalog_retry_interval
+        self._timeout = timeout
+        # Type -> (monotonic time of the next request of the catalog, the last loaded catalog).
+        self._catalogs: dict[InstrumentTypeEnum, tuple[float, dict[str, decimal.Decimal]]] = {}
 
     def find_instrument_info(self, ticker: str) -> Instrument:
         data = requests.post(
@@ -47,6 +108,7 @@ class TinkoffInstrumentFinderService(InstrumentFinderService):
                 "instrumentKind": "INSTRUMENT_TYPE_UNSPECIFIED",
                 "apiTradeAvailableFlag": True,
             },
+            timeout=self._timeout,
         ).json()
 
         instruments = data["instruments"]
@@ -55,40 +117,154 @@ class TinkoffInstrumentFinderService(InstrumentFinderService):
 
         for row in instruments:
             if row["ticker"].upper() == ticker:
+                min_price_increment = self._get_min_price_increment(row["figi"])
                 return Instrument(
                     ticker=ticker,
                     figi=row["figi"],
                     isin=row["isin"],
                     type=InstrumentTypeEnum(row["instrumentType"].upper()),
-                    precision=self._get_precision(row["uid"]),
+                    precision=precision_from_increment(min_price_increment),
+                    min_price_increment=min_price_increment,
                 )
         raise InstrumentNotFoundError
 
-    def _get_precision(self, tinkoff_uid: str) -> int:
-        today_str, week_ago_str = self._get_dates()
-        data = requests.post(
-            url=self._base_url + "tinkoff.public.invest.api.contract.v1.MarketDataService/GetCandles",
-            headers=self._headers,
-            json={
-                "instrumentId": tinkoff_uid,
-                "interval": self.CONST_CANDLE_INTERVAL,
-                "from": week_ago_str,
-                "to": today_str,
-            },
-        ).json()
-        max_precision = 0
-        for candle in data["candles"]:
-            for price_name in self.CANDLE_PRICE_NAMES:
-                price = candle.get(price_name, {}).get("nano", 0)
-                price_transformed = price / 1e9
-                precision = len(str(price_transformed).split(".")[1])
-                max_precision = max(max_precision, precision)
-        return max_precision
-
-    @ttl_cache(ttl=600)
-    def _get_dates(self) -> tuple[str, str]:
-        now = datetime.datetime.now(datetime.timezone.utc)
-        now_str = now.strftime("%Y-%m-%dT00:00:00Z")
-        week_ago = now - datetime.timedelta(weeks=1)
-        week_ago_str = week_ago.strftime("%Y-%m-%dT00:00:00Z")
-        return now_str, week_ago_str
+    def find_min_price_increments(self, figis: Iterable[str]) -> dict[str, decimal.Decimal]:
+        missing = set(figis)
+        result = {}
+        for type_ in self.CATALOG_METHODS:
+            if not missing:
+                break
+            catalog = self._get_catalog(type_)
+            for figi in missing & catalog.keys():
+                result[figi] = catalog[figi]
+            missing -= result.keys()
+        return result
+
+    def _get_catalog(self, type_: InstrumentTypeEnum) -> dict[str, decimal.Decimal]:
+        next_request_at, catalog = self._catalogs.get(type_, (None, {}))
+        if next_request_at is not None and time.monotonic() < next_request_at:
+            return catalog
+        method = self.CATALOG_METHODS[type_]
+        try:
+            data = requests.post(
+                self._base_url + f"tinkoff.public.invest.api.contract.v1.InstrumentsService/{method}",
+                headers=self._headers,
+                json={"instrumentStatus": "INSTRUMENT_STATUS_ALL"},
+                timeout=self._timeout,
+            ).json()
+            catalog = {
+                row["figi"]: increment
+                for row in data["instruments"]
+                if (increment := quotation_to_decimal(row.get("minPriceIncrement", {})))
+            }
+        except (requests.RequestException, ValueError, KeyError) as e:
+            logger.warning(f"Instruments catalog {type_} request failed: {e!r}")
+            self._catalogs[type_] = (time.monotonic() + self._catalog_retry_interval, catalog)
+            return catalog
+        self._catalogs[type_] = (time.monotonic() + self._catalog_ttl, catalog)
+        logger.info(f"Loaded {len(catalog)} instruments of the {type_} catalog.")
+        return catalog
+
+    def _get_min_price_increment(self, figi: str) -> decimal.Decimal | None:
+        try:
+            data = requests.post(
+                self._base_url + "tinkoff.public.invest.api.contract.v1.InstrumentsService/GetInstrumentBy",
+                headers=self._headers,
+                json={"idType": "INSTRUMENT_ID_TYPE_FIGI", "id": figi},
+                timeout=self._timeout,
+            ).json()
+            return quotation_to_decimal(data["instrument"].get("minPriceIncrement", {})) or None
+        except (requests.RequestException, ValueError, KeyError) as e:
+            logger.warning(f"Instrument {figi} request failed: {e!r}")
+            return None
+
+
+class CachedInstrumentFinderService(InstrumentFinderService):
+    """
+    Caches the results of another finder in Redis, shared by all processes.
+
+    Found instruments are kept for hit_ttl seconds and "not found" answers for miss_ttl seconds,
+    so mistyped tickers don't reach the API on every command. Other errors are not cached.
+    At most max_entries tickers are kept, the oldest ones are evicted first.
+    Entries live in one hash whose values carry their own expiry time, so the script declares every key it touches.
+    """
+
+    def __init__(
+        self,
+        finder: InstrumentFinderService,
+        redis_client: redis.Redis,
+        hit_ttl: int = 86400,
+        miss_ttl: int = 600,
+        max_entries: int = 50_000,
+        key_prefix: str = "instrument_finder",
+        metrics: Metrics | None = None,
+    ) -> None:
+        self._finder = finder
+        self._redis = redis_client
+        self._hit_ttl = hit_ttl
+        self._miss_ttl = miss_ttl
+        self._max_entries = max_entries
+        self._entries_key = f"{key_prefix}:entries"
+        self._written_at_key = f"{key_prefix}:written_at"
+        self._metrics = metrics or NullMetrics()
+        self._set_entry_script = redis_client.register_script(SET_ENTRY_SCRIPT)
+
+    def find_instrument_info(self, ticker: str) -> Instrument:
+        cached = self._get(ticker)
+        if cached == NOT_FOUND:
+            self._metrics.inc("instrument_finder_cache_total", labels={"result": "negative_hit"})
+            raise InstrumentNotFoundError
+        if cached is not None:
+            try:
+                instrument = Instrument.model_validate_json(cached)
+            except ValidationError:
+                logger.warning(f"Invalid cached instrument for {ticker}")
+            else:
+                self._metrics.inc("instrument_finder_cache_total", labels={"result": "hit"})
+                return instrument
+        self._metrics.inc("instrument_finder_cache_total", labels={"result": "miss"})
+        try:
+            instrument = self._finder.find_instrument_info(ticker)
+        except InstrumentNotFoundError:
+            self._set(ticker, NOT_FOUND, self._miss_ttl)
+            raise
+        self._set(ticker, instrument.model_dump_json().encode(), self._hit_ttl)
+        return instrument
+
+    def find_min_price_increments(self, figis: Iterable[str]) -> dict[str, decimal.Decimal]:
+        return self._finder.find_min_price_increments(figis)
+
+    def invalidate(self, tickers: Iterable[str]) -> None:
+        """Drop cached answers for the tickers, e.g. after their precision changed"""
+        tickers = list(tickers)
+        if not tickers:
+            return
+        try:
+            pipe = self._redis.pipeline()
+            pipe.hdel(self._entries_key, *tickers)
+            pipe.zrem(self._written_at_key, *tickers)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Instrument finder cache invalidation failed: {e!r}")
+
+    def _get(self, ticker: str) -> bytes | None:
+        try:
+            raw = self._redis.hget(self._entries_key, ticker)
+        except redis.RedisError as e:
+            logger.warning(f"Instrument finder cache read failed: {e!r}")
+            return None
+        if raw is None:
+            return None
+        expires_at, value = raw.split(b"\t", 1)
+        return value if float(expires_at) > time.time() else None
+
+    def _set(self, ticker: str, value: bytes, ttl: int) -> None:
+        now = time.time()
+        entry = f"{now + ttl}\t".encode() + value
+        try:
+            self._set_entry_script(
+                keys=[self._entries_key, self._written_at_key],
+                args=[ticker, entry, now, self._max_entries, now - max(self._hit_ttl, self._miss_ttl)],
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Instrument finder cache write failed: {e!r}")
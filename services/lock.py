@@ -0,0 +1,59 @@
+import contextlib
+import uuid
+from typing import Iterator
+
+import redis
+
+# KEYS: lock key. ARGV: owner token. Deletes the lock only if it is still held by the caller.
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# KEYS: lock key. ARGV: owner token, timeout in ms. Prolongs the lock only if it is still held by the caller.
+EXTEND_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class RedisLock:
+    """
+    Non-blocking lock shared by all processes through Redis.
+
+    The lock expires after timeout seconds, so a killed holder can't keep it forever; release only
+    deletes the key while it still holds the owner's token, never a lock taken over after expiry.
+    """
+
+    def __init__(self, redis_client: redis.Redis, key: str, timeout: float) -> None:
+        self._redis = redis_client
+        self._key = key
+        self._timeout_ms = int(timeout * 1000)
+        self._release_script = redis_client.register_script(RELEASE_SCRIPT)
+        self._extend_script = redis_client.register_script(EXTEND_SCRIPT)
+
+    def acquire(self) -> str | None:
+        """Return the owner token if the lock was acquired, None if it is held by someone else"""
+        token = uuid.uuid4().hex
+        return token if self._redis.set(self._key, token, nx=True, px=self._timeout_ms) else None
+
+    def extend(self, token: str) -> bool:
+        """Restart the lock's timeout; return False if the lock is no longer held with token"""
+        return bool(self._extend_script(keys=[self._key], args=[token, self._timeout_ms]))
+
+    def release(self, token: str) -> None:
+        self._release_script(keys=[self._key], args=[token])
+
+    @contextlib.contextmanager
+    def hold(self) -> Iterator[bool]:
+        """Yield whether the lock was acquired; release it on exit if it was"""
+        token = self.acquire()
+        try:
+            yield token is not None
+        finally:
+            if token is not None:
+                self.release(token)
@@ -15,6 +15,8 @@ L = TypeVar("L", bound=LocaleEnum)
 class LocaleMessageBuilder(abc.ABC, Generic[L]):
     UP_SYMBOL = "⬆️"
     DOWN_SYMBOL = "⬇️"
+    # Longer lists of added STEP levels are summarized by their count and bounds.
+    MAX_LISTED_PRICES = 20
 
     @abc.abstractmethod
     def welcome_new_user_msg(self) -> str:
@@ -45,7 +47,11 @@ class LocaleMessageBuilder(abc.ABC, Generic[L]):
         pass
 
     @abc.abstractmethod
-    def add_cmd_msg(self, data: AddCommandResult | StepCommandResult) -> str:
+    def add_cmd_msg(self, data: AddCommandResult) -> str:
+        pass
+
+    @abc.abstractmethod
+    def step_cmd_msg(self, data: StepCommandResult) -> str:
         pass
 
     @abc.abstractmethod
@@ -124,6 +130,8 @@ class RuLocaleMessageBuilder(LocaleMessageBuilder[LocaleEnum.RU]):
         )
 
     def add_cmd_msg(self, data: AddCommandResult) -> str:
+        if data.subscriptions_limit is not None:
+            return f"Ошибка: можно иметь не больше {data.subscriptions_limit} активных подписок"
         result = []
         if data.added:
             result.append(
@@ -137,6 +145,25 @@ class RuLocaleMessageBuilder(LocaleMessageBuilder[LocaleEnum.RU]):
             )
         return "\n".join(result)
 
+    def step_cmd_msg(self, data: StepCommandResult) -> str:
+        if data.subscriptions_limit is not None:
+            return f"Ошибка: можно иметь не больше {data.subscriptions_limit} активных подписок"
+        result = []
+        if len(data.added) > self.MAX_LISTED_PRICES:
+            result.append(
+                f"Успешно добавлено {len(data.added)} уровней "
+                f"от {self.format_price(data.added[0], data.precision)} "
+                f"до {self.format_price(data.added[-1], data.precision)}"
+            )
+        elif data.added:
+            result.append(
+                f"Успешно добавлено: "
+                f"{', '.join(self.format_price(price=p, precision=data.precision) for p in data.added)}"
+            )
+        if data.existing_count:
+            result.append(f"Ошибка (уже существовали): {data.existing_count} уровней")
+        return "\n".join(result) or "Ошибка: в диапазоне нет ни одного уровня"
+
     def sub_msg(
         self,
         instrument_ticker: str,
@@ -212,6 +239,8 @@ get command help
         )
 
     def add_cmd_msg(self, data: AddCommandResult) -> str:
+        if data.subscriptions_limit is not None:
+            return f"ERROR: no more than {data.subscriptions_limit} active subscriptions are allowed"
         result = []
         if data.added:
             result.append(f"OK: {', '.join(self.format_price(price=p, precision=data.precision) for p in data.added)}")
@@ -221,6 +250,22 @@ get command help
             )
         return "\n".join(result)
 
+    def step_cmd_msg(self, data: StepCommandResult) -> str:
+        if data.subscriptions_limit is not None:
+            return f"ERROR: no more than {data.subscriptions_limit} active subscriptions are allowed"
+        result = []
+        if len(data.added) > self.MAX_LISTED_PRICES:
+            result.append(
+                f"OK: {len(data.added)} levels "
+                f"from {self.format_price(data.added[0], data.precision)} "
+                f"to {self.format_price(data.added[-1], data.precision)}"
+            )
+        elif data.added:
+            result.append(f"OK: {', '.join(self.format_price(price=p, precision=data.precision) for p in data.added)}")
+        if data.existing_count:
+            result.append(f"ERROR: {data.existing_count} levels already existed")
+        return "\n".join(result) or "ERROR: the range has no levels"
+
     def sub_msg(
         self,
         instrument_ticker: str,
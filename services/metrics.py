@@ -0,0 +1,167 @@
+import abc
+import contextlib
+import logging
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Iterator
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+TICK_STAGE_SECONDS = "price_tick_stage_seconds"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 45)
+
+
+def format_sample(name: str, labels: dict[str, str] | None = None) -> str:
+    if not labels:
+        return name
+    label_values = ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return f"{name}{{{label_values}}}"
+
+
+class Metrics(abc.ABC):
+    @abc.abstractmethod
+    def inc(self, name: str, value: float = 1, labels: dict[str, str] | None = None) -> None:
+        pass
+
+    @abc.abstractmethod
+    def set_gauge(self, name: str, value: float, labels: dict[str, str] | None = None) -> None:
+        pass
+
+    @abc.abstractmethod
+    def observe(self, name: str, value: float, labels: dict[str, str] | None = None) -> None:
+        pass
+
+    @abc.abstractmethod
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format"""
+        pass
+
+    @contextlib.contextmanager
+    def timer(self, name: str, labels: dict[str, str] | None = None) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, labels)
+
+
+class NullMetrics(Metrics):
+    def inc(self, name: str, value: float = 1, labels: dict[str, str] | None = None) -> None:
+        pass
+
+    def set_gauge(self, name: str, value: float, labels: dict[str, str] | None = None) -> None:
+        pass
+
+    def observe(self, name: str, value: float, labels: dict[str, str] | None = None) -> None:
+        pass
+
+    def render(self) -> str:
+        return ""
+
+
+class RedisMetrics(Metrics):
+    """
+    Counters, gauges and histograms kept in Redis hashes, so the samples of every worker process
+    add up and any process (the worker's metrics server, the web app) can render them.
+
+    Hash fields are "<metric name>\\t<sample>", the metric name being what the TYPE line needs.
+    Metric failures are logged and never raised into the measured code.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        key_prefix: str = "metrics",
+    ) -> None:
+        self._redis = redis_client
+        self._buckets = buckets
+        self._keys = {kind: f"{key_prefix}:{kind}" for kind in ("counter", "gauge", "histogram")}
+
+    def inc(self, name: str, value: float = 1, labels: dict[str, str] | None = None) -> None:
+        self._execute(lambda pipe: pipe.hincrbyfloat(self._keys["counter"], self._field(name, name, labels), value))
+
+    def set_gauge(self, name: str, value: float, labels: dict[str, str] | None = None) -> None:
+        self._execute(lambda pipe: pipe.hset(self._keys["gauge"], self._field(name, name, labels), value))
+
+    def observe(self, name: str, value: float, labels: dict[str, str] | None = None) -> None:
+        key = self._keys["histogram"]
+
+        def write(pipe: redis.client.Pipeline) -> None:
+            for bucket in [*(str(bucket) for bucket in self._buckets if value <= bucket), "+Inf"]:
+                pipe.hincrbyfloat(key, self._field(name, f"{name}_bucket", {**(labels or {}), "le": bucket}), 1)
+            pipe.hincrbyfloat(key, self._field(name, f"{name}_sum", labels), value)
+            pipe.hincrbyfloat(key, self._field(name, f"{name}_count", labels), 1)
+
+        self._execute(write)
+
+    def render(self) -> str:
+        pipe = self._redis.pipeline(transaction=False)
+        for key in self._keys.values():
+            pipe.hgetall(key)
+        lines = []
+        for kind, values in zip(self._keys, pipe.execute()):
+            samples: dict[str, list[str]] = defaultdict(list)
+            for field, value in values.items():
+                name, sample = field.decode().split("\t", 1)
+                samples[name].append(f"{sample} {float(value)}")
+            for name in sorted(samples):
+                lines.append(f"# TYPE {name} {kind}")
+                lines += sorted(samples[name], key=self._sort_key)
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _sort_key(line: str) -> tuple[str, float]:
+        # Histogram buckets in ascending order of their numeric upper bound.
+        sample = line.rsplit(" ", 1)[0]
+        before, le, rest = sample.partition('le="')
+        if not le:
+            return sample, 0.0
+        bound, _, after = rest.partition('"')
+        return before + after, float("inf") if bound == "+Inf" else float(bound)
+
+    @staticmethod
+    def _field(name: str, sample: str, labels: dict[str, str] | None) -> str:
+        return f"{name}\t{format_sample(sample, labels)}"
+
+    def _execute(self, write: Callable[[redis.client.Pipeline], Any]) -> None:
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            write(pipe)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Metrics write failed: {e!r}")
+
+
+def start_metrics_server(metrics: Metrics, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve metrics.render() on /metrics from a daemon thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            try:
+                body = metrics.render().encode()
+            except redis.RedisError as e:
+                logger.warning(f"Metrics render failed: {e!r}")
+                self.send_error(503, "Metrics are unavailable")
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:  # noqa: A002
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Metrics server listening on {host}:{port}.")
+    return server
@@ -0,0 +1,92 @@
+import logging
+
+from repo.notification_outbox import NotificationOutboxRepo
+from repo.subscription_change_outbox import SubscriptionChangeOutboxRepo
+from services.digest import AlertDigestBuffer
+from services.subscription_changes import SubscriptionChange, SubscriptionChangesPublisher
+from services.subscriptions import SubscriptionMessage
+from services.uow import UoW
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxRelay:
+    """
+    Moves committed alerts from the notification outbox into the digest buffer in batches.
+
+    Rows are claimed with FOR UPDATE SKIP LOCKED, so several relays can drain the outbox at once,
+    and marked delivered in the transaction that claimed them. Delivery is at least once: a relay
+    that dies after buffering a batch but before committing leaves it to be buffered again.
+    From then on the digest buffer holds the messages until their send tasks are published.
+    """
+
+    def __init__(
+        self,
+        uow: UoW,
+        outbox_repo: NotificationOutboxRepo,
+        digest_buffer: AlertDigestBuffer,
+        batch_size: int = 1000,
+    ) -> None:
+        self._uow = uow
+        self._outbox_repo = outbox_repo
+        self._digest_buffer = digest_buffer
+        self._batch_size = batch_size
+
+    def relay(self) -> int:
+        """Drain the outbox and return the number of relayed messages"""
+        total = 0
+        while True:
+            pending = self._outbox_repo.claim_pending(limit=self._batch_size)
+            if not pending:
+                break
+            self._digest_buffer.add(
+                [SubscriptionMessage(user_chat_id=msg.chat_id, message=msg.message) for msg in pending]
+            )
+            self._outbox_repo.mark_delivered([msg.identity for msg in pending])
+            self._uow.commit()
+            total += len(pending)
+            if len(pending) < self._batch_size:
+                break
+        if total:
+            logger.info(f"Relayed {total} outbox messages.")
+        return total
+
+
+class SubscriptionChangesRelay:
+    """
+    Moves committed subscription changes from their outbox to the changes stream in batches.
+
+    Claimed rows are deleted in the transaction that claimed them. A change may be published twice
+    if the relay dies before committing, which only makes an index reload the slice once more.
+    """
+
+    def __init__(
+        self,
+        uow: UoW,
+        outbox_repo: SubscriptionChangeOutboxRepo,
+        publisher: SubscriptionChangesPublisher,
+        batch_size: int = 1000,
+    ) -> None:
+        self._uow = uow
+        self._outbox_repo = outbox_repo
+        self._publisher = publisher
+        self._batch_size = batch_size
+
+    def relay(self) -> int:
+        """Drain the outbox and return the number of published changes"""
+        total = 0
+        while True:
+            pending = self._outbox_repo.claim_pending(limit=self._batch_size)
+            if not pending:
+                break
+            self._publisher.publish(
+                [SubscriptionChange(user_id=change.user_id, instrument_id=change.instrument_id) for change in pending]
+            )
+            self._outbox_repo.delete_many([change.identity for change in pending])
+            self._uow.commit()
+            total += len(pending)
+            if len(pending) < self._batch_size:
+                break
+        if total:
+            logger.debug(f"Relayed {total} subscription changes.")
+        return total
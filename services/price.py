@@ -1,14 +1,32 @@
 import abc
 import datetime
 import decimal
-from typing import Iterable
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+from typing import Any, Iterable
 
 from pydantic import BaseModel
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from models.domain.instument import Instrument
 
+logger = logging.getLogger(__name__)
+
+
+def quotation_to_decimal(quotation: dict[str, Any]) -> decimal.Decimal:
+    units = int(quotation.get("units", 0))
+    nano = int(quotation.get("nano", 0))
+    return decimal.Decimal(units) + decimal.Decimal(nano).scaleb(-9)
+
+
+def round_price(price: decimal.Decimal, precision: int) -> decimal.Decimal:
+    """Round half away from zero like round(numeric, int) in Postgres, which rounds the STEP levels"""
+    return price.quantize(decimal.Decimal(1).scaleb(-precision), rounding=decimal.ROUND_HALF_UP)
+
 
 class InstrumentPriceResult(BaseModel):
     instrument: Instrument
@@ -17,7 +35,7 @@ class InstrumentPriceResult(BaseModel):
 
 class PriceService(abc.ABC):
     @abc.abstractmethod
-    def get_prices(self, instruments: Iterable[Instrument]) -> InstrumentPriceResult:
+    def get_prices(self, instruments: Iterable[Instrument]) -> list[InstrumentPriceResult]:
         pass
 
     @classmethod
@@ -49,23 +67,75 @@ class TinkoffPriceService(PriceService):
     def weekdays(cls) -> set[int]:
         return {0, 1, 2, 3, 4}
 
-    def __init__(self, token: str) -> None:
+    def __init__(
+        self,
+        token: str,
+        chunk_size: int = 300,
+        max_workers: int = 4,
+        timeout: float = 10,
+        max_retries: int = 1,
+        deadline: float = 30,
+    ) -> None:
         self._token = token
         self._base_url = "https://invest-public-api.tinkoff.ru/rest/"
         self._headers = {"Authorization": f"Bearer {token}"}
+        self._chunk_size = chunk_size
+        self._max_workers = max_workers
+        self._timeout = timeout
+        self._deadline = deadline
+        self._session = requests.Session()
+        self._session.headers.update(self._headers)
+        # GetLastPrices is a read, so retrying the POST is safe.
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=0.5,
+            backoff_max=2,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=None,
+        )
+        self._session.mount(self._base_url, HTTPAdapter(pool_maxsize=max_workers, max_retries=retry))
 
     def get_prices(self, instruments: Iterable[Instrument]) -> list[InstrumentPriceResult]:
-        data = requests.post(
-            self._base_url + "tinkoff.public.invest.api.contract.v1.MarketDataService/GetLastPrices",
-            headers=self._headers,
-            json={"figi": [instrument.figi for instrument in instruments]},
-        ).json()
-        prices: list[decimal.Decimal | None] = [
-            decimal.Decimal(f"{row['price']['units']}.{str(row['price']['nano']).zfill(9)}") if "price" in row else None
-            for row in data["lastPrices"]
-        ]
+        """
+        Fetch last prices in chunks of chunk_size FIGIs, up to max_workers chunks at a time.
+        Prices are matched to instruments by FIGI; a chunk that still fails after retries is logged and skipped.
+        Chunks not received within deadline seconds are skipped too, so a slow API can't run a tick
+        into its time limit whatever the number of chunks, retries and timeouts.
+        """
+        instruments_by_figi: dict[str, list[Instrument]] = defaultdict(list)
+        for instrument in instruments:
+            instruments_by_figi[instrument.figi].append(instrument)
+        figis = list(instruments_by_figi)
+        chunks = [figis[i : i + self._chunk_size] for i in range(0, len(figis), self._chunk_size)]
+
+        prices: dict[str, decimal.Decimal] = {}
+        executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="tinkoff-prices")
+        futures = {executor.submit(self._get_chunk_prices, chunk): chunk for chunk in chunks}
+        try:
+            for future in as_completed(futures, timeout=self._deadline):
+                try:
+                    prices.update(future.result())
+                except (requests.RequestException, ValueError, KeyError) as e:
+                    logger.warning(f"Tinkoff last prices chunk of {len(futures[future])} FIGIs failed: {e!r}")
+        except FuturesTimeoutError:
+            late = sum(len(chunk) for future, chunk in futures.items() if not future.done())
+            logger.warning(f"Tinkoff last prices of {late} FIGIs not received within {self._deadline}s")
+        finally:
+            # Requests already sent end in the background, bounded by their own timeout and retries.
+            executor.shutdown(wait=False, cancel_futures=True)
         return [
             InstrumentPriceResult(instrument=instrument, new_price=price)
-            for instrument, price in zip(instruments, prices)
-            if price is not None
+            for figi, price in prices.items()
+            for instrument in instruments_by_figi.get(figi, [])
         ]
+
+    def _get_chunk_prices(self, figis: list[str]) -> dict[str, decimal.Decimal]:
+        response = self._session.post(
+            self._base_url + "tinkoff.public.invest.api.contract.v1.MarketDataService/GetLastPrices",
+            json={"figi": figis},
+            timeout=self._timeout,
+        )
+        response.raise_for_status()
+        return {
+            row["figi"]: quotation_to_decimal(row["price"]) for row in response.json()["lastPrices"] if "price" in row
+        }
@@ -0,0 +1,68 @@
+import abc
+import datetime
+import decimal
+import logging
+
+import redis
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+class CachedPrice(BaseModel):
+    instrument_id: int
+    ticker: str
+    price: decimal.Decimal
+    precision: int
+    updated_at: datetime.datetime
+
+
+class HotPriceCache(abc.ABC):
+    @abc.abstractmethod
+    def get(self, ticker: str) -> CachedPrice | None:
+        pass
+
+    @abc.abstractmethod
+    def set_many(self, prices: list[CachedPrice]) -> None:
+        pass
+
+
+class RedisHotPriceCache(HotPriceCache):
+    """
+    Current prices in one Redis hash of ticker -> JSON-encoded CachedPrice.
+
+    Written through by the price tick after its transaction commits and filled with prices fetched live
+    on read misses, so a ticker is only looked up in the database until the first tick or request that caches it.
+    Write failures are logged: the cache is only an optimization over the database.
+    """
+
+    def __init__(self, redis_client: redis.Redis, key: str = "hot_price", batch_size: int = 1000) -> None:
+        self._redis = redis_client
+        self._key = key
+        self._batch_size = batch_size
+
+    def get(self, ticker: str) -> CachedPrice | None:
+        try:
+            value = self._redis.hget(self._key, ticker)
+        except redis.RedisError as e:
+            logger.warning(f"Hot price cache read failed: {e!r}")
+            return None
+        if value is None:
+            return None
+        try:
+            return CachedPrice.model_validate_json(value)
+        except ValidationError:
+            # Entry written in an older format; treat it as a miss, the caller rewrites it.
+            return None
+
+    def set_many(self, prices: list[CachedPrice]) -> None:
+        if not prices:
+            return
+        pipe = self._redis.pipeline(transaction=False)
+        for i in range(0, len(prices), self._batch_size):
+            batch = prices[i : i + self._batch_size]
+            pipe.hset(self._key, mapping={row.ticker: row.model_dump_json() for row in batch})
+        try:
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Hot price cache write failed: {e!r}")
@@ -0,0 +1,55 @@
+import abc
+import decimal
+import logging
+
+import redis
+
+from services.price import InstrumentPriceResult
+
+logger = logging.getLogger(__name__)
+
+
+class PriceChangeFilter(abc.ABC):
+    @abc.abstractmethod
+    def filter_changed(self, data: list[InstrumentPriceResult]) -> list[InstrumentPriceResult]:
+        """Return only the prices that differ from the last remembered price of their instrument"""
+        pass
+
+    @abc.abstractmethod
+    def remember(self, data: list[InstrumentPriceResult]) -> None:
+        """Store prices as last seen; call only after they were committed"""
+        pass
+
+
+class RedisPriceChangeFilter(PriceChangeFilter):
+    """
+    Last seen prices in one Redis hash of instrument_id -> price, shared by all workers.
+
+    Instruments missing from the hash always count as changed, so an empty or expired cache
+    only costs one full write.
+    """
+
+    def __init__(self, redis_client: redis.Redis, key: str = "last_price", ttl: int = 86400) -> None:
+        self._redis = redis_client
+        self._key = key
+        self._ttl = ttl
+
+    def filter_changed(self, data: list[InstrumentPriceResult]) -> list[InstrumentPriceResult]:
+        if not data:
+            return []
+        last_prices = self._redis.hmget(self._key, [row.instrument.identity for row in data])
+        changed = [
+            row
+            for row, last_price in zip(data, last_prices)
+            if last_price is None or decimal.Decimal(last_price.decode()) != row.new_price
+        ]
+        logger.info(f"{len(changed)} of {len(data)} prices changed since the last tick.")
+        return changed
+
+    def remember(self, data: list[InstrumentPriceResult]) -> None:
+        if not data:
+            return
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.hset(self._key, mapping={row.instrument.identity: str(row.new_price) for row in data})
+        pipe.expire(self._key, self._ttl)
+        pipe.execute()
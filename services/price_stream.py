@@ -0,0 +1,138 @@
+import abc
+import asyncio
+import decimal
+import logging
+from typing import Any, Awaitable, Callable
+
+import aiohttp
+
+from services.price import quotation_to_decimal
+
+logger = logging.getLogger(__name__)
+
+GetFigis = Callable[[], Awaitable[set[str]]]
+OnPrices = Callable[[dict[str, decimal.Decimal]], Awaitable[None]]
+
+
+class PriceStreamService(abc.ABC):
+    @abc.abstractmethod
+    async def run(self, get_figis: GetFigis, on_prices: OnPrices) -> None:
+        """
+        Stream last prices of the instruments returned by get_figis until cancelled.
+        on_prices receives the latest price per FIGI accumulated since its previous call.
+        """
+        pass
+
+
+class TinkoffStreamPriceService(PriceStreamService):
+    """
+    Last prices from the Tinkoff MarketDataStream over its JSON websocket gateway.
+
+    Keeps one long-lived subscription, diffs it against get_figis every resubscribe_interval
+    seconds, and reconnects with exponential backoff, subscribing again to the whole set.
+    Updates are coalesced per FIGI and handed to on_prices at most every flush_interval seconds;
+    while on_prices is running new updates keep accumulating.
+    """
+
+    DEFAULT_URL = (
+        "wss://invest-public-api.tinkoff.ru/ws/tinkoff.public.invest.api.contract.v1.MarketDataStreamService/MarketDataStream"
+    )
+    SUBSCRIBE = "SUBSCRIPTION_ACTION_SUBSCRIBE"
+    UNSUBSCRIBE = "SUBSCRIPTION_ACTION_UNSUBSCRIBE"
+
+    def __init__(
+        self,
+        token: str,
+        url: str = DEFAULT_URL,
+        flush_interval: float = 0.5,
+        resubscribe_interval: float = 30,
+        max_reconnect_delay: float = 30,
+        heartbeat: float = 30,
+    ) -> None:
+        self._headers = {"Authorization": f"Bearer {token}"}
+        self._url = url
+        self._flush_interval = flush_interval
+        self._resubscribe_interval = resubscribe_interval
+        self._max_reconnect_delay = max_reconnect_delay
+        self._heartbeat = heartbeat
+        self._pending: dict[str, decimal.Decimal] = {}
+        self._reconnect_delay = 1.0
+
+    async def run(self, get_figis: GetFigis, on_prices: OnPrices) -> None:
+        flusher = asyncio.create_task(self._flush_forever(on_prices))
+        try:
+            async with aiohttp.ClientSession(headers=self._headers) as session:
+                while True:
+                    try:
+                        await self._stream(session, get_figis)
+                    except (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError) as e:
+                        logger.warning(f"Price stream disconnected: {e!r}")
+                    logger.info(f"Price stream reconnecting in {self._reconnect_delay:.0f}s")
+                    await asyncio.sleep(self._reconnect_delay)
+                    self._reconnect_delay = min(self._reconnect_delay * 2, self._max_reconnect_delay)
+        finally:
+            flusher.cancel()
+
+    async def _stream(self, session: aiohttp.ClientSession, get_figis: GetFigis) -> None:
+        async with session.ws_connect(self._url, protocols=("json",), heartbeat=self._heartbeat) as ws:
+            subscribed: set[str] = set()
+            self._reconnect_delay = 1.0
+            logger.info("Price stream connected.")
+
+            async def resubscribe_forever() -> None:
+                nonlocal subscribed
+                while True:
+                    try:
+                        figis = await get_figis()
+                    except Exception:
+                        logger.exception("Price stream instruments refresh failed")
+                    else:
+                        await self._send_subscription(ws, self.SUBSCRIBE, figis - subscribed)
+                        await self._send_subscription(ws, self.UNSUBSCRIBE, subscribed - figis)
+                        subscribed = figis
+                    await asyncio.sleep(self._resubscribe_interval)
+
+            resubscriber = asyncio.create_task(resubscribe_forever())
+            try:
+                async for msg in ws:
+                    if msg.type == aiohttp.WSMsgType.TEXT:
+                        self._handle(msg.json())
+                    elif msg.type == aiohttp.WSMsgType.ERROR:
+                        raise ConnectionError(ws.exception())
+                raise ConnectionError(f"closed with code {ws.close_code}")
+            finally:
+                resubscriber.cancel()
+
+    async def _send_subscription(self, ws: aiohttp.ClientWebSocketResponse, action: str, figis: set[str]) -> None:
+        if not figis:
+            return
+        await ws.send_json(
+            {
+                "subscribeLastPriceRequest": {
+                    "subscriptionAction": action,
+                    "instruments": [{"instrumentId": figi} for figi in sorted(figis)],
+                }
+            }
+        )
+        logger.info(f"Price stream {action}: {len(figis)} instruments.")
+
+    def _handle(self, data: dict[str, Any]) -> None:
+        if "lastPrice" in data:
+            last_price = data["lastPrice"]
+            if "price" in last_price:
+                self._pending[last_price["figi"]] = quotation_to_decimal(last_price["price"])
+        elif "subscribeLastPriceResponse" in data:
+            for row in data["subscribeLastPriceResponse"].get("lastPriceSubscriptions", []):
+                if row.get("subscriptionStatus") != "SUBSCRIPTION_STATUS_SUCCESS":
+                    logger.warning(f"Price stream subscription failed: {row}")
+
+    async def _flush_forever(self, on_prices: OnPrices) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            if not self._pending:
+                continue
+            prices, self._pending = self._pending, {}
+            try:
+                await on_prices(prices)
+            except Exception:
+                logger.exception("Price stream batch processing failed")
@@ -1,12 +1,13 @@
+import datetime
 import logging
 
 from pydantic import BaseModel
 import abc
 import decimal
 
-from models.domain.instrument_price import InstrumentPrice
 from models.domain.instument import Instrument
 from repo.instrument_price import InstrumentPriceRepo
+from repo.instrument_price_history import InstrumentPriceHistoryRepo
 from services.price import InstrumentPriceResult
 from services.uow import UoW
 
@@ -26,25 +27,35 @@ class PriceUpdaterService(abc.ABC):
 
 
 class PriceUpdaterServiceImpl(PriceUpdaterService):
-    def __init__(self, uow: UoW, instrument_prices_repo: InstrumentPriceRepo):
+    def __init__(
+        self,
+        uow: UoW,
+        instrument_prices_repo: InstrumentPriceRepo,
+        price_history_repo: InstrumentPriceHistoryRepo | None = None,
+    ):
         self.uow = uow
         self.instrument_prices_repo = instrument_prices_repo
+        self.price_history_repo = price_history_repo
 
     def update_prices(self, data: list[InstrumentPriceResult]) -> list[UpdatedPriceResult]:
         logger.info("Starting the price update process.")
-        instrument_ids = [row.instrument.identity for row in data]
-        current_prices: list[InstrumentPrice] = self.instrument_prices_repo.find_by(instrument_id_in=instrument_ids)
-        logger.info("Fetched current prices from the repository.")
-        current_prices_map: dict[int, decimal.Decimal] = {ip.instrument.identity: ip.price for ip in current_prices}
-
-        for row in data:
-            self.instrument_prices_repo.create_or_update(instrument_id=row.instrument.identity, price=row.new_price)
+        prices = {row.instrument.identity: row.new_price for row in data}
+        old_prices: dict[int, decimal.Decimal | None] = self.instrument_prices_repo.bulk_create_or_update(
+            prices=prices
+        )
+        logger.info("Upserted prices in the repository.")
+        if self.price_history_repo is not None:
+            try:
+                self.price_history_repo.append(prices, created_at=datetime.datetime.now(tz=datetime.timezone.utc))
+            except Exception:
+                # History is best effort; losing one tick of it must not block alerts.
+                logger.exception("Failed to append prices to the history.")
 
         updated_prices = [
             UpdatedPriceResult(
                 instrument=row.instrument,
                 new_price=row.new_price,
-                old_price=current_prices_map.get(row.instrument.identity),
+                old_price=old_prices.get(row.instrument.identity),
             )
             for row in data
         ]
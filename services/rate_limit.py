@@ -0,0 +1,98 @@
+import abc
+
+import redis
+
+# KEYS: chat bucket, global bucket.
+# ARGV: chat rate, chat capacity, global rate, global capacity (rates in tokens per second), tokens wanted.
+# Takes as many of the wanted tokens as both buckets hold, from both of them atomically.
+# Returns the number of tokens taken and, as a string, seconds to wait for the next one (0 if all were taken).
+TOKEN_BUCKET_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+
+local function refill(key, rate, capacity)
+    local data = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(data[1]) or capacity
+    local ts = tonumber(data[2]) or now
+    return math.min(capacity, tokens + math.max(0, now - ts) * rate)
+end
+
+local function store(key, tokens, rate, capacity)
+    redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000) + 1000)
+end
+
+local chat_rate, chat_capacity = tonumber(ARGV[1]), tonumber(ARGV[2])
+local global_rate, global_capacity = tonumber(ARGV[3]), tonumber(ARGV[4])
+local wanted = tonumber(ARGV[5])
+local chat_tokens = refill(KEYS[1], chat_rate, chat_capacity)
+local global_tokens = refill(KEYS[2], global_rate, global_capacity)
+
+local taken = math.max(0, math.min(wanted, math.floor(chat_tokens), math.floor(global_tokens)))
+chat_tokens = chat_tokens - taken
+global_tokens = global_tokens - taken
+
+local wait = 0
+if taken < wanted then
+    if chat_tokens < 1 then
+        wait = math.max(wait, (1 - chat_tokens) / chat_rate)
+    end
+    if global_tokens < 1 then
+        wait = math.max(wait, (1 - global_tokens) / global_rate)
+    end
+end
+store(KEYS[1], chat_tokens, chat_rate, chat_capacity)
+store(KEYS[2], global_tokens, global_rate, global_capacity)
+return {taken, tostring(wait)}
+"""
+
+
+class RateLimiter(abc.ABC):
+    @abc.abstractmethod
+    def acquire(self, chat_id: int) -> float:
+        """Return 0 if a message to chat_id may be sent now, otherwise seconds to wait before trying again"""
+        pass
+
+    @abc.abstractmethod
+    def acquire_many(self, counts: dict[int, int]) -> dict[int, tuple[int, float]]:
+        """
+        Take up to counts[chat_id] tokens for each chat. Return per chat how many were taken
+        and seconds to wait before the rest may be sent (0 if all were taken).
+        """
+        pass
+
+
+class RedisTokenBucketRateLimiter(RateLimiter):
+    """
+    Per-chat and global token buckets shared by all workers through Redis.
+
+    The check and the token consumption happen in one Lua script, so concurrent workers
+    can't both take the last token of a bucket.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        chat_rate: float,
+        chat_capacity: float,
+        global_rate: float,
+        global_capacity: float,
+        key_prefix: str = "rate_limit",
+    ) -> None:
+        self._redis = redis_client
+        self._args = (chat_rate, chat_capacity, global_rate, global_capacity)
+        self._key_prefix = key_prefix
+        self._script = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def acquire(self, chat_id: int) -> float:
+        _, wait = self._script(keys=self._keys(chat_id), args=(*self._args, 1))
+        return float(wait)
+
+    def acquire_many(self, counts: dict[int, int]) -> dict[int, tuple[int, float]]:
+        pipe = self._redis.pipeline(transaction=False)
+        for chat_id, count in counts.items():
+            self._script(keys=self._keys(chat_id), args=(*self._args, count), client=pipe)
+        return {chat_id: (int(taken), float(wait)) for chat_id, (taken, wait) in zip(counts, pipe.execute())}
+
+    def _keys(self, chat_id: int) -> list[str]:
+        return [f"{self._key_prefix}:chat:{chat_id}", f"{self._key_prefix}:global"]
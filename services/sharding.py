@@ -0,0 +1,22 @@
+from typing import Iterable
+
+
+def jump_consistent_hash(key: int, num_buckets: int) -> int:
+    """
+    Jump consistent hash (Lamping, Veach): maps key to one of num_buckets buckets so that
+    changing the number of buckets from n to n + 1 moves only 1/(n + 1) of the keys.
+    """
+    b, j = -1, 0
+    key &= 0xFFFFFFFFFFFFFFFF
+    while j < num_buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+def partition(ids: Iterable[int], num_shards: int) -> list[list[int]]:
+    shards: list[list[int]] = [[] for _ in range(num_shards)]
+    for id_ in ids:
+        shards[jump_consistent_hash(id_, num_shards)].append(id_)
+    return shards
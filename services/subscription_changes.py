@@ -0,0 +1,68 @@
+import abc
+import logging
+
+import redis
+from pydantic import BaseModel
+
+from repo.subscription_change_outbox import SubscriptionChangeOutboxRepo
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTION_CHANGES_STREAM = "subscription_changes"
+
+
+class SubscriptionChange(BaseModel):
+    """(user, instrument) slice of the subscription table that was modified; instrument_id=None means all of them."""
+
+    user_id: int
+    instrument_id: int | None = None
+
+
+class SubscriptionChangesPublisher(abc.ABC):
+    """Services publish the changes they make before committing them, in the same transaction."""
+
+    @abc.abstractmethod
+    def publish(self, changes: list[SubscriptionChange]) -> None:
+        pass
+
+
+class OutboxSubscriptionChangesPublisher(SubscriptionChangesPublisher):
+    """
+    Writes changes to the subscription change outbox in the caller's transaction, so they are
+    published if and only if the subscriptions are changed. SubscriptionChangesRelay moves them to the stream.
+    """
+
+    def __init__(self, outbox_repo: SubscriptionChangeOutboxRepo) -> None:
+        self._outbox_repo = outbox_repo
+
+    def publish(self, changes: list[SubscriptionChange]) -> None:
+        self._outbox_repo.add_many((change.user_id, change.instrument_id) for change in changes)
+
+
+class RedisSubscriptionChangesPublisher(SubscriptionChangesPublisher):
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        stream_key: str = SUBSCRIPTION_CHANGES_STREAM,
+        max_len: int = 100_000,
+    ) -> None:
+        self._redis = redis_client
+        self._stream_key = stream_key
+        self._max_len = max_len
+
+    def publish(self, changes: list[SubscriptionChange]) -> None:
+        if not changes:
+            return
+        pipe = self._redis.pipeline(transaction=False)
+        for change in changes:
+            pipe.xadd(
+                self._stream_key,
+                {
+                    "user_id": change.user_id,
+                    "instrument_id": "" if change.instrument_id is None else change.instrument_id,
+                },
+                maxlen=self._max_len,
+                approximate=True,
+            )
+        pipe.execute()
+        logger.debug(f"Published {len(changes)} subscription changes.")
@@ -0,0 +1,220 @@
+import array
+import bisect
+import decimal
+import logging
+import time
+from collections import defaultdict
+from typing import NamedTuple
+
+import redis
+
+from models.domain.subscription import Subscription
+from repo.subscription import SubscriptionRepo
+from services.subscription_changes import SUBSCRIPTION_CHANGES_STREAM
+
+logger = logging.getLogger(__name__)
+
+
+class _InstrumentLevels:
+    """Subscription prices of one instrument kept sorted, with subscription ids in a parallel array."""
+
+    __slots__ = ("prices", "ids")
+
+    def __init__(self) -> None:
+        self.prices: list[decimal.Decimal] = []
+        self.ids = array.array("q")
+
+    def insert(self, price: decimal.Decimal, id_: int) -> None:
+        pos = bisect.bisect_right(self.prices, price)
+        self.prices.insert(pos, price)
+        self.ids.insert(pos, id_)
+
+    def remove(self, price: decimal.Decimal, id_: int) -> None:
+        lo = bisect.bisect_left(self.prices, price)
+        hi = bisect.bisect_right(self.prices, price)
+        for pos in range(lo, hi):
+            if self.ids[pos] == id_:
+                del self.prices[pos]
+                del self.ids[pos]
+                return
+
+    def find_range(self, price_gte: decimal.Decimal, price_lt: decimal.Decimal) -> array.array:
+        lo = bisect.bisect_left(self.prices, price_gte)
+        hi = bisect.bisect_left(self.prices, price_lt, lo=lo)
+        return self.ids[lo:hi]
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+
+class _IndexedSubscription(NamedTuple):
+    user_id: int
+    instrument_id: int
+    price: decimal.Decimal
+
+
+class SubscriptionIndex:
+    """
+    In-memory index of the subscriptions that can be triggered: active and not crossing-disabled ones.
+
+    Prices are grouped per instrument and kept sorted, so the levels crossed by a price move
+    are found with two bisections, in O(log n + k).
+    Only ids and prices are kept: the user and instrument data of a message is read when it fires,
+    so it is never older than the alert.
+    """
+
+    def __init__(self) -> None:
+        self._levels: dict[int, _InstrumentLevels] = {}
+        self._subscriptions: dict[int, _IndexedSubscription] = {}
+        self._by_user: dict[int, set[int]] = defaultdict(set)
+
+    def load(self, subscriptions: list[Subscription]) -> None:
+        self.clear()
+        for sub in subscriptions:
+            self.add(sub)
+
+    def clear(self) -> None:
+        self._levels.clear()
+        self._subscriptions.clear()
+        self._by_user.clear()
+
+    def add(self, sub: Subscription) -> None:
+        self.discard(sub.identity)
+        if not sub.is_active or sub.crossing_disabled:
+            return
+        self._subscriptions[sub.identity] = _IndexedSubscription(sub.user_id, sub.instrument_id, sub.price)
+        self._by_user[sub.user_id].add(sub.identity)
+        self._levels.setdefault(sub.instrument_id, _InstrumentLevels()).insert(sub.price, sub.identity)
+
+    def discard(self, id_: int) -> None:
+        sub = self._subscriptions.pop(id_, None)
+        if sub is None:
+            return
+        user_ids = self._by_user[sub.user_id]
+        user_ids.discard(id_)
+        if not user_ids:
+            del self._by_user[sub.user_id]
+        levels = self._levels[sub.instrument_id]
+        levels.remove(sub.price, id_)
+        if not levels:
+            del self._levels[sub.instrument_id]
+
+    def discard_by(self, user_id: int, instrument_id: int | None = None) -> None:
+        for id_ in list(self._by_user.get(user_id, ())):
+            if instrument_id is None or self._subscriptions[id_].instrument_id == instrument_id:
+                self.discard(id_)
+
+    def find_crossed(
+        self,
+        instrument_id: int,
+        price_gte: decimal.Decimal,
+        price_lt: decimal.Decimal,
+    ) -> list[int]:
+        """Ids of the subscriptions with price_gte <= price < price_lt"""
+        levels = self._levels.get(instrument_id)
+        if levels is None:
+            return []
+        return levels.find_range(price_gte, price_lt).tolist()
+
+    def instrument_ids(self) -> set[int]:
+        return set(self._levels)
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+
+class SubscriptionIndexSync:
+    """
+    Keeps a process-local SubscriptionIndex in step with the subscription table.
+
+    The first refresh loads the index from the database. Later refreshes read the changes stream
+    that SubscriptionChangesRelay fills from the subscription change outbox once the changes are committed,
+    and reload only the (user, instrument) slices mentioned there.
+    A full reload happens every full_reload_interval seconds and whenever the stream was trimmed past
+    the last entry this process has seen.
+    """
+
+    _BATCH_SIZE = 10_000
+
+    def __init__(
+        self,
+        index: SubscriptionIndex,
+        redis_client: redis.Redis,
+        full_reload_interval: float,
+        stream_key: str = SUBSCRIPTION_CHANGES_STREAM,
+    ) -> None:
+        self._index = index
+        self._redis = redis_client
+        self._full_reload_interval = full_reload_interval
+        self._stream_key = stream_key
+        self._last_id: str | None = None
+        self._loaded_at = 0.0
+
+    def refresh(self, subscription_repo: SubscriptionRepo) -> SubscriptionIndex:
+        if (
+            self._last_id is None
+            or time.monotonic() - self._loaded_at > self._full_reload_interval
+            or self._is_stream_trimmed()
+        ):
+            self._full_reload(subscription_repo)
+        else:
+            self._apply_changes(subscription_repo)
+        return self._index
+
+    def _full_reload(self, subscription_repo: SubscriptionRepo) -> None:
+        last_entries = self._redis.xrevrange(self._stream_key, count=1)
+        last_id = self._decode(last_entries[0][0]) if last_entries else "0-0"
+        self._index.load(subscription_repo.find_by(is_active=True, crossing_disabled=False))
+        self._last_id = last_id
+        self._loaded_at = time.monotonic()
+        logger.info(f"Subscription index loaded: {len(self._index)} subscriptions.")
+
+    def _apply_changes(self, subscription_repo: SubscriptionRepo) -> None:
+        users: set[int] = set()
+        pairs: set[tuple[int, int]] = set()
+        while entries := self._redis.xrange(self._stream_key, min=f"({self._last_id}", count=self._BATCH_SIZE):
+            for entry_id, fields in entries:
+                user_id = int(fields[b"user_id"])
+                instrument_id = self._decode(fields[b"instrument_id"])
+                if instrument_id:
+                    pairs.add((user_id, int(instrument_id)))
+                else:
+                    users.add(user_id)
+                self._last_id = self._decode(entry_id)
+        pairs = {(user_id, instrument_id) for user_id, instrument_id in pairs if user_id not in users}
+        if not users and not pairs:
+            return
+
+        subscriptions: list[Subscription] = []
+        if users:
+            for user_id in users:
+                self._index.discard_by(user_id=user_id)
+            subscriptions += subscription_repo.find_by(user_id_in=list(users), is_active=True, crossing_disabled=False)
+        if pairs:
+            for user_id, instrument_id in pairs:
+                self._index.discard_by(user_id=user_id, instrument_id=instrument_id)
+            subscriptions += subscription_repo.find_by(
+                user_instrument_in=list(pairs),
+                is_active=True,
+                crossing_disabled=False,
+            )
+        for sub in subscriptions:
+            self._index.add(sub)
+        logger.debug(f"Subscription index refreshed for {len(users)} users and {len(pairs)} user instruments.")
+
+    def _is_stream_trimmed(self) -> bool:
+        if self._last_id == "0-0":
+            return False
+        first_entries = self._redis.xrange(self._stream_key, count=1)
+        if not first_entries:
+            return False
+        return self._parse_id(self._decode(first_entries[0][0])) > self._parse_id(self._last_id)
+
+    @staticmethod
+    def _parse_id(entry_id: str) -> tuple[int, int]:
+        ms, seq = entry_id.split("-")
+        return int(ms), int(seq)
+
+    @staticmethod
+    def _decode(value: bytes | str) -> str:
+        return value.decode() if isinstance(value, bytes) else value
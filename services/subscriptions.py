@@ -1,15 +1,20 @@
 import abc
 import logging
 from collections import defaultdict
+from typing import Iterable
 
 from pydantic import BaseModel
 
 from enums import SubscriptionTypeEnum
 from models.domain.subscription import Subscription
+from repo.notification_outbox import NotificationOutboxRepo
 from repo.subscription import SubscriptionRepo
 from repo.user import UserRepo
 from services.message import get_locale_msg_builder
+from services.metrics import TICK_STAGE_SECONDS, Metrics, NullMetrics
 from services.price_updater import UpdatedPriceResult
+from services.subscription_changes import SubscriptionChange, SubscriptionChangesPublisher
+from services.subscription_index import SubscriptionIndex
 from services.uow import UoW
 
 logger = logging.getLogger(__name__)
@@ -27,39 +32,54 @@ class SubscriptionsService(abc.ABC):
 
 
 class DefaultSubscriptionsService(SubscriptionsService):
-    def __init__(self, uow: UoW, subscription_repo: SubscriptionRepo, user_repo: UserRepo, join_messages: bool) -> None:
+    def __init__(
+        self,
+        uow: UoW,
+        subscription_repo: SubscriptionRepo,
+        user_repo: UserRepo,
+        join_messages: bool,
+        changes_publisher: SubscriptionChangesPublisher,
+        subscription_index: SubscriptionIndex | None = None,
+        metrics: Metrics | None = None,
+        outbox_repo: NotificationOutboxRepo | None = None,
+    ) -> None:
         self._uow = uow
         self._subscription_repo = subscription_repo
         self._user_repo = user_repo
         self._join_messages = join_messages
+        self._changes_publisher = changes_publisher
+        self._subscription_index = subscription_index
+        self._metrics = metrics or NullMetrics()
+        self._outbox_repo = outbox_repo
 
     def get_messages_and_update(self, prices: list[UpdatedPriceResult]) -> list[SubscriptionMessage]:
         logger.info("Starting get_messages_and_update method.")
         chat_id_messages = defaultdict(list)
+        changes: dict[tuple[int, int], SubscriptionChange] = {}
+        moved: dict[int, UpdatedPriceResult] = {}
+        onetime_ids: list[int] = []
+        crossing_ids: list[int] = []
+        crossing_pairs: set[tuple[int, int]] = set()
         for row in prices:
             if row.old_price is None:
                 logger.debug(f"Skipping update for instrument {row.instrument.identity} because old price is None.")
                 continue
-
-            min_price = min(row.old_price, row.new_price)
-            max_price = max(row.old_price, row.new_price)
-            if min_price == max_price:
+            if row.old_price == row.new_price:
                 logger.debug(
                     f"Skipping update for instrument {row.instrument.identity} because old price equals new price."
                 )
                 continue
+            moved[row.instrument.identity] = row
 
-            logger.debug(f"Processing subscriptions for instrument {row.instrument.identity}.")
-            subscriptions: list[Subscription] = self._subscription_repo.find_by(
-                instrument_id=row.instrument.identity,
-                price_gte=min_price,
-                price_lt=max_price,
-                is_active=True,
-                crossing_disabled=False,
-            )
-            logger.debug(f"Found {len(subscriptions)} active subscriptions for instrument {row.instrument.identity}.")
+        with self._metrics.timer(TICK_STAGE_SECONDS, {"stage": "matching"}):
+            subscriptions: list[Subscription] = self._find_triggered(moved.values())
+        logger.debug(f"Found {len(subscriptions)} triggered subscriptions for {len(moved)} instruments.")
+        self._metrics.inc("price_tick_moved_instruments_total", len(moved))
+        self._metrics.inc("price_tick_triggered_subscriptions_total", len(subscriptions))
 
+        with self._metrics.timer(TICK_STAGE_SECONDS, {"stage": "rendering"}):
             for sub in subscriptions:
+                row = moved[sub.instrument_id]
                 chat_id_messages[sub.user_chat_id].append(
                     get_locale_msg_builder(sub.user_locale).sub_msg(
                         instrument_ticker=sub.instrument_ticker,
@@ -72,31 +92,83 @@ class DefaultSubscriptionsService(SubscriptionsService):
                 logger.debug(f"Created message for subscription ID {sub.identity}.")
 
                 if sub.type == SubscriptionTypeEnum.ONETIME:
-                    logger.debug(f"Updating one-time subscription ID {sub.identity} to inactive.")
-                    self._subscription_repo.update_by(id_=sub.identity, update_data={"is_active": False})
+                    onetime_ids.append(sub.identity)
                 elif sub.type == SubscriptionTypeEnum.CROSSING:
-                    logger.debug(f"Updating crossing subscription ID {sub.identity}.")
-                    self._subscription_repo.update_by(
-                        is_active=True,
+                    crossing_ids.append(sub.identity)
+                    crossing_pairs.add((sub.user_id, sub.instrument_id))
+                if sub.type != SubscriptionTypeEnum.ALWAYS:
+                    changes[(sub.user_id, sub.instrument_id)] = SubscriptionChange(
                         user_id=sub.user_id,
                         instrument_id=sub.instrument_id,
-                        type_=SubscriptionTypeEnum.CROSSING,
-                        update_data={"crossing_disabled": False},
-                    )
-                    self._subscription_repo.update_by(
-                        id_=sub.identity,
-                        update_data={"crossing_disabled": True},
                     )
 
-        self._uow.commit()
-        logger.info("Committing changes to the database.")
         if self._join_messages:
-            return [
+            result = [
                 SubscriptionMessage(user_chat_id=chat_id, message="\n\n".join(messages))
                 for chat_id, messages in chat_id_messages.items()
             ]
-        return [
-            SubscriptionMessage(user_chat_id=chat_id, message=message)
-            for chat_id, messages in chat_id_messages.items()
-            for message in messages
+        else:
+            result = [
+                SubscriptionMessage(user_chat_id=chat_id, message=message)
+                for chat_id, messages in chat_id_messages.items()
+                for message in messages
+            ]
+
+        with self._metrics.timer(TICK_STAGE_SECONDS, {"stage": "subscription_update"}):
+            self._apply_transitions(onetime_ids=onetime_ids, crossing_ids=crossing_ids, crossing_pairs=crossing_pairs)
+            if self._outbox_repo is not None:
+                self._outbox_repo.add_many((msg.user_chat_id, msg.message) for msg in result)
+            self._changes_publisher.publish(list(changes.values()))
+            self._uow.commit()
+        logger.info("Committing changes to the database.")
+        return result
+
+    def _apply_transitions(
+        self,
+        onetime_ids: list[int],
+        crossing_ids: list[int],
+        crossing_pairs: set[tuple[int, int]],
+    ) -> None:
+        """
+        Triggered ONETIME subscriptions become inactive. A triggered CROSSING subscription re-enables
+        the other crossing subscriptions of its user on the instrument and disables itself.
+        """
+        if onetime_ids:
+            logger.debug(f"Updating {len(onetime_ids)} one-time subscriptions to inactive.")
+            self._subscription_repo.update_by(id_in=onetime_ids, update_data={"is_active": False})
+        if crossing_ids:
+            logger.debug(f"Updating {len(crossing_ids)} crossing subscriptions.")
+            self._subscription_repo.update_by(
+                is_active=True,
+                user_instrument_in=list(crossing_pairs),
+                type_=SubscriptionTypeEnum.CROSSING,
+                update_data={"crossing_disabled": False},
+            )
+            self._subscription_repo.update_by(id_in=crossing_ids, update_data={"crossing_disabled": True})
+
+    def _find_triggered(self, moved: Iterable[UpdatedPriceResult]) -> list[Subscription]:
+        price_ranges = [
+            (
+                row.instrument.identity,
+                min(row.old_price, row.new_price),
+                max(row.old_price, row.new_price),
+            )
+            for row in moved
+        ]
+        if self._subscription_index is None:
+            return self._subscription_repo.find_triggered(price_ranges)
+        ids = [
+            id_
+            for instrument_id, min_price, max_price in price_ranges
+            for id_ in self._subscription_index.find_crossed(
+                instrument_id=instrument_id,
+                price_gte=min_price,
+                price_lt=max_price,
+            )
         ]
+        if not ids:
+            return []
+        # The rows are read by id for current message data; ones changed since the index was synced are skipped.
+        subscriptions = self._subscription_repo.find_by(id_in=ids, is_active=True, crossing_disabled=False)
+        order = {id_: pos for pos, id_ in enumerate(ids)}
+        return sorted(subscriptions, key=lambda sub: order[sub.identity])
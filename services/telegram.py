@@ -1,15 +1,46 @@
+import asyncio
 import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any, Coroutine, TypeVar
 
+import aiohttp
 import requests
+from pydantic import BaseModel
+
+from services.rate_limit import RateLimiter
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+
+def split_long_text(text: str, max_length: int) -> list[str]:
+    lines = text.split("\n")
+    messages = []
+    current_message = ""
+    for line in lines:
+        while len(line) > max_length:
+            messages.append(line[:max_length])
+            line = line[max_length:]  # noqa: PLW2901 (loop variable overwritten)
+        if len(current_message + line) > max_length:
+            messages.append(current_message)
+            current_message = line + "\n"
+        else:
+            current_message += line + "\n"
+    if current_message:
+        messages.append(current_message)
+    return messages
+
 
 class Telegram:
     MAX_MESSAGE_LENGTH = 4096
 
     def __init__(self, bot_token: str):
         self.bot_token = bot_token
+        self._url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+        self._session = requests.Session()
 
     def send_message(
         self,
@@ -21,34 +52,160 @@ class Telegram:
         messages = self._split_long_text(text=message)
         responses_oks = []
         for message_text in messages:
-            url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage?chat_id={chat_id}&text={message_text}"
+            payload: dict[str, Any] = {"chat_id": chat_id, "text": message_text}
             if disable_notification:
-                url += "&disable_notification=true"
+                payload["disable_notification"] = True
             if reply_to_msg_id is not None:
-                url += f"&reply_to_message_id={reply_to_msg_id}"
+                payload["reply_to_message_id"] = reply_to_msg_id
             try:
-                response = requests.get(url, timeout=5)
-                if not response.json().get("ok", False):
+                response = self._session.post(self._url, json=payload, timeout=5)
+                ok = response.json().get("ok", False)
+                if not ok:
                     logger.warning(f"Telegram send message fail, response: {response.text[:100]}")
             except requests.exceptions.Timeout:
                 logger.warning("Telegram send message timeout")
                 return False
-            responses_oks.append(response.json().get("ok", False))
+            responses_oks.append(ok)
         return all(responses_oks)
 
     def _split_long_text(self, text: str) -> list[str]:
-        lines = text.split("\n")
-        messages = []
-        current_message = ""
-        for line in lines:
-            while len(line) > self.MAX_MESSAGE_LENGTH:
-                messages.append(line[: self.MAX_MESSAGE_LENGTH])
-                line = line[self.MAX_MESSAGE_LENGTH :]  # noqa: PLW2901 (loop variable overwritten)
-            if len(current_message + line) > self.MAX_MESSAGE_LENGTH:
-                messages.append(current_message)
-                current_message = line + "\n"
-            else:
-                current_message += line + "\n"
-        if current_message:
-            messages.append(current_message)
-        return messages
+        return split_long_text(text, self.MAX_MESSAGE_LENGTH)
+
+
+class TelegramMessage(BaseModel):
+    chat_id: int
+    message: str
+    disable_notification: bool = False
+    reply_to_msg_id: int | None = None
+
+
+class _IntervalLimiter:
+    """Spaces acquisitions at least interval seconds apart."""
+
+    def __init__(self, interval: float) -> None:
+        self._interval = interval
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_at - now
+            self._next_at = max(now, self._next_at) + self._interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AsyncTelegram:
+    """
+    Sends batches of messages over one keep-alive aiohttp connection pool.
+
+    Different chats are sent to concurrently (up to max_concurrency requests in flight) and messages
+    of the same chat go out in order at most one per chat_interval seconds. The global rate is kept by
+    the caller taking a token of the shared rate_limiter for every message before sending the batch.
+    A 429 response is retried after its retry_after, without holding a request slot while waiting,
+    and each retry, like each part of a long message after the first, takes a token of its own from rate_limiter.
+
+    The event loop and HTTP session are owned by the instance and created lazily, so they survive
+    between Celery tasks of one worker process and are recreated after a fork.
+    """
+
+    MAX_MESSAGE_LENGTH = Telegram.MAX_MESSAGE_LENGTH
+
+    def __init__(
+        self,
+        bot_token: str,
+        max_concurrency: int = 20,
+        chat_interval: float = 1.0,
+        timeout: float = 5,
+        max_retries: int = 3,
+        rate_limiter: RateLimiter | None = None,
+    ) -> None:
+        self._url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+        self._max_concurrency = max_concurrency
+        self._chat_interval = chat_interval
+        self._timeout = timeout
+        self._max_retries = max_retries
+        self._rate_limiter = rate_limiter
+        self._pid: int | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._session: aiohttp.ClientSession | None = None
+
+    def send_messages_sync(self, messages: list[TelegramMessage]) -> list[bool]:
+        return self._run(self.send_messages(messages))
+
+    async def send_messages(self, messages: list[TelegramMessage]) -> list[bool]:
+        by_chat: dict[int, list[int]] = defaultdict(list)
+        for i, msg in enumerate(messages):
+            by_chat[msg.chat_id].append(i)
+        results = [False] * len(messages)
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        async def send_chat(positions: list[int]) -> None:
+            chat_limiter = _IntervalLimiter(self._chat_interval)
+            for i in positions:
+                msg = messages[i]
+                oks = []
+                for part, text in enumerate(split_long_text(msg.message, self.MAX_MESSAGE_LENGTH)):
+                    if part:
+                        await self._acquire_token(msg.chat_id)
+                    await chat_limiter.acquire()
+                    oks.append(await self._send_with_retries(msg, text, semaphore))
+                results[i] = all(oks)
+
+        await asyncio.gather(*(send_chat(positions) for positions in by_chat.values()))
+        return results
+
+    async def _send_with_retries(self, msg: TelegramMessage, text: str, semaphore: asyncio.Semaphore) -> bool:
+        for attempt in range(self._max_retries):
+            if attempt:
+                await self._acquire_token(msg.chat_id)
+            async with semaphore:
+                ok, retry_after = await self._send(msg, text)
+            if retry_after is None:
+                return ok
+            logger.warning(f"Telegram rate limit for chat_id {msg.chat_id}, retry after {retry_after}s")
+            await asyncio.sleep(retry_after)
+        return False
+
+    async def _acquire_token(self, chat_id: int) -> None:
+        if self._rate_limiter is None:
+            return
+        while (wait := await asyncio.to_thread(self._rate_limiter.acquire, chat_id)) > 0:
+            await asyncio.sleep(wait)
+
+    async def _send(self, msg: TelegramMessage, text: str) -> tuple[bool, float | None]:
+        """Return whether the message was sent and, for a 429 response, seconds to wait before a retry"""
+        payload: dict[str, Any] = {"chat_id": msg.chat_id, "text": text}
+        if msg.disable_notification:
+            payload["disable_notification"] = True
+        if msg.reply_to_msg_id is not None:
+            payload["reply_to_message_id"] = msg.reply_to_msg_id
+        try:
+            async with self._get_session().post(self._url, json=payload) as response:
+                data = await response.json(content_type=None)
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            logger.warning(f"Telegram send message error: {e!r}")
+            return False, None
+        if data.get("ok", False):
+            return True, None
+        retry_after = data.get("parameters", {}).get("retry_after")
+        if retry_after is None:
+            logger.warning(f"Telegram send message fail, response: {str(data)[:100]}")
+        return False, retry_after
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._max_concurrency, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+            )
+        return self._session
+
+    def _run(self, coro: Coroutine[Any, Any, T]) -> T:
+        if self._pid != os.getpid():
+            # Loop and session objects inherited over fork are unusable in the child.
+            self._pid = os.getpid()
+            self._loop = asyncio.new_event_loop()
+            self._session = None
+        return self._loop.run_until_complete(coro)
@@ -0,0 +1,47 @@
+import datetime
+
+from services.price import PriceService
+
+
+class TradingCalendar:
+    """
+    When a market is open: trading sessions in UTC on regular weekdays, minus holidays,
+    plus extra trading days that fall on weekends.
+    """
+
+    def __init__(
+        self,
+        sessions: list[tuple[datetime.time, datetime.time]],
+        weekdays: set[int],
+        holidays: set[datetime.date] | None = None,
+        extra_trading_days: set[datetime.date] | None = None,
+    ) -> None:
+        self._sessions = sessions
+        self._weekdays = weekdays
+        self._holidays = holidays or set()
+        self._extra_trading_days = extra_trading_days or set()
+
+    @classmethod
+    def from_price_service(
+        cls,
+        price_service: type[PriceService] | PriceService,
+        holidays: set[datetime.date] | None = None,
+        extra_trading_days: set[datetime.date] | None = None,
+    ) -> "TradingCalendar":
+        return cls(
+            sessions=[(price_service.from_utc_time(), price_service.to_utc_time())],
+            weekdays=price_service.weekdays(),
+            holidays=holidays,
+            extra_trading_days=extra_trading_days,
+        )
+
+    def is_trading_day(self, day: datetime.date) -> bool:
+        if day in self._extra_trading_days:
+            return True
+        return day.weekday() in self._weekdays and day not in self._holidays
+
+    def is_open(self, dt: datetime.datetime) -> bool:
+        dt = dt.astimezone(datetime.timezone.utc)
+        if not self.is_trading_day(dt.date()):
+            return False
+        return any(start <= dt.time() <= end for start, end in self._sessions)
@@ -3,6 +3,8 @@ from typing import Protocol
 
 from sqlalchemy.orm import Session
 
+from repo.cache import RepositoryCache, pop_written_tables, track_written_tables
+
 
 class UoW(Protocol):
     @abc.abstractmethod
@@ -15,11 +17,19 @@ class UoW(Protocol):
 
 
 class AlchemyUoW(UoW):
-    def __init__(self, session: Session) -> None:
+    """With a cache, entries of the tables the session wrote to are invalidated once the commit succeeds"""
+
+    def __init__(self, session: Session, cache: RepositoryCache | None = None) -> None:
         self._session = session
+        self._cache = cache
+        if cache is not None:
+            track_written_tables(session)
 
     def commit(self) -> None:
         self._session.commit()
+        if self._cache is not None:
+            self._cache.invalidate(pop_written_tables(self._session))
 
     def rollback(self) -> None:
         self._session.rollback()
+        pop_written_tables(self._session)
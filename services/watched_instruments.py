@@ -0,0 +1,99 @@
+import logging
+import time
+from typing import Iterable
+
+import redis
+
+from models.domain.instument import Instrument
+from repo.instrument import InstrumentRepo
+from services.subscription_index import SubscriptionIndex
+
+logger = logging.getLogger(__name__)
+
+
+class WatchedInstruments:
+    """
+    The instruments the price tick polls: those with triggerable subscriptions, taken from the
+    subscription index that the subscription handlers keep current through the changes stream,
+    plus the ones recently asked for with PRICE.
+
+    Instrument rows are cached in process memory and only loaded for ids not seen before.
+    The ids polled by the last tick are kept in Redis, so a tick can tell which instruments
+    were not polled before and whose stored price may be arbitrarily old. The shards of a running tick
+    collect their ids in a set of its own, which replaces the polled set when the tick ends.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        price_request_ttl: float = 3600,
+        instruments_cache_ttl: float = 3600,
+        tick_polled_ttl: int = 3600,
+        key_prefix: str = "watched",
+    ) -> None:
+        self._redis = redis_client
+        self._price_request_ttl = price_request_ttl
+        self._requested_key = f"{key_prefix}:requested"
+        self._polled_key = f"{key_prefix}:polled"
+        self._tick_polled_prefix = f"{key_prefix}:tick_polled"
+        self._tick_polled_ttl = tick_polled_ttl
+        self._instruments_cache_ttl = instruments_cache_ttl
+        self._instruments: dict[int, Instrument] = {}
+        self._instruments_loaded_at = time.monotonic()
+
+    def get(self, index: SubscriptionIndex, instrument_repo: InstrumentRepo) -> list[Instrument]:
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.zremrangebyscore(self._requested_key, "-inf", time.time())
+        pipe.zrange(self._requested_key, 0, -1)
+        _, requested = pipe.execute()
+        ids = index.instrument_ids() | {int(id_) for id_ in requested}
+        logger.info(f"Watching {len(ids)} instruments, {len(requested)} of them requested with PRICE.")
+        return self.get_by_ids(ids, instrument_repo)
+
+    def get_by_ids(self, ids: Iterable[int], instrument_repo: InstrumentRepo) -> list[Instrument]:
+        """Return instruments from the process cache, loading the missing ones"""
+        if time.monotonic() - self._instruments_loaded_at > self._instruments_cache_ttl:
+            self._instruments.clear()
+            self._instruments_loaded_at = time.monotonic()
+        ids = set(ids)
+        missing = ids - self._instruments.keys()
+        if missing:
+            for instrument in instrument_repo.find_by(id_in=list(missing)):
+                self._instruments[instrument.identity] = instrument
+        return [self._instruments[id_] for id_ in ids if id_ in self._instruments]
+
+    def watch(self, instrument_id: int) -> bool:
+        """Keep instrument_id polled for price_request_ttl seconds; return whether the last tick polled it"""
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.zadd(self._requested_key, {instrument_id: time.time() + self._price_request_ttl})
+        pipe.sismember(self._polled_key, instrument_id)
+        return bool(pipe.execute()[1])
+
+    def get_polled(self) -> set[int]:
+        return {int(id_) for id_ in self._redis.smembers(self._polled_key)}
+
+    def set_polled(self, instrument_ids: set[int]) -> None:
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.delete(self._polled_key)
+        if instrument_ids:
+            pipe.sadd(self._polled_key, *instrument_ids)
+        pipe.execute()
+
+    def add_tick_polled(self, tick_id: str, instrument_ids: Iterable[int]) -> None:
+        """Record instrument_ids as polled by the running tick tick_id"""
+        instrument_ids = list(instrument_ids)
+        if not instrument_ids:
+            return
+        key = f"{self._tick_polled_prefix}:{tick_id}"
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.sadd(key, *instrument_ids)
+        pipe.expire(key, self._tick_polled_ttl)
+        pipe.execute()
+
+    def finish_tick(self, tick_id: str) -> None:
+        """Replace the polled set with the ids recorded by tick tick_id; empty if none were"""
+        key = f"{self._tick_polled_prefix}:{tick_id}"
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.sunionstore(self._polled_key, [key])
+        pipe.delete(key)
+        pipe.execute()
@@ -0,0 +1,132 @@
+import asyncio
+import decimal
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+from pydantic_settings import BaseSettings
+
+from models.domain.instument import Instrument
+from repo.instrument import InstrumentAlchemyRepo
+from repo.subscription import SubscriptionAlchemyRepo
+from services.lock import RedisLock
+from services.price import InstrumentPriceResult
+from services.price_stream import PriceStreamService, TinkoffStreamPriceService
+from worker import db_session, price_tick_lock, process_prices, subscription_index_sync, watched_instruments
+
+logger = logging.getLogger(__name__)
+
+
+class StreamerConfig(BaseSettings):
+    TINKOFF_TOKEN: str
+    TINKOFF_STREAM_URL: str = TinkoffStreamPriceService.DEFAULT_URL
+    STREAM_FLUSH_INTERVAL: float = 0.5
+    STREAM_RESUBSCRIBE_INTERVAL: float = 30
+    STREAM_LOCK_RENEW_INTERVAL: float = 10
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"
+
+
+class Streamer:
+    """
+    Feeds prices from a PriceStreamService into the same pipeline the polling tick uses.
+
+    Database work runs on one thread, since it shares the process-wide subscription index.
+    The streamer holds the polling tick lock while it runs, so a polling tick started by a beat that
+    wasn't switched to PRICE_SOURCE=STREAM skips instead of processing the same prices; batches that
+    arrive while the lock is held by a tick are dropped.
+    """
+
+    def __init__(
+        self,
+        price_stream_svc: PriceStreamService,
+        tick_lock: RedisLock,
+        lock_renew_interval: float = 10,
+    ) -> None:
+        self._price_stream_svc = price_stream_svc
+        self._tick_lock = tick_lock
+        self._lock_renew_interval = lock_renew_interval
+        self._lock_token: str | None = None
+        self._instruments: dict[str, Instrument] = {}
+        # Instruments that got a price since they were subscribed to; the first price of the others
+        # is compared against a stored price that may be arbitrarily old.
+        self._seen_ids: set[int] = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="streamer-db")
+
+    def run(self) -> None:
+        asyncio.run(self.run_async())
+
+    async def run_async(self) -> None:
+        lock_keeper = asyncio.create_task(self._keep_tick_lock())
+        try:
+            await self._price_stream_svc.run(get_figis=self.get_figis, on_prices=self.on_prices)
+        finally:
+            lock_keeper.cancel()
+            if self._lock_token is not None:
+                await asyncio.to_thread(self._tick_lock.release, self._lock_token)
+                self._lock_token = None
+
+    async def get_figis(self) -> set[str]:
+        instruments = await asyncio.get_running_loop().run_in_executor(self._executor, self._load_instruments)
+        self._instruments = {instrument.figi: instrument for instrument in instruments}
+        self._seen_ids &= {instrument.identity for instrument in instruments}
+        return set(self._instruments)
+
+    async def on_prices(self, prices: dict[str, decimal.Decimal]) -> None:
+        if self._lock_token is None:
+            logger.info(f"Skip {len(prices)} streamed prices: the price tick lock is held by someone else")
+            return
+        data = [
+            InstrumentPriceResult(instrument=self._instruments[figi], new_price=price)
+            for figi, price in prices.items()
+            if figi in self._instruments
+        ]
+        if data:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._process_prices, data)
+
+    async def _keep_tick_lock(self) -> None:
+        while True:
+            try:
+                if self._lock_token is not None and not await asyncio.to_thread(
+                    self._tick_lock.extend, self._lock_token
+                ):
+                    logger.warning("Price tick lock lost")
+                    self._lock_token = None
+                if self._lock_token is None:
+                    self._lock_token = await asyncio.to_thread(self._tick_lock.acquire)
+                    if self._lock_token is None:
+                        logger.warning("Waiting for the price tick lock held by a polling tick")
+            except redis.RedisError as e:
+                logger.warning(f"Price tick lock renewal failed: {e!r}")
+            await asyncio.sleep(self._lock_renew_interval)
+
+    @staticmethod
+    def _load_instruments() -> list[Instrument]:
+        with db_session() as session:
+            index = subscription_index_sync.refresh(SubscriptionAlchemyRepo(session))
+            instruments = watched_instruments.get(index, InstrumentAlchemyRepo(session))
+        watched_instruments.set_polled({instrument.identity for instrument in instruments})
+        return instruments
+
+    def _process_prices(self, data: list[InstrumentPriceResult]) -> None:
+        ids = {row.instrument.identity for row in data}
+        with db_session() as session:
+            process_prices(session, data, stale_ids=ids - self._seen_ids)
+        self._seen_ids |= ids
+
+
+if __name__ == "__main__":
+    cfg = StreamerConfig()
+    streamer = Streamer(
+        TinkoffStreamPriceService(
+            token=cfg.TINKOFF_TOKEN,
+            url=cfg.TINKOFF_STREAM_URL,
+            flush_interval=cfg.STREAM_FLUSH_INTERVAL,
+            resubscribe_interval=cfg.STREAM_RESUBSCRIBE_INTERVAL,
+        ),
+        tick_lock=price_tick_lock,
+        lock_renew_interval=cfg.STREAM_LOCK_RENEW_INTERVAL,
+    )
+    streamer.run()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+
+import pytest
+import redis
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.orm import Session
+
+# worker.py reads its settings when imported; these defaults let modules importing it load without a .env.
+# Nothing in the unit tests connects to the database, Redis or the broker configured here.
+os.environ.setdefault(
+    "SQLALCHEMY_DATABASE_URI",
+    f"sqlite:///{os.path.join(tempfile.gettempdir(), 'stock_price_subscribe_tests.db')}",
+)
+os.environ.setdefault("BROKER_URL", "memory://")
+os.environ.setdefault("BOT_TOKEN", "test")
+os.environ.setdefault("TINKOFF_TOKEN", "test")
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("REDIS_PASSWORD", "")
+
+
+@pytest.fixture
+def redis_client() -> redis.Redis:
+    """A real Redis for the Lua scripts, from TEST_REDIS_URL; the database is flushed before and after the test"""
+    url = os.environ.get("TEST_REDIS_URL")
+    if not url:
+        pytest.skip("TEST_REDIS_URL is not set")
+    client = redis.Redis.from_url(url)
+    client.flushdb()
+    yield client
+    client.flushdb()
+
+
+@pytest.fixture(scope="session")
+def pg_engine() -> Engine:
+    """A migrated, disposable Postgres database from TEST_SQLALCHEMY_DATABASE_URI"""
+    url = os.environ.get("TEST_SQLALCHEMY_DATABASE_URI")
+    if not url:
+        pytest.skip("TEST_SQLALCHEMY_DATABASE_URI is not set")
+    engine = create_engine(url)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def pg_session(pg_engine: Engine) -> Session:
+    """A session whose commits only release savepoints; everything is rolled back after the test"""
+    with pg_engine.connect() as connection, connection.begin() as transaction:
+        session = Session(bind=connection, join_transaction_mode="create_savepoint")
+        yield session
+        session.close()
+        transaction.rollback()
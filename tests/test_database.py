@@ -0,0 +1,63 @@
+import os
+
+import pytest
+from sqlalchemy import text
+
+from services import database
+
+
+@pytest.fixture
+def database_url(tmp_path, monkeypatch: pytest.MonkeyPatch) -> str:
+    monkeypatch.setattr(database, "_engines", {})
+    monkeypatch.setattr(database, "_session_factories", {})
+    yield f"sqlite:///{tmp_path / 'test.db'}"
+    for engine in database._engines.values():
+        engine.dispose()
+
+
+def test_one_engine_and_session_factory_per_url(database_url: str, tmp_path) -> None:
+    engine = database.get_engine(database_url, pool_size=2)
+    factory = database.session_factory(database_url)
+
+    assert database.get_engine(database_url, pool_size=7) is engine
+    assert database.session_factory(database_url) is factory
+    assert factory.kw["bind"] is engine
+    assert engine.pool.size() == 2
+    assert database.get_engine(f"sqlite:///{tmp_path / 'other.db'}") is not engine
+
+
+def test_fork_hook_disposes_without_closing_the_parents_connections(
+    database_url: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    engine = database.get_engine(database_url)
+    calls = []
+    monkeypatch.setattr(engine, "dispose", lambda close=True: calls.append(close))
+
+    database._reset_pools_after_fork()
+
+    assert calls == [False]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_child_starts_with_an_empty_pool(database_url: str) -> None:
+    engine = database.get_engine(database_url)
+    with engine.connect() as conn:
+        conn.execute(text("select 1"))
+    assert engine.pool.checkedin() == 1
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        os.write(write_fd, str(engine.pool.checkedin()).encode())
+        os._exit(0)
+    os.close(write_fd)
+    child_checked_in = int(os.read(read_fd, 16))
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+
+    assert child_checked_in == 0
+    # The parent's pooled connection was left open by the child.
+    assert engine.pool.checkedin() == 1
+    with engine.connect() as conn:
+        assert conn.execute(text("select 1")).scalar() == 1
@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from services.digest import RedisAlertDigestBuffer, decode_messages, encode_messages, pack_messages
+from services.subscriptions import SubscriptionMessage
+
+
+def test_encoded_messages_concatenate() -> None:
+    first = ["AAA: 10 -> 12:30", ""]
+    second = ["Цена BBB 5:5 📈"]
+
+    assert decode_messages(encode_messages(first) + encode_messages(second)) == first + second
+
+
+def test_pack_messages_splits_only_between_messages() -> None:
+    assert pack_messages(["aaa", "bbb", "ccc"], max_length=8) == ["aaa\n\nbbb", "ccc"]
+    assert pack_messages(["a" * 10], max_length=8) == ["a" * 10]
+
+
+def test_pop_due_returns_chats_whose_window_elapsed(redis_client) -> None:
+    buffer = RedisAlertDigestBuffer(redis_client, window=0.2, max_message_length=4096, max_chats_per_pop=1)
+    buffer.add([SubscriptionMessage(user_chat_id=1, message="a1"), SubscriptionMessage(user_chat_id=2, message="b1")])
+    buffer.add([SubscriptionMessage(user_chat_id=1, message="a2")])
+    with buffer.pop_due() as popped:
+        assert popped == []
+
+    time.sleep(0.3)
+    buffer.add([SubscriptionMessage(user_chat_id=3, message="c1")])
+    with buffer.pop_due() as popped:
+        pass
+
+    assert sorted(popped, key=lambda msg: msg.user_chat_id) == [
+        SubscriptionMessage(user_chat_id=1, message="a1\n\na2"),
+        SubscriptionMessage(user_chat_id=2, message="b1"),
+    ]
+    assert redis_client.hkeys("digest:messages") == [b"3"]
+    assert redis_client.zrange("digest:due", 0, -1) == [b"3"]
+    assert redis_client.hlen("digest:leased") == 0
+    assert redis_client.zcard("digest:leases") == 0
+
+
+def test_messages_are_put_back_when_publishing_fails(redis_client) -> None:
+    buffer = RedisAlertDigestBuffer(redis_client, window=0, max_message_length=4096)
+    buffer.add([SubscriptionMessage(user_chat_id=1, message="a1")])
+
+    with pytest.raises(ConnectionError):
+        with buffer.pop_due() as popped:
+            assert popped == [SubscriptionMessage(user_chat_id=1, message="a1")]
+            buffer.add([SubscriptionMessage(user_chat_id=1, message="a2")])
+            raise ConnectionError("broker is down")
+
+    with buffer.pop_due() as popped:
+        assert popped == [SubscriptionMessage(user_chat_id=1, message="a1\n\na2")]
+    with buffer.pop_due() as popped:
+        assert popped == []
+
+
+def test_expired_lease_is_popped_again(redis_client) -> None:
+    buffer = RedisAlertDigestBuffer(redis_client, window=0, max_message_length=4096, lease_timeout=0.1)
+    buffer.add([SubscriptionMessage(user_chat_id=1, message="a1")])
+
+    # A process dying inside the block neither confirms nor releases the lease.
+    lease = buffer.pop_due()
+    assert lease.__enter__() == [SubscriptionMessage(user_chat_id=1, message="a1")]
+    with buffer.pop_due() as popped:
+        assert popped == []
+
+    time.sleep(0.2)
+    with buffer.pop_due() as popped:
+        assert popped == [SubscriptionMessage(user_chat_id=1, message="a1")]
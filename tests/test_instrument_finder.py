@@ -0,0 +1,166 @@
+import decimal
+
+import pytest
+import requests
+
+from enums import InstrumentTypeEnum
+from services import instrument_finder
+from models.domain.instument import Instrument
+from services.instrument_finder import (
+    DEFAULT_PRECISION,
+    CachedInstrumentFinderService,
+    InstrumentFinderService,
+    InstrumentNotFoundError,
+    TinkoffInstrumentFinderService,
+    precision_from_increment,
+)
+
+
+@pytest.mark.parametrize(
+    ("increment", "precision"),
+    [
+        ("0.01", 2),
+        ("0.010", 2),
+        ("0.0005", 4),
+        ("0.5", 1),
+        ("1", 0),
+        ("10", 0),
+        ("1E+1", 0),
+    ],
+)
+def test_precision_from_increment(increment: str, precision: int) -> None:
+    assert precision_from_increment(decimal.Decimal(increment)) == precision
+
+
+@pytest.mark.parametrize("increment", [None, decimal.Decimal("0")])
+def test_precision_from_unknown_increment_is_the_default(increment: decimal.Decimal | None) -> None:
+    assert precision_from_increment(increment) == DEFAULT_PRECISION
+
+
+class FakeResponse:
+    def __init__(self, data: dict) -> None:
+        self.data = data
+
+    def json(self) -> dict:
+        return self.data
+
+
+def test_failed_catalog_request_is_retried_only_after_the_retry_interval(monkeypatch: pytest.MonkeyPatch) -> None:
+    now, requested = [1000.0], []
+    responses = [
+        requests.ConnectionError("down"),
+        FakeResponse({"instruments": [{"figi": "F1", "minPriceIncrement": {"units": "0", "nano": 10000000}}]}),
+    ]
+
+    def post(url: str, **kwargs) -> FakeResponse:
+        requested.append(url)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(instrument_finder.requests, "post", post)
+    monkeypatch.setattr(instrument_finder.time, "monotonic", lambda: now[0])
+    finder = TinkoffInstrumentFinderService(token="test", catalog_ttl=3600, catalog_retry_interval=60)
+
+    assert finder._get_catalog(InstrumentTypeEnum.SHARE) == {}
+    now[0] += 30
+    assert finder._get_catalog(InstrumentTypeEnum.SHARE) == {}
+    assert len(requested) == 1
+    now[0] += 31
+    assert finder._get_catalog(InstrumentTypeEnum.SHARE) == {"F1": decimal.Decimal("0.01")}
+    now[0] += 3000
+    assert finder._get_catalog(InstrumentTypeEnum.SHARE) == {"F1": decimal.Decimal("0.01")}
+    assert len(requested) == 2
+
+
+def test_error_response_gives_no_min_price_increment(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        instrument_finder.requests, "post", lambda url, **kwargs: FakeResponse({"code": 5, "message": "not found"})
+    )
+    finder = TinkoffInstrumentFinderService(token="test")
+
+    assert finder._get_min_price_increment("UNKNOWN") is None
+
+
+def test_find_instrument_info_requests_only_the_found_instrument(monkeypatch: pytest.MonkeyPatch) -> None:
+    requested = []
+    responses = {
+        "FindInstrument": {
+            "instruments": [
+                {"ticker": "SBERP", "figi": "F2", "isin": "I2", "instrumentType": "share"},
+                {"ticker": "SBER", "figi": "F1", "isin": "I1", "instrumentType": "share"},
+            ]
+        },
+        "GetInstrumentBy": {"instrument": {"minPriceIncrement": {"units": "0", "nano": 500000000}}},
+    }
+
+    def post(url: str, json: dict, **kwargs) -> FakeResponse:
+        method = url.rsplit("/", 1)[1]
+        requested.append((method, json.get("id")))
+        return FakeResponse(responses[method])
+
+    monkeypatch.setattr(instrument_finder.requests, "post", post)
+
+    instrument = TinkoffInstrumentFinderService(token="test").find_instrument_info("SBER")
+
+    assert (instrument.figi, instrument.min_price_increment, instrument.precision) == ("F1", decimal.Decimal("0.5"), 1)
+    assert requested == [("FindInstrument", None), ("GetInstrumentBy", "F1")]
+
+
+class CountingFinder(InstrumentFinderService):
+    def __init__(self) -> None:
+        self.requested: list[str] = []
+
+    def find_instrument_info(self, ticker: str) -> Instrument:
+        self.requested.append(ticker)
+        if ticker.startswith("X"):
+            raise InstrumentNotFoundError
+        return Instrument(
+            ticker=ticker, figi=f"FIGI_{ticker}", isin=f"ISIN_{ticker}", type=InstrumentTypeEnum.SHARE, precision=2
+        )
+
+    def find_min_price_increments(self, figis) -> dict[str, decimal.Decimal]:
+        return {}
+
+
+def test_cached_finder_caches_hits_and_misses_and_evicts_the_oldest(redis_client) -> None:
+    finder = CountingFinder()
+    cached = CachedInstrumentFinderService(finder, redis_client, max_entries=2)
+
+    assert cached.find_instrument_info("AAA").figi == "FIGI_AAA"
+    assert cached.find_instrument_info("AAA").figi == "FIGI_AAA"
+    for _ in range(2):
+        with pytest.raises(InstrumentNotFoundError):
+            cached.find_instrument_info("XXX")
+    assert finder.requested == ["AAA", "XXX"]
+
+    cached.find_instrument_info("BBB")
+    assert sorted(redis_client.hkeys("instrument_finder:entries")) == [b"BBB", b"XXX"]
+    assert redis_client.zcard("instrument_finder:written_at") == 2
+    cached.find_instrument_info("AAA")
+    assert finder.requested == ["AAA", "XXX", "BBB", "AAA"]
+
+
+def test_cached_finder_ignores_expired_entries(redis_client) -> None:
+    finder = CountingFinder()
+    cached = CachedInstrumentFinderService(finder, redis_client, miss_ttl=0)
+
+    for _ in range(2):
+        with pytest.raises(InstrumentNotFoundError):
+            cached.find_instrument_info("XXX")
+
+    assert finder.requested == ["XXX", "XXX"]
+
+
+def test_invalidated_tickers_are_found_again(redis_client) -> None:
+    finder = CountingFinder()
+    cached = CachedInstrumentFinderService(finder, redis_client)
+    cached.find_instrument_info("AAA")
+    cached.find_instrument_info("BBB")
+
+    cached.invalidate(["AAA"])
+    cached.find_instrument_info("AAA")
+    cached.find_instrument_info("BBB")
+
+    assert finder.requested == ["AAA", "BBB", "AAA"]
@@ -0,0 +1,23 @@
+import decimal
+
+from sqlalchemy.orm import Session
+
+from enums import InstrumentTypeEnum
+from repo.cache import RepositoryCache
+from repo.instrument import InstrumentAlchemyRepo
+from services.uow import AlchemyUoW
+
+
+def test_update_min_price_increments_invalidates_cached_instruments(pg_session: Session) -> None:
+    cache = RepositoryCache()
+    uow = AlchemyUoW(pg_session, cache=cache)
+    repo = InstrumentAlchemyRepo(pg_session, cache=cache)
+    repo.create(ticker="INCTEST", figi="FIGI_INCTEST", isin="ISIN_INCTEST", type_=InstrumentTypeEnum.SHARE, precision=2)
+    uow.commit()
+    instrument = repo.get_by_ticker("INCTEST")
+
+    repo.update_min_price_increments([(instrument.identity, decimal.Decimal("0.5"), 1)])
+    uow.commit()
+    updated = repo.get_by_ticker("INCTEST")
+
+    assert (updated.min_price_increment, updated.precision) == (decimal.Decimal("0.5"), 1)
@@ -0,0 +1,40 @@
+import pytest
+
+from services.subscriptions import SubscriptionMessage
+from worker import chunk_messages_by_chat
+
+
+def messages_of(*chat_ids: int) -> list[SubscriptionMessage]:
+    return [SubscriptionMessage(user_chat_id=chat_id, message=f"{chat_id}-{i}") for i, chat_id in enumerate(chat_ids)]
+
+
+def chats(chunks: list[list[SubscriptionMessage]]) -> list[list[int]]:
+    return [[msg.user_chat_id for msg in chunk] for chunk in chunks]
+
+
+@pytest.mark.parametrize(
+    ("chat_ids", "size", "expected"),
+    [
+        ((), 3, []),
+        ((1, 2, 3), 3, [[1, 2, 3]]),
+        ((1, 2, 1, 3, 2, 4), 3, [[1, 1], [2, 2, 3], [4]]),
+        ((1, 1, 2, 2, 3), 2, [[1, 1], [2, 2], [3]]),
+    ],
+)
+def test_chunks_never_split_a_chat(chat_ids: tuple[int, ...], size: int, expected: list[list[int]]) -> None:
+    messages = messages_of(*chat_ids)
+
+    chunks = chunk_messages_by_chat(messages, size=size)
+
+    assert chats(chunks) == expected
+    for chat_id in set(chat_ids):
+        assert sum(chat_id in chunk for chunk in chats(chunks)) == 1
+    # No message is lost or duplicated.
+    assert sorted(msg.message for chunk in chunks for msg in chunk) == sorted(msg.message for msg in messages)
+
+
+def test_a_chat_larger_than_size_gets_a_chunk_of_its_own() -> None:
+    chunks = chunk_messages_by_chat(messages_of(1, 2, 2, 2, 2, 2, 3), size=3)
+
+    assert chats(chunks) == [[1], [2, 2, 2, 2, 2], [3]]
+    assert [msg.message for msg in chunks[1]] == ["2-1", "2-2", "2-3", "2-4", "2-5"]
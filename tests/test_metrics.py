@@ -0,0 +1,69 @@
+import socket
+import urllib.error
+import urllib.request
+
+import pytest
+import redis
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+
+from services.metrics import RedisMetrics, start_metrics_server
+
+
+def test_render_groups_samples_by_metric_and_orders_buckets(redis_client) -> None:
+    metrics = RedisMetrics(redis_client, buckets=(0.5, 2, 10))
+    metrics.inc("ticks_total")
+    metrics.inc("ticks_total", 2)
+    metrics.set_gauge("watched_instruments", 7, labels={"source": "tinkoff"})
+    metrics.observe("stage_seconds", 1, labels={"stage": "fetch"})
+    metrics.observe("stage_seconds", 3, labels={"stage": "fetch"})
+    metrics.observe("stage_seconds", 0.1, labels={"stage": "alerts"})
+
+    assert metrics.render().splitlines() == [
+        "# TYPE ticks_total counter",
+        "ticks_total 3.0",
+        "# TYPE watched_instruments gauge",
+        'watched_instruments{source="tinkoff"} 7.0',
+        "# TYPE stage_seconds histogram",
+        'stage_seconds_bucket{le="0.5",stage="alerts"} 1.0',
+        'stage_seconds_bucket{le="2",stage="alerts"} 1.0',
+        'stage_seconds_bucket{le="10",stage="alerts"} 1.0',
+        'stage_seconds_bucket{le="+Inf",stage="alerts"} 1.0',
+        'stage_seconds_bucket{le="2",stage="fetch"} 1.0',
+        'stage_seconds_bucket{le="10",stage="fetch"} 2.0',
+        'stage_seconds_bucket{le="+Inf",stage="fetch"} 2.0',
+        'stage_seconds_count{stage="alerts"} 1.0',
+        'stage_seconds_count{stage="fetch"} 2.0',
+        'stage_seconds_sum{stage="alerts"} 0.1',
+        'stage_seconds_sum{stage="fetch"} 4.0',
+    ]
+
+
+def test_sort_key_orders_buckets_by_numeric_bound() -> None:
+    lines = ['h_bucket{le="+Inf"} 3', 'h_bucket{le="10"} 2', 'h_bucket{le="2.5"} 1', "h_count 3"]
+
+    assert sorted(lines, key=RedisMetrics._sort_key) == [
+        'h_bucket{le="2.5"} 1',
+        'h_bucket{le="10"} 2',
+        'h_bucket{le="+Inf"} 3',
+        "h_count 3",
+    ]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_metrics_server_answers_503_when_redis_is_down() -> None:
+    metrics = RedisMetrics(redis.Redis(host="127.0.0.1", port=free_port(), retry=Retry(NoBackoff(), 0)))
+    server = start_metrics_server(metrics, port=free_port(), host="127.0.0.1")
+    try:
+        with pytest.raises(urllib.error.HTTPError) as exc_info:
+            urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics", timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert exc_info.value.code == 503
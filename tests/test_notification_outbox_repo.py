@@ -0,0 +1,19 @@
+import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from repo.notification_outbox import NotificationOutboxAlchemyRepo
+
+CHAT_ID = 9_100_000_002
+
+
+def test_delete_delivered_before_compares_instants_whatever_the_session_time_zone(pg_session: Session) -> None:
+    pg_session.execute(text("SET LOCAL TIME ZONE 'Asia/Vladivostok'"))
+    repo = NotificationOutboxAlchemyRepo(pg_session)
+    repo.add_many([(CHAT_ID, "delivered")])
+    repo.mark_delivered([message.identity for message in repo.claim_pending(limit=1000) if message.chat_id == CHAT_ID])
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+
+    assert repo.delete_delivered_before(now - datetime.timedelta(hours=1)) == 0
+    assert repo.delete_delivered_before(now + datetime.timedelta(minutes=1)) == 1
@@ -0,0 +1,132 @@
+import contextlib
+from typing import Iterator
+
+import pytest
+
+from models.domain.notification_outbox import OutboxMessage
+from models.domain.subscription_change_outbox import OutboxSubscriptionChange
+from services.outbox import OutboxRelay, SubscriptionChangesRelay
+from services.subscription_changes import SubscriptionChange
+from services.subscriptions import SubscriptionMessage
+
+
+class FakeUoW:
+    def __init__(self) -> None:
+        self.commits = 0
+
+    def commit(self) -> None:
+        self.commits += 1
+
+    def rollback(self) -> None:
+        pass
+
+
+class FakeNotificationOutboxRepo:
+    def __init__(self, messages: list[tuple[int, str]]) -> None:
+        self.pending = [
+            OutboxMessage(id=id_, chat_id=chat_id, message=message)
+            for id_, (chat_id, message) in enumerate(messages, start=1)
+        ]
+        self.delivered: list[int] = []
+
+    def add_many(self, messages: list[tuple[int, str]]) -> None:
+        raise NotImplementedError
+
+    def claim_pending(self, limit: int) -> list[OutboxMessage]:
+        return self.pending[:limit]
+
+    def mark_delivered(self, ids: list[int]) -> None:
+        self.delivered += ids
+        self.pending = [msg for msg in self.pending if msg.identity not in ids]
+
+    def delete_delivered_before(self, dt) -> int:
+        raise NotImplementedError
+
+
+class FakeDigestBuffer:
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+        self.buffered: list[SubscriptionMessage] = []
+
+    def add(self, messages: list[SubscriptionMessage]) -> None:
+        if self.fail:
+            raise ConnectionError("redis is down")
+        self.buffered += messages
+
+    @contextlib.contextmanager
+    def pop_due(self) -> Iterator[list[SubscriptionMessage]]:
+        yield self.buffered
+
+
+class FakeSubscriptionChangeOutboxRepo:
+    def __init__(self, changes: list[tuple[int, int | None]]) -> None:
+        self.pending = [
+            OutboxSubscriptionChange(id=id_, user_id=user_id, instrument_id=instrument_id)
+            for id_, (user_id, instrument_id) in enumerate(changes, start=1)
+        ]
+
+    def add_many(self, changes: list[tuple[int, int | None]]) -> None:
+        raise NotImplementedError
+
+    def claim_pending(self, limit: int) -> list[OutboxSubscriptionChange]:
+        return self.pending[:limit]
+
+    def delete_many(self, ids: list[int]) -> None:
+        self.pending = [change for change in self.pending if change.identity not in ids]
+
+
+class FakeChangesPublisher:
+    def __init__(self) -> None:
+        self.batches: list[list[SubscriptionChange]] = []
+
+    def publish(self, changes: list[SubscriptionChange]) -> None:
+        self.batches.append(changes)
+
+
+def test_relay_publishes_and_deletes_pending_changes_in_batches() -> None:
+    uow, publisher = FakeUoW(), FakeChangesPublisher()
+    repo = FakeSubscriptionChangeOutboxRepo([(1, 10), (1, None), (2, 20)])
+
+    relayed = SubscriptionChangesRelay(uow=uow, outbox_repo=repo, publisher=publisher, batch_size=2).relay()
+
+    assert relayed == 3
+    assert publisher.batches == [
+        [SubscriptionChange(user_id=1, instrument_id=10), SubscriptionChange(user_id=1)],
+        [SubscriptionChange(user_id=2, instrument_id=20)],
+    ]
+    assert repo.pending == []
+    assert uow.commits == 2
+
+
+def test_relay_of_an_empty_outbox_commits_nothing() -> None:
+    uow = FakeUoW()
+
+    relayed = SubscriptionChangesRelay(
+        uow=uow, outbox_repo=FakeSubscriptionChangeOutboxRepo([]), publisher=FakeChangesPublisher()
+    ).relay()
+
+    assert relayed == 0
+    assert uow.commits == 0
+
+
+def test_outbox_relay_buffers_and_marks_delivered_in_batches() -> None:
+    uow, buffer = FakeUoW(), FakeDigestBuffer()
+    repo = FakeNotificationOutboxRepo([(1, "a"), (2, "b"), (1, "c")])
+
+    relayed = OutboxRelay(uow=uow, outbox_repo=repo, digest_buffer=buffer, batch_size=2).relay()
+
+    assert relayed == 3
+    assert [(msg.user_chat_id, msg.message) for msg in buffer.buffered] == [(1, "a"), (2, "b"), (1, "c")]
+    assert repo.delivered == [1, 2, 3]
+    assert uow.commits == 2
+
+
+def test_outbox_relay_leaves_messages_pending_when_buffering_fails() -> None:
+    uow = FakeUoW()
+    repo = FakeNotificationOutboxRepo([(1, "a")])
+
+    with pytest.raises(ConnectionError):
+        OutboxRelay(uow=uow, outbox_repo=repo, digest_buffer=FakeDigestBuffer(fail=True)).relay()
+
+    assert repo.delivered == []
+    assert uow.commits == 0
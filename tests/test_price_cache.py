@@ -0,0 +1,41 @@
+import datetime
+import decimal
+
+import redis
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+
+from services.price_cache import CachedPrice, RedisHotPriceCache
+
+
+def test_cache_failures_are_not_raised_to_the_caller() -> None:
+    unreachable = redis.Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.1, retry=Retry(NoBackoff(), 0))
+    cache = RedisHotPriceCache(unreachable)
+    price = CachedPrice(
+        instrument_id=1,
+        ticker="SBER",
+        price=decimal.Decimal("100"),
+        precision=2,
+        updated_at=datetime.datetime.now(tz=datetime.timezone.utc),
+    )
+
+    cache.set_many([price])
+    assert cache.get("SBER") is None
+
+
+def test_set_many_round_trips_prices(redis_client) -> None:
+    cache = RedisHotPriceCache(redis_client, batch_size=1)
+    prices = [
+        CachedPrice(
+            instrument_id=id_,
+            ticker=ticker,
+            price=decimal.Decimal("1.5"),
+            precision=1,
+            updated_at=datetime.datetime.now(tz=datetime.timezone.utc),
+        )
+        for id_, ticker in [(1, "SBER"), (2, "GAZP")]
+    ]
+
+    cache.set_many(prices)
+
+    assert cache.get("GAZP") == prices[1]
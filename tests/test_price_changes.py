@@ -0,0 +1,70 @@
+import decimal
+
+import pytest
+
+import worker
+from enums import InstrumentTypeEnum
+from models.domain.instument import Instrument
+from services.metrics import NullMetrics
+from services.price import InstrumentPriceResult
+from services.price_changes import RedisPriceChangeFilter
+from services.price_updater import UpdatedPriceResult
+
+
+def price(instrument_id: int, value: str) -> InstrumentPriceResult:
+    instrument = Instrument(
+        id=instrument_id,
+        ticker=f"T{instrument_id}",
+        figi=f"FIGI{instrument_id}",
+        isin=f"ISIN{instrument_id}",
+        type=InstrumentTypeEnum.SHARE,
+        precision=2,
+    )
+    return InstrumentPriceResult(instrument=instrument, new_price=decimal.Decimal(value))
+
+
+def test_unchanged_prices_are_skipped(redis_client) -> None:
+    price_filter = RedisPriceChangeFilter(redis_client)
+    price_filter.remember([price(1, "100"), price(2, "50")])
+
+    changed = price_filter.filter_changed([price(1, "100.00"), price(2, "51"), price(3, "10")])
+
+    assert [row.instrument.identity for row in changed] == [2, 3]
+    assert redis_client.ttl("last_price") > 0
+
+
+class FakePriceUpdater:
+    def __init__(self, **kwargs) -> None:
+        pass
+
+    def update_prices(self, data: list[InstrumentPriceResult]) -> list[UpdatedPriceResult]:
+        return [UpdatedPriceResult(instrument=row.instrument, old_price=None, new_price=row.new_price) for row in data]
+
+
+class FailingSubscriptionsService:
+    def __init__(self, **kwargs) -> None:
+        pass
+
+    def get_messages_and_update(self, prices: list[UpdatedPriceResult]) -> list:
+        raise RuntimeError("commit failed")
+
+
+class FakeIndexSync:
+    def refresh(self, subscription_repo) -> None:
+        return None
+
+
+def test_an_uncommitted_tick_is_not_remembered(redis_client, monkeypatch: pytest.MonkeyPatch) -> None:
+    price_filter = RedisPriceChangeFilter(redis_client)
+    monkeypatch.setattr(worker, "price_change_filter", price_filter)
+    monkeypatch.setattr(worker, "metrics", NullMetrics())
+    monkeypatch.setattr(worker, "PriceUpdaterServiceImpl", FakePriceUpdater)
+    monkeypatch.setattr(worker, "DefaultSubscriptionsService", FailingSubscriptionsService)
+    monkeypatch.setattr(worker, "subscription_index_sync", FakeIndexSync())
+    prices = [price(1, "100"), price(2, "50")]
+
+    with pytest.raises(RuntimeError):
+        worker.process_prices(None, prices)
+
+    assert redis_client.exists("last_price") == 0
+    assert price_filter.filter_changed(prices) == prices
@@ -0,0 +1,146 @@
+import datetime
+import decimal
+
+import pytest
+
+from enums import InstrumentTypeEnum
+from models.domain.instrument_price import InstrumentPrice
+from models.domain.instument import Instrument
+from services.commands.dto import CommandPriceData
+from services.commands.handler.price import DefaultPriceCommandHandler
+from services.price import InstrumentPriceResult
+from services.price_cache import CachedPrice
+
+SBER = Instrument(id=1, ticker="SBER", figi="FIGI_SBER", isin="ISIN_SBER", type=InstrumentTypeEnum.SHARE, precision=2)
+
+
+class FakeInstrumentRepo:
+    def get_by_ticker(self, ticker: str) -> Instrument | None:
+        return SBER if ticker == SBER.ticker else None
+
+
+class FakeInstrumentPriceRepo:
+    def __init__(self, price: str | None) -> None:
+        self.price = price
+
+    def get_by_instrument_id(self, instrument_id: int) -> InstrumentPrice | None:
+        return InstrumentPrice(instrument=SBER, price=decimal.Decimal(self.price)) if self.price else None
+
+
+class FakePriceCache:
+    def __init__(self, cached: list[CachedPrice] | None = None) -> None:
+        self.prices = {row.ticker: row for row in cached or []}
+
+    def get(self, ticker: str) -> CachedPrice | None:
+        return self.prices.get(ticker)
+
+    def set_many(self, prices: list[CachedPrice]) -> None:
+        self.prices.update({row.ticker: row for row in prices})
+
+
+class FakeWatchedInstruments:
+    def __init__(self, polled: bool) -> None:
+        self.polled = polled
+        self.watched: list[int] = []
+
+    def watch(self, instrument_id: int) -> bool:
+        self.watched.append(instrument_id)
+        return self.polled
+
+
+class FakePriceService:
+    def __init__(self, price: str) -> None:
+        self.price = price
+        self.calls = 0
+
+    def get_prices(self, instruments: list[Instrument]) -> list[InstrumentPriceResult]:
+        self.calls += 1
+        return [
+            InstrumentPriceResult(instrument=instrument, new_price=decimal.Decimal(self.price))
+            for instrument in instruments
+        ]
+
+
+def cached_price(price: str) -> CachedPrice:
+    return CachedPrice(
+        instrument_id=SBER.identity,
+        ticker=SBER.ticker,
+        price=decimal.Decimal(price),
+        precision=SBER.precision,
+        updated_at=datetime.datetime.now(tz=datetime.timezone.utc),
+    )
+
+
+def make_handler(
+    db_price: str | None = "100",
+    cache: FakePriceCache | None = None,
+    watched: FakeWatchedInstruments | None = None,
+    price_service: FakePriceService | None = None,
+) -> DefaultPriceCommandHandler:
+    return DefaultPriceCommandHandler(
+        instrument_repo=FakeInstrumentRepo(),
+        instrument_price_repo=FakeInstrumentPriceRepo(db_price),
+        price_cache=cache,
+        watched_instruments=watched,
+        price_service=price_service,
+    )
+
+
+def test_polled_instrument_is_served_from_the_cache() -> None:
+    price_service = FakePriceService("120")
+    handler = make_handler(
+        cache=FakePriceCache([cached_price("110")]),
+        watched=FakeWatchedInstruments(polled=True),
+        price_service=price_service,
+    )
+
+    result = handler.handle(user_id=1, data=CommandPriceData(ticker="sber"))
+
+    assert result.price == decimal.Decimal("110")
+    assert price_service.calls == 0
+
+
+def test_unpolled_instrument_is_fetched_live_and_cached() -> None:
+    cache = FakePriceCache([cached_price("110")])
+    handler = make_handler(
+        cache=cache,
+        watched=FakeWatchedInstruments(polled=False),
+        price_service=FakePriceService("120"),
+    )
+
+    result = handler.handle(user_id=1, data=CommandPriceData(ticker="SBER"))
+
+    assert result.price == decimal.Decimal("120")
+    assert cache.get("SBER").price == decimal.Decimal("120")
+
+
+def test_stored_price_is_returned_but_not_cached() -> None:
+    cache = FakePriceCache()
+    handler = make_handler(cache=cache, watched=FakeWatchedInstruments(polled=True))
+
+    result = handler.handle(user_id=1, data=CommandPriceData(ticker="SBER"))
+
+    assert result.price == decimal.Decimal("100")
+    assert cache.get("SBER") is None
+
+
+@pytest.mark.parametrize(("ticker", "db_price"), [("UNKNOWN", "100"), ("SBER", None)])
+def test_unknown_ticker_or_missing_price_is_not_found(ticker: str, db_price: str | None) -> None:
+    handler = make_handler(db_price=db_price)
+
+    with pytest.raises(DefaultPriceCommandHandler.InstrumentNotFoundError):
+        handler.handle(user_id=1, data=CommandPriceData(ticker=ticker))
+
+
+@pytest.mark.parametrize("cached", [True, False])
+def test_unpolled_instrument_is_watched_once(cached: bool) -> None:
+    watched = FakeWatchedInstruments(polled=False)
+    handler = make_handler(
+        cache=FakePriceCache([cached_price("110")] if cached else []),
+        watched=watched,
+        price_service=FakePriceService("120"),
+    )
+
+    handler.handle(user_id=1, data=CommandPriceData(ticker="SBER"))
+
+    assert watched.watched == [SBER.identity]
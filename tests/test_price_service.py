@@ -0,0 +1,33 @@
+import decimal
+import threading
+import time
+
+from enums import InstrumentTypeEnum
+from models.domain.instument import Instrument
+from services.price import TinkoffPriceService
+
+INSTRUMENTS = [
+    Instrument(id=i, ticker=f"T{i}", figi=f"FIGI{i}", isin=f"ISIN{i}", type=InstrumentTypeEnum.SHARE, precision=2)
+    for i in range(1, 5)
+]
+
+
+def test_get_prices_skips_chunks_past_deadline(monkeypatch) -> None:
+    release = threading.Event()
+    service = TinkoffPriceService(token="test", chunk_size=1, max_workers=2, deadline=0.2)
+
+    def get_chunk_prices(figis: list[str]) -> dict[str, decimal.Decimal]:
+        if figis == ["FIGI1"]:
+            return {"FIGI1": decimal.Decimal("1.5")}
+        release.wait(5)
+        return {figi: decimal.Decimal("2") for figi in figis}
+
+    monkeypatch.setattr(service, "_get_chunk_prices", get_chunk_prices)
+    started = time.monotonic()
+    try:
+        results = service.get_prices(INSTRUMENTS)
+    finally:
+        release.set()
+
+    assert time.monotonic() - started < 1
+    assert [(result.instrument.identity, result.new_price) for result in results] == [(1, decimal.Decimal("1.5"))]
@@ -0,0 +1,39 @@
+import pytest
+
+import worker
+from services.metrics import NullMetrics
+
+
+class FakeLock:
+    def __init__(self) -> None:
+        self.released: list[str] = []
+
+    def release(self, token: str) -> None:
+        self.released.append(token)
+
+
+class FakeWatchedInstruments:
+    def __init__(self) -> None:
+        self.finished: list[str] = []
+
+    def finish_tick(self, tick_id: str) -> None:
+        self.finished.append(tick_id)
+
+
+def test_chord_errback_releases_the_lock_and_keeps_the_polled_shards(monkeypatch: pytest.MonkeyPatch) -> None:
+    lock, watched = FakeLock(), FakeWatchedInstruments()
+    monkeypatch.setattr(worker, "price_tick_lock", lock)
+    monkeypatch.setattr(worker, "watched_instruments", watched)
+    monkeypatch.setattr(worker, "metrics", NullMetrics())
+    errback = worker.abort_price_tick.s(lock_token="token")
+
+    # Celery calls a chord errback taking (request, exc, traceback) in place, with the signature's kwargs merged in.
+    errback(None, RuntimeError("shard failed"), None)
+
+    assert watched.finished == ["token"]
+    assert lock.released == ["token"]
+
+
+def test_price_tick_lock_outlives_a_chord_run_one_task_at_a_time() -> None:
+    tasks = worker.cfg.PRICE_TICK_SHARDS * len(worker.price_sources) + 1
+    assert worker.price_tick_lock._timeout_ms > tasks * worker.TASK_TIME_LIMIT * 1000
@@ -0,0 +1,401 @@
+"""
+Query plan regression tests.
+
+Seeds a large synthetic dataset inside a transaction, runs every repository query against it,
+EXPLAINs each statement the repositories sent and fails when a filtered query falls back to a
+sequential scan of one of the application tables, i.e. one that filters the rows it reads.
+Unfiltered scans feeding a hash join and tables of up to SMALL_TABLE_ROWS rows, e.g. the instruments,
+are left to the planner, which picks them by the sampled statistics. COPY loads have no plan, so
+InstrumentPriceHistoryAlchemyRepo.append is not covered. The transaction is rolled back at the end,
+but the tests should still be pointed at a disposable database:
+
+    TEST_SQLALCHEMY_DATABASE_URI=postgresql://... pytest tests/test_query_plans.py
+"""
+import datetime
+import decimal
+import json
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+
+import pytest
+from pydantic_settings import BaseSettings
+from sqlalchemy import Connection, Engine, event, text
+from sqlalchemy.orm import Session
+
+from enums import CandleResolutionEnum, SubscriptionTypeEnum
+from repo.instrument import InstrumentAlchemyRepo
+from repo.instrument_price import InstrumentPriceAlchemyRepo
+from repo.instrument_price_history import InstrumentPriceHistoryAlchemyRepo
+from repo.notification_outbox import NotificationOutboxAlchemyRepo
+from repo.subscription import SubscriptionAlchemyRepo
+from repo.subscription_change_outbox import SubscriptionChangeOutboxAlchemyRepo
+from repo.user import UserAlchemyRepo
+
+TABLES = {
+    "instrument",
+    "instrument_price",
+    "instrument_price_candle",
+    "notification_outbox",
+    "subscription",
+    "subscription_change_outbox",
+    "user",
+}
+HISTORY_PARTITION_PREFIX = "instrument_price_history_p"
+SMALL_TABLE_ROWS = 10_000
+TICKER_PREFIX = "QP"
+CHAT_ID_OFFSET = 9_000_000_000
+
+
+class QueryPlansConfig(BaseSettings):
+    QUERY_PLANS_INSTRUMENTS: int = 2_000
+    QUERY_PLANS_USERS: int = 20_000
+    QUERY_PLANS_SUBSCRIPTIONS: int = 500_000
+    QUERY_PLANS_OUTBOX_MESSAGES: int = 500_000
+
+
+@dataclass
+class Seed:
+    instrument_ids: list[int]
+    user_ids: list[int]
+    subscription_ids: list[int]
+    outbox_ids: list[int]
+    change_ids: list[int]
+    large_tables: set[str]
+
+
+@dataclass
+class Case:
+    name: str
+    run: Callable[[Session, Seed], Any]
+    # Queries that read a whole table by design, e.g. the subscription index load.
+    full_scan: bool = False
+    statements: list[tuple[str, Any]] = field(default_factory=list)
+
+
+def seed(session: Session, cfg: QueryPlansConfig) -> Seed:
+    params = {
+        "instruments": cfg.QUERY_PLANS_INSTRUMENTS,
+        "users": cfg.QUERY_PLANS_USERS,
+        "subscriptions": cfg.QUERY_PLANS_SUBSCRIPTIONS,
+        "outbox_messages": cfg.QUERY_PLANS_OUTBOX_MESSAGES,
+        "prefix": TICKER_PREFIX,
+        "offset": CHAT_ID_OFFSET,
+    }
+    session.execute(
+        text(
+            "INSERT INTO instrument (ticker, figi, isin, type, precision) "
+            "SELECT :prefix || g, 'FIGI' || g, 'ISIN' || g, 'SHARE', 2 FROM generate_series(1, :instruments) g"
+        ),
+        params,
+    )
+    session.execute(
+        text(
+            'INSERT INTO "user" (chat_id, username) '
+            "SELECT :offset + g, 'qp_user_' || g FROM generate_series(1, :users) g"
+        ),
+        params,
+    )
+    session.execute(
+        text(
+            "INSERT INTO instrument_price (instrument_id, price) "
+            "SELECT id, 100 FROM instrument WHERE ticker LIKE :prefix || '%' ON CONFLICT DO NOTHING"
+        ),
+        params,
+    )
+    session.execute(
+        text(
+            "INSERT INTO subscription (user_id, instrument_id, price, type, is_active, crossing_disabled) "
+            "SELECT u.id, i.id, round((random() * 200)::numeric, 2), "
+            "(ARRAY['ALWAYS', 'ONETIME', 'CROSSING']::subscriptiontypeenum[])[1 + g % 3], "
+            "random() < 0.8, random() < 0.1 "
+            "FROM generate_series(1, :subscriptions) g "
+            'JOIN "user" u ON u.chat_id = :offset + 1 + g % :users '
+            "JOIN instrument i ON i.ticker = :prefix || (1 + g % :instruments) "
+            # Random prices repeat, and a user has one active subscription per instrument and price.
+            "ON CONFLICT DO NOTHING"
+        ),
+        params,
+    )
+    today = datetime.datetime.now(tz=datetime.timezone.utc).date()
+    InstrumentPriceHistoryAlchemyRepo(session).create_partitions(today - datetime.timedelta(days=1), 2)
+    session.execute(
+        text(
+            "INSERT INTO instrument_price_history (instrument_id, price, created_at) "
+            "SELECT i.id, 100, now() - g * interval '15 seconds' "
+            "FROM (SELECT id FROM instrument WHERE ticker LIKE :prefix || '%' ORDER BY id LIMIT 100) i "
+            "CROSS JOIN generate_series(1, 480) g"
+        ),
+        params,
+    )
+    session.execute(
+        text(
+            "INSERT INTO instrument_price_candle (instrument_id, resolution, bucket, open, high, low, close) "
+            "SELECT i.id, 'MINUTE', date_trunc('minute', now()) - g * interval '1 minute', 100, 101, 99, 100 "
+            "FROM (SELECT id FROM instrument WHERE ticker LIKE :prefix || '%' ORDER BY id LIMIT 100) i "
+            "CROSS JOIN generate_series(1, 1440) g"
+        ),
+        params,
+    )
+    session.execute(
+        text(
+            "INSERT INTO subscription_change_outbox (user_id, instrument_id) "
+            "SELECT u.id, NULLIF(g % 10, 0) FROM generate_series(1, :outbox_messages / 10) g "
+            'JOIN "user" u ON u.chat_id = :offset + 1 + g % :users'
+        ),
+        params,
+    )
+    session.execute(
+        text(
+            "INSERT INTO notification_outbox (chat_id, message, delivered_at) "
+            "SELECT :offset + g, 'qp message', "
+            "CASE WHEN g % 100 = 0 THEN NULL ELSE now() - (g % 25) * interval '1 hour' END "
+            "FROM generate_series(1, :outbox_messages) g"
+        ),
+        params,
+    )
+    for table in (*TABLES, "instrument_price_history"):
+        session.execute(text(f'ANALYZE "{table}"'))
+
+    def ids(query: str) -> list[int]:
+        return list(session.execute(text(query), params).scalars())
+
+    return Seed(
+        instrument_ids=ids("SELECT id FROM instrument WHERE ticker LIKE :prefix || '%' ORDER BY id LIMIT 100"),
+        user_ids=ids('SELECT id FROM "user" WHERE chat_id > :offset ORDER BY id LIMIT 100'),
+        subscription_ids=ids("SELECT id FROM subscription ORDER BY id DESC LIMIT 100"),
+        outbox_ids=ids("SELECT id FROM notification_outbox WHERE delivered_at IS NULL ORDER BY id LIMIT 100"),
+        change_ids=ids("SELECT id FROM subscription_change_outbox ORDER BY id LIMIT 100"),
+        large_tables=set(
+            session.execute(
+                text(
+                    "SELECT relname FROM pg_class WHERE relkind = 'r' AND reltuples > :rows "
+                    "AND (relname = ANY(:tables) OR relname LIKE :partitions)"
+                ),
+                {"rows": SMALL_TABLE_ROWS, "tables": list(TABLES), "partitions": f"{HISTORY_PARTITION_PREFIX}%"},
+            ).scalars()
+        ),
+    )
+
+
+def get_cases() -> list[Case]:
+    price = decimal.Decimal("100.00")
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    return [
+        Case("InstrumentAlchemyRepo.get_by_id", lambda s, d: InstrumentAlchemyRepo(s).get_by_id(d.instrument_ids[0])),
+        Case("InstrumentAlchemyRepo.get_by_ticker", lambda s, d: InstrumentAlchemyRepo(s).get_by_ticker("QP1")),
+        Case("InstrumentAlchemyRepo.find_by", lambda s, d: InstrumentAlchemyRepo(s).find_by(), full_scan=True),
+        Case(
+            "InstrumentAlchemyRepo.find_by(id_in)",
+            lambda s, d: InstrumentAlchemyRepo(s).find_by(id_in=d.instrument_ids),
+        ),
+        Case(
+            "InstrumentAlchemyRepo.update_min_price_increments",
+            lambda s, d: InstrumentAlchemyRepo(s).update_min_price_increments(
+                [(id_, decimal.Decimal("0.01"), 2) for id_ in d.instrument_ids]
+            ),
+        ),
+        Case(
+            "InstrumentPriceAlchemyRepo.get_by_instrument_id",
+            lambda s, d: InstrumentPriceAlchemyRepo(s).get_by_instrument_id(d.instrument_ids[0]),
+        ),
+        Case(
+            "InstrumentPriceAlchemyRepo.find_by",
+            lambda s, d: InstrumentPriceAlchemyRepo(s).find_by(instrument_id_in=d.instrument_ids),
+        ),
+        Case(
+            "InstrumentPriceAlchemyRepo.bulk_create_or_update",
+            lambda s, d: InstrumentPriceAlchemyRepo(s).bulk_create_or_update({id_: price for id_ in d.instrument_ids}),
+        ),
+        Case(
+            "InstrumentPriceHistoryAlchemyRepo.rollup(MINUTE)",
+            lambda s, d: InstrumentPriceHistoryAlchemyRepo(s).rollup(
+                CandleResolutionEnum.MINUTE,
+                since=now - datetime.timedelta(minutes=2),
+            ),
+        ),
+        Case(
+            "InstrumentPriceHistoryAlchemyRepo.rollup(HOUR)",
+            lambda s, d: InstrumentPriceHistoryAlchemyRepo(s).rollup(
+                CandleResolutionEnum.HOUR,
+                since=now - datetime.timedelta(hours=1),
+            ),
+        ),
+        Case("UserAlchemyRepo.get_by_id", lambda s, d: UserAlchemyRepo(s).get_by_id(d.user_ids[0])),
+        Case("UserAlchemyRepo.find_by_chat_id", lambda s, d: UserAlchemyRepo(s).find_by_chat_id(CHAT_ID_OFFSET + 1)),
+        Case("UserAlchemyRepo.get_by_username", lambda s, d: UserAlchemyRepo(s).get_by_username("qp_user_1")),
+        Case(
+            "SubscriptionAlchemyRepo.find_by(user_id, is_active)",
+            lambda s, d: SubscriptionAlchemyRepo(s).find_by(user_id=d.user_ids[0], is_active=True),
+        ),
+        Case(
+            "SubscriptionAlchemyRepo.find_by(user_id, instrument_id, price, is_active)",
+            lambda s, d: SubscriptionAlchemyRepo(s).find_by(
+                user_id=d.user_ids[0],
+                instrument_id=d.instrument_ids[0],
+                price=price,
+                is_active=True,
+            ),
+        ),
+        Case(
+            "SubscriptionAlchemyRepo.find_by(user_id_in)",
+            lambda s, d: SubscriptionAlchemyRepo(s).find_by(
+                user_id_in=d.user_ids[:10],
+                is_active=True,
+                crossing_disabled=False,
+            ),
+        ),
+        Case(
+            "SubscriptionAlchemyRepo.find_by(id_in)",
+            lambda s, d: SubscriptionAlchemyRepo(s).find_by(
+                id_in=d.subscription_ids,
+                is_active=True,
+                crossing_disabled=False,
+            ),
+        ),
+        Case(
+            "SubscriptionAlchemyRepo.find_by(user_instrument_in)",
+            lambda s, d: SubscriptionAlchemyRepo(s).find_by(
+                user_instrument_in=list(zip(d.user_ids[:10], d.instrument_ids[:10])),
+                is_active=True,
+                crossing_disabled=False,
+            ),
+        ),
+        Case(
+            "SubscriptionAlchemyRepo.find_by(is_active, crossing_disabled)",
+            lambda s, d: SubscriptionAlchemyRepo(s).find_by(is_active=True, crossing_disabled=False),
+            full_scan=True,
+        ),
+        Case(
+            "SubscriptionAlchemyRepo.find_triggered",
+            lambda s, d: SubscriptionAlchemyRepo(s).find_triggered(
+                [(id_, decimal.Decimal("99.5"), decimal.Decimal("100.5")) for id_ in d.instrument_ids[:20]]
+            ),
+        ),
+        Case(
+            "SubscriptionAlchemyRepo.update_by(id_in)",
+            lambda s, d: SubscriptionAlchemyRepo(s).update_by(
+                id_in=d.subscription_ids,
+                update_data={"is_active": False},
+            ),
+        ),
+        Case(
+            "SubscriptionAlchemyRepo.update_by(user_instrument_in)",
+            lambda s, d: SubscriptionAlchemyRepo(s).update_by(
+                is_active=True,
+                user_instrument_in=list(zip(d.user_ids[:10], d.instrument_ids[:10])),
+                type_=SubscriptionTypeEnum.CROSSING,
+                update_data={"crossing_disabled": False},
+            ),
+        ),
+        Case(
+            "SubscriptionAlchemyRepo.delete_by(user_id, instrument_id, price_in)",
+            lambda s, d: SubscriptionAlchemyRepo(s).delete_by(
+                user_id=d.user_ids[0],
+                instrument_id=d.instrument_ids[0],
+                price_in=[price],
+            ),
+        ),
+        Case(
+            "SubscriptionAlchemyRepo.create_many",
+            lambda s, d: SubscriptionAlchemyRepo(s).create_many(
+                user_id=d.user_ids[0],
+                instrument_id=d.instrument_ids[0],
+                prices=[price, price + 1, price + 2],
+                type_=SubscriptionTypeEnum.ALWAYS,
+            ),
+        ),
+        Case(
+            "SubscriptionAlchemyRepo.create_range",
+            lambda s, d: SubscriptionAlchemyRepo(s).create_range(
+                user_id=d.user_ids[0],
+                instrument_id=d.instrument_ids[0],
+                price_from=price,
+                price_to=price + 50,
+                step=decimal.Decimal("0.5"),
+                precision=2,
+                type_=SubscriptionTypeEnum.ALWAYS,
+            ),
+        ),
+        Case(
+            "SubscriptionAlchemyRepo.count_by(user_id, is_active)",
+            lambda s, d: SubscriptionAlchemyRepo(s).count_by(user_id=d.user_ids[0], is_active=True),
+        ),
+        Case(
+            "SubscriptionAlchemyRepo.delete_by(user_id)",
+            lambda s, d: SubscriptionAlchemyRepo(s).delete_by(user_id=d.user_ids[0]),
+        ),
+        Case(
+            "NotificationOutboxAlchemyRepo.claim_pending",
+            lambda s, d: NotificationOutboxAlchemyRepo(s).claim_pending(limit=1000),
+        ),
+        Case(
+            "NotificationOutboxAlchemyRepo.mark_delivered",
+            lambda s, d: NotificationOutboxAlchemyRepo(s).mark_delivered(d.outbox_ids),
+        ),
+        Case(
+            "NotificationOutboxAlchemyRepo.delete_delivered_before",
+            lambda s, d: NotificationOutboxAlchemyRepo(s).delete_delivered_before(
+                now - datetime.timedelta(hours=24)
+            ),
+        ),
+        Case(
+            "SubscriptionChangeOutboxAlchemyRepo.claim_pending",
+            lambda s, d: SubscriptionChangeOutboxAlchemyRepo(s).claim_pending(limit=1000),
+        ),
+        Case(
+            "SubscriptionChangeOutboxAlchemyRepo.delete_many",
+            lambda s, d: SubscriptionChangeOutboxAlchemyRepo(s).delete_many(d.change_ids),
+        ),
+    ]
+
+
+def find_seq_scans(plan: dict[str, Any], tables: set[str]) -> list[str]:
+    result = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in tables and "Filter" in plan:
+        result.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        result += find_seq_scans(child, tables)
+    return result
+
+
+def explain(connection: Connection, statement: str, parameters: Any) -> dict[str, Any]:
+    with connection.begin_nested() as savepoint:
+        result = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar_one()
+        savepoint.rollback()
+    plan = result if isinstance(result, list) else json.loads(result)
+    return plan[0]["Plan"]
+
+
+@pytest.fixture(scope="module")
+def seeded(pg_engine: Engine) -> Iterator[tuple[Connection, Session, Seed]]:
+    with pg_engine.connect() as connection, connection.begin():
+        session = Session(bind=connection)
+        data = seed(session, QueryPlansConfig())
+        session.flush()
+        yield connection, session, data
+        session.close()
+        connection.rollback()
+
+
+@pytest.mark.parametrize("case", get_cases(), ids=lambda case: case.name)
+def test_query_plan(seeded: tuple[Connection, Session, Seed], case: Case) -> None:
+    connection, session, data = seeded
+
+    def capture(conn, cursor, statement, parameters, context, executemany) -> None:
+        if not statement.startswith(("EXPLAIN", "SAVEPOINT", "RELEASE", "ROLLBACK")):
+            case.statements.append((statement, parameters))
+
+    event.listen(connection, "before_cursor_execute", capture)
+    try:
+        with connection.begin_nested() as savepoint:
+            case.run(session, data)
+            session.flush()
+            savepoint.rollback()
+    finally:
+        event.remove(connection, "before_cursor_execute", capture)
+    session.expire_all()
+
+    assert case.statements
+    for statement, parameters in case.statements:
+        seq_scans = find_seq_scans(explain(connection, statement, parameters), data.large_tables)
+        assert case.full_scan or not seq_scans, f"Sequential scan on {', '.join(seq_scans)}:\n{statement}"
@@ -0,0 +1,82 @@
+import pytest
+
+import worker
+from services.rate_limit import RedisTokenBucketRateLimiter
+
+
+def make_limiter(redis_client, chat_capacity: float = 3, global_capacity: float = 30) -> RedisTokenBucketRateLimiter:
+    return RedisTokenBucketRateLimiter(
+        redis_client=redis_client,
+        chat_rate=0.01,
+        chat_capacity=chat_capacity,
+        global_rate=0.01,
+        global_capacity=global_capacity,
+    )
+
+
+def test_acquire_takes_one_token_until_the_chat_bucket_is_empty(redis_client) -> None:
+    limiter = make_limiter(redis_client)
+
+    assert [limiter.acquire(1) for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire(1) > 0
+    assert limiter.acquire(2) == 0
+
+
+def test_acquire_many_takes_only_what_the_buckets_hold(redis_client) -> None:
+    limiter = make_limiter(redis_client, global_capacity=4)
+
+    grants = limiter.acquire_many({1: 5, 2: 2})
+
+    assert grants[1][0] == 3 and grants[1][1] > 0
+    assert grants[2][0] == 1 and grants[2][1] > 0
+    # Messages that were not granted did not consume tokens: the chat and the global bucket are empty, not negative.
+    assert 0 < limiter.acquire(1) <= 1 / 0.01
+
+
+class FakeRateLimiter:
+    def __init__(self, grants: dict[int, tuple[int, float]]) -> None:
+        self.grants = grants
+        self.requested: dict[int, int] = {}
+
+    def acquire_many(self, counts: dict[int, int]) -> dict[int, tuple[int, float]]:
+        self.requested = counts
+        return {chat_id: self.grants.get(chat_id, (count, 0.0)) for chat_id, count in counts.items()}
+
+
+def test_send_messages_defers_only_the_messages_without_tokens(monkeypatch: pytest.MonkeyPatch) -> None:
+    limiter = FakeRateLimiter({1: (1, 2.0), 3: (0, 5.0)})
+    sent, rescheduled = [], []
+    monkeypatch.setattr(worker, "rate_limiter", limiter)
+    monkeypatch.setattr(worker.tg_async_client, "send_messages_sync", lambda msgs: [sent.append(msg) for msg in msgs])
+    monkeypatch.setattr(
+        worker.send_messages_to_tg, "apply_async", lambda kwargs, countdown: rescheduled.append((kwargs, countdown))
+    )
+    messages = [
+        {"chat_id": 1, "message": "a1"},
+        {"chat_id": 2, "message": "b1"},
+        {"chat_id": 1, "message": "a2"},
+        {"chat_id": 3, "message": "c1"},
+        {"chat_id": 1, "message": "a3"},
+    ]
+
+    worker.send_messages_to_tg(messages)
+
+    assert limiter.requested == {1: 3, 2: 1, 3: 1}
+    assert [(msg.chat_id, msg.message) for msg in sent] == [(1, "a1"), (2, "b1")]
+    deferred = [{"chat_id": 1, "message": "a2"}, {"chat_id": 1, "message": "a3"}, {"chat_id": 3, "message": "c1"}]
+    assert rescheduled == [({"messages": deferred, "attempt": 1}, 5.0)]
+
+
+def test_send_messages_drops_deferred_messages_after_the_last_retry(monkeypatch: pytest.MonkeyPatch) -> None:
+    sent, rescheduled = [], []
+    monkeypatch.setattr(worker, "rate_limiter", FakeRateLimiter({1: (1, 2.0)}))
+    monkeypatch.setattr(worker.tg_async_client, "send_messages_sync", lambda msgs: [sent.append(msg) for msg in msgs])
+    monkeypatch.setattr(
+        worker.send_messages_to_tg, "apply_async", lambda kwargs, countdown: rescheduled.append((kwargs, countdown))
+    )
+    messages = [{"chat_id": 1, "message": "a1"}, {"chat_id": 1, "message": "a2"}]
+
+    worker.send_messages_to_tg(messages, attempt=worker.cfg.SEND_MESSAGE_MAX_RETRIES)
+
+    assert [msg.message for msg in sent] == ["a1"]
+    assert rescheduled == []
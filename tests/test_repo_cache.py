@@ -0,0 +1,47 @@
+from repo.cache import RepositoryCache
+from services.metrics import NullMetrics
+
+
+class RecordingMetrics(NullMetrics):
+    def __init__(self) -> None:
+        self.counters: list[tuple[str, float, dict[str, str] | None]] = []
+
+    def inc(self, name: str, value: float = 1, labels: dict[str, str] | None = None) -> None:
+        self.counters.append((name, value, labels))
+
+
+def test_local_hits_are_counted_in_process_and_flushed_in_one_increment() -> None:
+    metrics = RecordingMetrics()
+    cache = RepositoryCache(metrics=metrics, metrics_flush_interval=3600)
+    cache.set("users", "get_by_chat_id:1", "{}")
+
+    for _ in range(5):
+        assert cache.get("users", "get_by_chat_id:1") == "{}"
+    assert cache.get("users", "get_by_chat_id:2") is None
+    assert metrics.counters == [("repo_cache_misses_total", 1, {"table": "users"})]
+
+    cache._metrics_flush_interval = 0
+    cache.get("users", "get_by_chat_id:1")
+
+    assert metrics.counters[-1] == ("repo_cache_hits_total", 6, {"table": "users", "tier": "local"})
+
+
+def test_invalidate_drops_only_the_written_tables() -> None:
+    cache = RepositoryCache()
+    cache.set("users", "a", "1")
+    cache.set("instruments", "b", "2")
+
+    cache.invalidate({"users"})
+
+    assert cache.get("users", "a") is None
+    assert cache.get("instruments", "b") == "2"
+
+
+def test_redis_tier_is_shared_and_invalidated_across_processes(redis_client) -> None:
+    first, second = RepositoryCache(redis_client=redis_client), RepositoryCache(redis_client=redis_client)
+    first.set("users", "a", "1")
+
+    assert second.get("users", "a") == "1"
+
+    first.invalidate({"users"})
+    assert RepositoryCache(redis_client=redis_client).get("users", "a") is None
@@ -0,0 +1,26 @@
+from services.sharding import jump_consistent_hash, partition
+
+
+def test_jump_consistent_hash_stays_in_range() -> None:
+    assert {jump_consistent_hash(key, 7) for key in range(1000)} == set(range(7))
+    assert {jump_consistent_hash(key, 1) for key in range(100)} == {0}
+
+
+def test_jump_consistent_hash_moves_few_keys_when_a_bucket_is_added() -> None:
+    keys = range(10_000)
+    moved = [key for key in keys if jump_consistent_hash(key, 10) != jump_consistent_hash(key, 11)]
+
+    # About 1/11 of the keys move, and all of them to the new bucket.
+    assert 0.07 < len(moved) / len(keys) < 0.11
+    assert {jump_consistent_hash(key, 11) for key in moved} == {10}
+
+
+def test_partition_puts_every_id_in_exactly_one_stable_shard() -> None:
+    ids = list(range(1, 501))
+
+    shards = partition(ids, 4)
+
+    assert len(shards) == 4
+    assert sorted(id_ for shard in shards for id_ in shard) == ids
+    assert partition(reversed(ids), 4) == [list(reversed(shard)) for shard in shards]
+    assert partition([], 3) == [[], [], []]
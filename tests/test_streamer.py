@@ -0,0 +1,110 @@
+import asyncio
+import contextlib
+import decimal
+import socket
+
+import pytest
+from aiohttp import web
+
+import price_stream_stub
+import streamer as streamer_module
+from enums import InstrumentTypeEnum
+from models.domain.instument import Instrument
+from services.price_stream import TinkoffStreamPriceService
+from streamer import Streamer
+
+INSTRUMENTS = [
+    Instrument(id=1, ticker="AAA", figi="FIGI_AAA", isin="ISIN_AAA", type=InstrumentTypeEnum.SHARE, precision=2),
+    Instrument(id=2, ticker="BBB", figi="FIGI_BBB", isin="ISIN_BBB", type=InstrumentTypeEnum.SHARE, precision=2),
+]
+
+
+class FakeLock:
+    def __init__(self, free: bool = True) -> None:
+        self.free = free
+        self.released: list[str] = []
+
+    def acquire(self) -> str | None:
+        return "token" if self.free else None
+
+    def extend(self, token: str) -> bool:
+        return self.free
+
+    def release(self, token: str) -> None:
+        self.released.append(token)
+
+
+@pytest.fixture
+def processed(monkeypatch: pytest.MonkeyPatch) -> list[tuple[dict[int, decimal.Decimal], set[int]]]:
+    calls = []
+
+    @contextlib.contextmanager
+    def db_session():
+        yield None
+
+    def process_prices(session, prices_data, stale_ids=None):
+        calls.append(({row.instrument.identity: row.new_price for row in prices_data}, stale_ids))
+
+    monkeypatch.setattr(streamer_module, "db_session", db_session)
+    monkeypatch.setattr(streamer_module, "process_prices", process_prices)
+    monkeypatch.setattr(Streamer, "_load_instruments", staticmethod(lambda: INSTRUMENTS))
+    return calls
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_streamer(streamer: Streamer, drop_after: float | None, duration: float) -> None:
+    runner = web.AppRunner(price_stream_stub.create_app(interval=0.05, drop_after=drop_after))
+    await runner.setup()
+    port = free_port()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    streamer._price_stream_svc = TinkoffStreamPriceService(
+        token="test",
+        url=f"ws://127.0.0.1:{port}/ws",
+        flush_interval=0.1,
+        resubscribe_interval=60,
+    )
+    try:
+        await asyncio.wait_for(streamer.run_async(), timeout=duration)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        await runner.cleanup()
+
+
+def test_streamer_processes_stub_prices(processed: list) -> None:
+    lock = FakeLock()
+    streamer = Streamer(price_stream_svc=None, tick_lock=lock, lock_renew_interval=0.05)
+
+    asyncio.run(run_streamer(streamer, drop_after=None, duration=1.5))
+
+    assert processed
+    assert set().union(*(prices for prices, _ in processed)) <= {1, 2}
+    # Only the first streamed price of an instrument is compared against a possibly stale stored price.
+    first_seen: set[int] = set()
+    for prices, stale_ids in processed:
+        assert stale_ids == set(prices) - first_seen
+        first_seen |= set(prices)
+    assert lock.released == ["token"]
+
+
+def test_streamer_resubscribes_after_reconnect(processed: list) -> None:
+    streamer = Streamer(price_stream_svc=None, tick_lock=FakeLock(), lock_renew_interval=0.05)
+
+    asyncio.run(run_streamer(streamer, drop_after=0.5, duration=2.5))
+
+    # The stub closes the connection after 0.5s and the first reconnect waits 1s.
+    assert len(processed) > 5
+    assert any(prices for prices, _ in processed[-3:])
+
+
+def test_streamer_skips_prices_while_tick_lock_is_held(processed: list) -> None:
+    streamer = Streamer(price_stream_svc=None, tick_lock=FakeLock(free=False), lock_renew_interval=0.05)
+
+    asyncio.run(run_streamer(streamer, drop_after=None, duration=1))
+
+    assert processed == []
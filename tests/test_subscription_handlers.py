@@ -0,0 +1,212 @@
+import decimal
+
+import pytest
+
+from enums import InstrumentTypeEnum, SubscriptionTypeEnum
+from models.domain.instument import Instrument
+from services.commands.dto import CommandAddData, CommandStepData
+from services.commands.handler.add import DefaultAddCommandHandler, split_created
+from services.commands.handler.step import DefaultStepCommandHandler
+from services.price import round_price
+from services.subscription_changes import SubscriptionChange
+
+SBER = Instrument(id=1, ticker="SBER", figi="FIGI_SBER", isin="ISIN_SBER", type=InstrumentTypeEnum.SHARE, precision=2)
+
+
+class FakeInstrumentService:
+    def get_or_create_by_ticker(self, ticker: str) -> Instrument:
+        return SBER
+
+
+class FakeUoW:
+    def __init__(self, events: list[str]) -> None:
+        self.events = events
+
+    def commit(self) -> None:
+        self.events.append("commit")
+
+    def rollback(self) -> None:
+        self.events.append("rollback")
+
+
+class FakeSubscriptionRepo:
+    """Active subscription prices of one user and instrument"""
+
+    def __init__(self, events: list[str], prices: set[decimal.Decimal] | None = None) -> None:
+        self.events = events
+        self.prices = set(prices or ())
+
+    def lock_user(self, user_id: int) -> None:
+        self.events.append("lock")
+
+    def count_by(self, user_id: int | None = None, is_active: bool | None = None) -> int:
+        self.events.append("count")
+        return len(self.prices)
+
+    def create_many(
+        self,
+        user_id: int,
+        instrument_id: int,
+        prices: list[decimal.Decimal],
+        type_: SubscriptionTypeEnum,
+    ) -> list[decimal.Decimal]:
+        self.events.append("create")
+        created = [price for price in prices if price not in self.prices]
+        self.prices.update(created)
+        return created
+
+    def create_range(
+        self,
+        user_id: int,
+        instrument_id: int,
+        price_from: decimal.Decimal,
+        price_to: decimal.Decimal,
+        step: decimal.Decimal,
+        precision: int,
+        type_: SubscriptionTypeEnum,
+    ) -> tuple[int, list[decimal.Decimal]]:
+        self.events.append("create")
+        levels = []
+        price = price_from
+        while price <= price_to:
+            levels.append(round_price(price, precision))
+            price += step
+        levels = sorted(set(levels))
+        created = [price for price in levels if price not in self.prices]
+        self.prices.update(created)
+        return len(levels), created
+
+
+class FakeChangesPublisher:
+    def __init__(self, events: list[str]) -> None:
+        self.events = events
+        self.published: list[SubscriptionChange] = []
+
+    def publish(self, changes: list[SubscriptionChange]) -> None:
+        self.events.append("publish")
+        self.published.extend(changes)
+
+
+def prices(*values: str) -> set[decimal.Decimal]:
+    return {decimal.Decimal(value) for value in values}
+
+
+@pytest.mark.parametrize(
+    ("price", "precision", "rounded"),
+    [
+        ("1.005", 2, "1.01"),
+        ("1.015", 2, "1.02"),
+        ("-1.005", 2, "-1.01"),
+        ("2.5", 0, "3"),
+        ("1.004", 2, "1.00"),
+        ("7", 2, "7.00"),
+    ],
+)
+def test_round_price_rounds_half_away_from_zero(price: str, precision: int, rounded: str) -> None:
+    assert round_price(decimal.Decimal(price), precision) == decimal.Decimal(rounded)
+
+
+def test_add_creates_rounded_prices_and_reports_existing_ones() -> None:
+    events: list[str] = []
+    repo = FakeSubscriptionRepo(events, prices("10.00"))
+    publisher = FakeChangesPublisher(events)
+    handler = DefaultAddCommandHandler(
+        instrument_svc=FakeInstrumentService(),
+        uow=FakeUoW(events),
+        subscription_repo=repo,
+        changes_publisher=publisher,
+        max_subscriptions=10,
+    )
+
+    result = handler.handle(user_id=7, data=CommandAddData(ticker="sber", prices=["10", "12.345", "12.345", "0.125"]))
+
+    assert result.added == [decimal.Decimal("12.35"), decimal.Decimal("0.13")]
+    assert result.errors == [decimal.Decimal("10.00"), decimal.Decimal("12.35")]
+    # The change is published in the transaction that makes it.
+    assert events == ["lock", "count", "create", "publish", "commit"]
+    assert publisher.published == [SubscriptionChange(user_id=7, instrument_id=SBER.identity)]
+
+
+def test_add_over_the_limit_is_rejected_without_inserting() -> None:
+    events: list[str] = []
+    publisher = FakeChangesPublisher(events)
+    handler = DefaultAddCommandHandler(
+        instrument_svc=FakeInstrumentService(),
+        uow=FakeUoW(events),
+        subscription_repo=FakeSubscriptionRepo(events, prices("1", "2")),
+        changes_publisher=publisher,
+        max_subscriptions=3,
+    )
+
+    result = handler.handle(user_id=7, data=CommandAddData(ticker="SBER", prices=["3", "4"]))
+
+    assert result.subscriptions_limit == 3
+    assert result.added == []
+    assert events == ["lock", "count", "rollback"]
+    assert publisher.published == []
+
+
+def test_step_creates_levels_and_counts_existing_ones() -> None:
+    events: list[str] = []
+    handler = DefaultStepCommandHandler(
+        instrument_svc=FakeInstrumentService(),
+        uow=FakeUoW(events),
+        subscription_repo=FakeSubscriptionRepo(events, prices("101.00")),
+        changes_publisher=FakeChangesPublisher(events),
+        max_subscriptions=10,
+    )
+
+    result = handler.handle(user_id=7, data=CommandStepData(ticker="SBER", price_from=100, price_to=103, step=1))
+
+    assert result.added == [decimal.Decimal("100"), decimal.Decimal("102"), decimal.Decimal("103")]
+    assert result.existing_count == 1
+    assert events == ["lock", "count", "create", "publish", "commit"]
+
+
+def test_step_over_the_limit_is_rejected_before_generating_levels() -> None:
+    events: list[str] = []
+    handler = DefaultStepCommandHandler(
+        instrument_svc=FakeInstrumentService(),
+        uow=FakeUoW(events),
+        subscription_repo=FakeSubscriptionRepo(events, prices("1")),
+        changes_publisher=FakeChangesPublisher(events),
+        max_subscriptions=3,
+    )
+
+    result = handler.handle(user_id=7, data=CommandStepData(ticker="SBER", price_from=10, price_to=12, step=1))
+
+    assert result.subscriptions_limit == 3
+    assert events == ["lock", "count", "rollback"]
+
+
+@pytest.mark.parametrize(
+    ("from_", "to", "step", "levels"),
+    [("1", "10", "1", 10), ("1", "10", "3", 4), ("1", "1", "1", 1), ("10", "1", "1", 0), ("1", "10", "0", 0)],
+)
+def test_count_levels(from_: str, to: str, step: str, levels: int) -> None:
+    assert (
+        DefaultStepCommandHandler._count_levels(decimal.Decimal(from_), decimal.Decimal(to), decimal.Decimal(step))
+        == levels
+    )
+
+
+def decimals(*values: str) -> list[decimal.Decimal]:
+    return [decimal.Decimal(value) for value in values]
+
+
+@pytest.mark.parametrize(
+    ("prices", "created", "added", "errors"),
+    [
+        (decimals("1", "2", "3"), decimals("3", "1"), decimals("1", "3"), decimals("2")),
+        (decimals("1", "2", "1"), decimals("1", "2"), decimals("1", "2"), decimals("1")),
+        (decimals("1", "2"), [], [], decimals("1", "2")),
+        ([], [], [], []),
+    ],
+)
+def test_split_created_keeps_the_order_and_creates_a_repeated_price_once(
+    prices: list[decimal.Decimal],
+    created: list[decimal.Decimal],
+    added: list[decimal.Decimal],
+    errors: list[decimal.Decimal],
+) -> None:
+    assert split_created(prices, created) == (added, errors)
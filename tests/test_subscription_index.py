@@ -0,0 +1,210 @@
+import decimal
+import time
+
+import pytest
+
+from enums import LocaleEnum, SubscriptionTypeEnum
+from models.domain.subscription import Subscription
+from services import subscription_index
+from services.subscription_changes import RedisSubscriptionChangesPublisher, SubscriptionChange
+from services.subscription_index import SubscriptionIndex, SubscriptionIndexSync
+
+
+def make_sub(
+    id_: int,
+    price: str,
+    user_id: int = 1,
+    instrument_id: int = 10,
+    is_active: bool = True,
+    crossing_disabled: bool = False,
+) -> Subscription:
+    return Subscription(
+        id=id_,
+        user_id=user_id,
+        user_chat_id=user_id * 100,
+        user_locale=LocaleEnum.EN,
+        instrument_id=instrument_id,
+        instrument_ticker=f"T{instrument_id}",
+        instrument_precision=2,
+        price=decimal.Decimal(price),
+        type=SubscriptionTypeEnum.ALWAYS,
+        crossing_disabled=crossing_disabled,
+        is_active=is_active,
+    )
+
+
+@pytest.fixture
+def index() -> SubscriptionIndex:
+    index = SubscriptionIndex()
+    index.load(
+        [
+            make_sub(1, "99"),
+            make_sub(2, "100"),
+            make_sub(3, "100", user_id=2),
+            make_sub(4, "100.5"),
+            make_sub(5, "101"),
+            make_sub(6, "100", instrument_id=20),
+        ]
+    )
+    return index
+
+
+@pytest.mark.parametrize(
+    ("old", "new", "ids"),
+    [
+        # Service passes min/max of the move, so both directions include the lower price and exclude the higher.
+        ("100", "101", [2, 3, 4]),
+        ("101", "100", [2, 3, 4]),
+        ("99.99", "100", []),
+        ("100", "100.01", [2, 3]),
+        ("100", "100", []),
+        ("0", "1000", [1, 2, 3, 4, 5]),
+    ],
+)
+def test_find_crossed_bounds(index: SubscriptionIndex, old: str, new: str, ids: list[int]) -> None:
+    old_price, new_price = decimal.Decimal(old), decimal.Decimal(new)
+
+    found = index.find_crossed(10, price_gte=min(old_price, new_price), price_lt=max(old_price, new_price))
+
+    assert sorted(found) == ids
+
+
+def test_find_crossed_of_an_unknown_instrument(index: SubscriptionIndex) -> None:
+    assert index.find_crossed(30, decimal.Decimal("0"), decimal.Decimal("1000")) == []
+
+
+def test_add_skips_untriggerable_and_replaces_the_same_id(index: SubscriptionIndex) -> None:
+    index.add(make_sub(7, "100", is_active=False))
+    index.add(make_sub(8, "100", crossing_disabled=True))
+    index.add(make_sub(4, "102"))
+
+    assert sorted(index.find_crossed(10, decimal.Decimal("100"), decimal.Decimal("103"))) == [2, 3, 4, 5]
+    assert sorted(index.find_crossed(10, decimal.Decimal("100.5"), decimal.Decimal("101"))) == []
+    assert len(index) == 6
+
+
+def test_discard(index: SubscriptionIndex) -> None:
+    index.discard(2)
+    index.discard(6)
+    index.discard(404)
+
+    assert sorted(index.find_crossed(10, decimal.Decimal("100"), decimal.Decimal("100.01"))) == [3]
+    assert index.instrument_ids() == {10}
+    assert len(index) == 4
+
+
+def test_discard_by_user_and_instrument(index: SubscriptionIndex) -> None:
+    index.discard_by(user_id=1, instrument_id=20)
+
+    assert index.instrument_ids() == {10}
+    assert len(index) == 5
+
+    index.discard_by(user_id=1)
+
+    assert sorted(index.find_crossed(10, decimal.Decimal("0"), decimal.Decimal("1000"))) == [3]
+    index.discard_by(user_id=404)
+    assert len(index) == 1
+
+
+class FakeSubscriptionRepo:
+    def __init__(self, subscriptions: list[Subscription]) -> None:
+        self.subscriptions = {sub.identity: sub for sub in subscriptions}
+        self.calls: list[str] = []
+
+    def find_by(
+        self,
+        is_active: bool | None = None,
+        crossing_disabled: bool | None = None,
+        user_id_in: list[int] | None = None,
+        user_instrument_in: list[tuple[int, int]] | None = None,
+    ) -> list[Subscription]:
+        if user_id_in is not None:
+            self.calls.append(f"users {sorted(user_id_in)}")
+        elif user_instrument_in is not None:
+            self.calls.append(f"pairs {sorted(user_instrument_in)}")
+        else:
+            self.calls.append("all")
+        return [
+            sub
+            for sub in self.subscriptions.values()
+            if (is_active is None or sub.is_active == is_active)
+            and (crossing_disabled is None or sub.crossing_disabled == crossing_disabled)
+            and (user_id_in is None or sub.user_id in user_id_in)
+            and (user_instrument_in is None or (sub.user_id, sub.instrument_id) in user_instrument_in)
+        ]
+
+
+def all_ids(index: SubscriptionIndex) -> list[int]:
+    return sorted(
+        id_
+        for instrument_id in index.instrument_ids()
+        for id_ in index.find_crossed(instrument_id, decimal.Decimal("0"), decimal.Decimal("1000"))
+    )
+
+
+@pytest.fixture
+def sync_env(redis_client):
+    repo = FakeSubscriptionRepo([make_sub(1, "100"), make_sub(2, "100", user_id=2), make_sub(3, "200", user_id=2)])
+    publisher = RedisSubscriptionChangesPublisher(redis_client)
+    sync = SubscriptionIndexSync(SubscriptionIndex(), redis_client, full_reload_interval=3600)
+    return repo, publisher, sync
+
+
+def test_sync_reloads_only_the_changed_slices(sync_env) -> None:
+    repo, publisher, sync = sync_env
+    assert all_ids(sync.refresh(repo)) == [1, 2, 3]
+
+    repo.subscriptions[1] = make_sub(1, "100", is_active=False)
+    repo.subscriptions[4] = make_sub(4, "150", user_id=2, instrument_id=20)
+    del repo.subscriptions[3]
+    publisher.publish([SubscriptionChange(user_id=1, instrument_id=10), SubscriptionChange(user_id=2)])
+    index = sync.refresh(repo)
+
+    assert all_ids(index) == [2, 4]
+    assert repo.calls == ["all", "users [2]", "pairs [(1, 10)]"]
+
+    sync.refresh(repo)
+    assert repo.calls[3:] == []
+
+
+def test_sync_reloads_everything_when_the_stream_was_trimmed(sync_env, redis_client) -> None:
+    repo, publisher, sync = sync_env
+    publisher.publish([SubscriptionChange(user_id=1)])
+    sync.refresh(repo)
+
+    repo.subscriptions[4] = make_sub(4, "150", user_id=3)
+    publisher.publish([SubscriptionChange(user_id=4), SubscriptionChange(user_id=5)])
+    redis_client.xtrim("subscription_changes", maxlen=1, approximate=False)
+    index = sync.refresh(repo)
+
+    assert repo.calls == ["all", "all"]
+    assert all_ids(index) == [1, 2, 3, 4]
+
+
+def test_sync_reloads_everything_when_its_last_id_is_gone(sync_env, redis_client) -> None:
+    repo, publisher, sync = sync_env
+    publisher.publish([SubscriptionChange(user_id=1)])
+    sync.refresh(repo)
+
+    # E.g. Redis lost its data: the stream starts over after the id this process has seen.
+    redis_client.delete("subscription_changes")
+    sync.refresh(repo)
+    assert repo.calls == ["all"]
+    time.sleep(0.01)
+    publisher.publish([SubscriptionChange(user_id=2)])
+    sync.refresh(repo)
+
+    assert repo.calls == ["all", "all"]
+
+
+def test_sync_reloads_everything_after_the_full_reload_interval(sync_env, monkeypatch) -> None:
+    repo, publisher, sync = sync_env
+    now = [1000.0]
+    monkeypatch.setattr(subscription_index.time, "monotonic", lambda: now[0])
+    sync.refresh(repo)
+    sync.refresh(repo)
+
+    now[0] += 3601
+    sync.refresh(repo)
+
+    assert repo.calls == ["all", "all"]
@@ -0,0 +1,67 @@
+import decimal
+
+import pytest
+from sqlalchemy.orm import Session
+
+from enums import InstrumentTypeEnum, SubscriptionTypeEnum
+from repo.instrument import InstrumentAlchemyRepo
+from repo.subscription import SubscriptionAlchemyRepo
+from repo.user import UserAlchemyRepo
+from services.price import round_price
+
+CHAT_ID = 9_100_000_001
+
+
+@pytest.fixture
+def user_instrument(pg_session: Session) -> tuple[int, int]:
+    UserAlchemyRepo(pg_session).create(chat_id=CHAT_ID, username="repo_test", phone=None)
+    InstrumentAlchemyRepo(pg_session).create(
+        ticker="REPOTEST",
+        figi="FIGI_REPOTEST",
+        isin="ISIN_REPOTEST",
+        type_=InstrumentTypeEnum.SHARE,
+        precision=2,
+    )
+    user = UserAlchemyRepo(pg_session).find_by_chat_id(CHAT_ID)[0]
+    instrument = InstrumentAlchemyRepo(pg_session).get_by_ticker("REPOTEST")
+    return user.identity, instrument.identity
+
+
+def test_create_many_skips_prices_with_an_active_subscription(
+    pg_session: Session, user_instrument: tuple[int, int]
+) -> None:
+    user_id, instrument_id = user_instrument
+    repo = SubscriptionAlchemyRepo(pg_session)
+    prices = [decimal.Decimal("10.00"), decimal.Decimal("11.00")]
+
+    first = repo.create_many(user_id, instrument_id, prices, SubscriptionTypeEnum.ALWAYS)
+    second = repo.create_many(user_id, instrument_id, [*prices, decimal.Decimal("12.00")], SubscriptionTypeEnum.ONETIME)
+
+    assert sorted(first) == prices
+    assert second == [decimal.Decimal("12.00")]
+    assert repo.count_by(user_id=user_id, is_active=True) == 3
+
+
+def test_create_range_rounds_levels_like_round_price(pg_session: Session, user_instrument: tuple[int, int]) -> None:
+    user_id, instrument_id = user_instrument
+    repo = SubscriptionAlchemyRepo(pg_session)
+    repo.create_many(user_id, instrument_id, [decimal.Decimal("1.01")], SubscriptionTypeEnum.ALWAYS)
+    price_from, price_to, step = decimal.Decimal("1.005"), decimal.Decimal("1.0350"), decimal.Decimal("0.005")
+
+    levels, added = repo.create_range(
+        user_id, instrument_id, price_from, price_to, step, precision=2, type_=SubscriptionTypeEnum.ALWAYS
+    )
+
+    expected = sorted({round_price(price_from + i * step, 2) for i in range(7)})
+    assert levels == len(expected)
+    assert added == [level for level in expected if level != decimal.Decimal("1.01")]
+
+
+def test_lock_user_is_reentrant_within_a_transaction(pg_session: Session, user_instrument: tuple[int, int]) -> None:
+    user_id, _ = user_instrument
+    repo = SubscriptionAlchemyRepo(pg_session)
+
+    repo.lock_user(user_id)
+    repo.lock_user(user_id)
+
+    assert repo.count_by(user_id=user_id, is_active=True) == 0
@@ -0,0 +1,143 @@
+import decimal
+
+from enums import InstrumentTypeEnum, LocaleEnum, SubscriptionTypeEnum
+from models.domain.instument import Instrument
+from models.domain.subscription import Subscription
+from services.price_updater import UpdatedPriceResult
+from services.subscription_index import SubscriptionIndex
+from services.subscriptions import DefaultSubscriptionsService
+
+INSTRUMENT = Instrument(id=10, ticker="SBER", figi="FIGI", isin="ISIN", type=InstrumentTypeEnum.SHARE, precision=2)
+
+
+def make_sub(
+    id_: int,
+    price: str,
+    user_id: int = 1,
+    type_: SubscriptionTypeEnum = SubscriptionTypeEnum.ALWAYS,
+    chat_id: int = 100,
+    crossing_disabled: bool = False,
+) -> Subscription:
+    return Subscription(
+        id=id_,
+        user_id=user_id,
+        user_chat_id=chat_id,
+        user_locale=LocaleEnum.EN,
+        instrument_id=INSTRUMENT.identity,
+        instrument_ticker=INSTRUMENT.ticker,
+        instrument_precision=INSTRUMENT.precision,
+        price=decimal.Decimal(price),
+        type=type_,
+        crossing_disabled=crossing_disabled,
+        is_active=True,
+    )
+
+
+class FakeUoW:
+    def __init__(self) -> None:
+        self.commits = 0
+
+    def commit(self) -> None:
+        self.commits += 1
+
+    def rollback(self) -> None:
+        pass
+
+
+class FakeSubscriptionRepo:
+    def __init__(self, subscriptions: list[Subscription]) -> None:
+        self.subscriptions = {sub.identity: sub for sub in subscriptions}
+
+    def find_by(
+        self,
+        is_active: bool | None = None,
+        crossing_disabled: bool | None = None,
+        id_in: list[int] | None = None,
+    ) -> list[Subscription]:
+        return [
+            sub
+            for sub in self.subscriptions.values()
+            if (is_active is None or sub.is_active == is_active)
+            and (crossing_disabled is None or sub.crossing_disabled == crossing_disabled)
+            and (id_in is None or sub.identity in id_in)
+        ]
+
+    def update_by(
+        self,
+        update_data: dict,
+        is_active: bool | None = None,
+        type_: SubscriptionTypeEnum | None = None,
+        id_in: list[int] | None = None,
+        user_instrument_in: list[tuple[int, int]] | None = None,
+    ) -> int:
+        matched = [
+            sub
+            for sub in self.subscriptions.values()
+            if (is_active is None or sub.is_active == is_active)
+            and (type_ is None or sub.type == type_)
+            and (id_in is None or sub.identity in id_in)
+            and (user_instrument_in is None or (sub.user_id, sub.instrument_id) in user_instrument_in)
+        ]
+        for sub in matched:
+            self.subscriptions[sub.identity] = sub.model_copy(update=update_data)
+        return len(matched)
+
+
+class FakeChangesPublisher:
+    def publish(self, changes) -> None:
+        pass
+
+
+def make_service(repo: FakeSubscriptionRepo, index: SubscriptionIndex) -> DefaultSubscriptionsService:
+    return DefaultSubscriptionsService(
+        uow=FakeUoW(),
+        subscription_repo=repo,
+        user_repo=None,
+        join_messages=True,
+        changes_publisher=FakeChangesPublisher(),
+        subscription_index=index,
+    )
+
+
+def moved(old: str, new: str) -> list[UpdatedPriceResult]:
+    return [UpdatedPriceResult(instrument=INSTRUMENT, old_price=decimal.Decimal(old), new_price=decimal.Decimal(new))]
+
+
+def test_indexed_alerts_are_rendered_from_current_rows() -> None:
+    index = SubscriptionIndex()
+    index.load([make_sub(1, "100"), make_sub(2, "100.5", user_id=2, chat_id=200)])
+    # The user's chat changed and subscription 2 was disabled after the index was loaded.
+    repo = FakeSubscriptionRepo([make_sub(1, "100", chat_id=101), make_sub(2, "100.5", crossing_disabled=True)])
+
+    messages = make_service(repo, index).get_messages_and_update(moved("99", "101"))
+
+    assert [msg.user_chat_id for msg in messages] == [101]
+
+
+def test_triggered_subscriptions_are_deactivated_or_rearmed() -> None:
+    onetime, crossing, always = SubscriptionTypeEnum.ONETIME, SubscriptionTypeEnum.CROSSING, SubscriptionTypeEnum.ALWAYS
+    subscriptions = [
+        make_sub(1, "100", type_=onetime),
+        make_sub(2, "100", type_=crossing),
+        # Disabled crossings of the same user and instrument are re-armed, other users' are not.
+        make_sub(3, "200", type_=crossing, crossing_disabled=True),
+        make_sub(4, "200", user_id=2, type_=crossing, chat_id=200, crossing_disabled=True),
+        make_sub(5, "100.5", user_id=2, type_=always, chat_id=200),
+        make_sub(6, "300", type_=onetime),
+    ]
+    index = SubscriptionIndex()
+    index.load(subscriptions)
+    repo = FakeSubscriptionRepo(subscriptions)
+
+    messages = make_service(repo, index).get_messages_and_update(moved("99", "101"))
+
+    assert [msg.user_chat_id for msg in messages] == [100, 200]
+    state = {id_: (sub.is_active, sub.crossing_disabled) for id_, sub in repo.subscriptions.items()}
+    assert state == {
+        1: (False, False),
+        2: (True, True),
+        3: (True, False),
+        4: (True, True),
+        5: (True, False),
+        6: (True, False),
+    }
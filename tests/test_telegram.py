@@ -0,0 +1,79 @@
+import asyncio
+import socket
+import time
+
+from aiohttp import web
+
+from services.telegram import AsyncTelegram, TelegramMessage, split_long_text
+
+
+def test_split_long_text_keeps_lines_under_the_limit() -> None:
+    assert split_long_text("a\nb", 10) == ["a\nb\n"]
+    assert split_long_text("aaaa\nbbbb", 6) == ["aaaa\n", "bbbb\n"]
+    assert split_long_text("abcdefgh", 3) == ["abc", "def", "gh\n"]
+
+
+class FakeRateLimiter:
+    def __init__(self) -> None:
+        self.acquired: list[int] = []
+
+    def acquire(self, chat_id: int) -> float:
+        self.acquired.append(chat_id)
+        return 0
+
+
+async def send_to_fake_telegram(messages: list[TelegramMessage], limiter: FakeRateLimiter) -> tuple[list, list]:
+    sent: list[tuple[int, float]] = []
+    throttled: set[int] = set()
+
+    async def send_message(request: web.Request) -> web.Response:
+        payload = await request.json()
+        if payload["chat_id"] == 1 and 1 not in throttled:
+            throttled.add(1)
+            return web.json_response({"ok": False, "error_code": 429, "parameters": {"retry_after": 0.3}})
+        sent.append((payload["chat_id"], time.monotonic()))
+        return web.json_response({"ok": True})
+
+    app = web.Application()
+    app.router.add_post("/sendMessage", send_message)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    tg = AsyncTelegram(bot_token="test", max_concurrency=1, chat_interval=0, rate_limiter=limiter)
+    tg._url = f"http://127.0.0.1:{port}/sendMessage"
+    try:
+        started = time.monotonic()
+        results = await tg.send_messages(messages)
+    finally:
+        await tg._get_session().close()
+        await runner.cleanup()
+    return results, [(chat_id, at - started) for chat_id, at in sent]
+
+
+def test_rate_limited_chat_waits_without_blocking_other_chats() -> None:
+    limiter = FakeRateLimiter()
+    messages = [TelegramMessage(chat_id=1, message="a"), TelegramMessage(chat_id=2, message="b")]
+
+    results, sent = asyncio.run(send_to_fake_telegram(messages, limiter))
+
+    assert results == [True, True]
+    # With a single request slot, chat 2 still goes out while chat 1 waits for its retry_after.
+    assert [chat_id for chat_id, _ in sent] == [2, 1]
+    assert sent[0][1] < 0.3 <= sent[1][1]
+    # Only the retry takes a token; the caller paid for the first attempts.
+    assert limiter.acquired == [1]
+
+
+def test_each_extra_part_of_a_long_message_takes_a_token() -> None:
+    limiter = FakeRateLimiter()
+    long_text = "a" * (AsyncTelegram.MAX_MESSAGE_LENGTH * 2 + 1)
+    messages = [TelegramMessage(chat_id=2, message=long_text), TelegramMessage(chat_id=3, message="b")]
+
+    results, sent = asyncio.run(send_to_fake_telegram(messages, limiter))
+
+    assert results == [True, True]
+    assert sorted(chat_id for chat_id, _ in sent) == [2, 2, 2, 3]
+    assert limiter.acquired == [2, 2]
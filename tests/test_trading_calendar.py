@@ -0,0 +1,62 @@
+import datetime
+
+import pytest
+
+from services.price import TinkoffPriceService
+from services.trading_calendar import TradingCalendar
+
+MSK = datetime.timezone(datetime.timedelta(hours=3))
+# 2026-10-19 is a Monday.
+MONDAY = datetime.date(2026, 10, 19)
+SATURDAY = datetime.date(2026, 10, 24)
+
+
+def at(
+    day: datetime.date, hour: int, minute: int = 0, tz: datetime.tzinfo = datetime.timezone.utc
+) -> datetime.datetime:
+    return datetime.datetime.combine(day, datetime.time(hour, minute), tzinfo=tz)
+
+
+@pytest.fixture
+def calendar() -> TradingCalendar:
+    return TradingCalendar.from_price_service(
+        TinkoffPriceService,
+        holidays={MONDAY + datetime.timedelta(days=1)},
+        extra_trading_days={SATURDAY},
+    )
+
+
+@pytest.mark.parametrize(
+    ("dt", "is_open"),
+    [
+        (at(MONDAY, 6, 59), False),
+        (at(MONDAY, 7), True),
+        (at(MONDAY, 16), True),
+        (at(MONDAY, 16, 1), False),
+        # 12:00 in Moscow is 09:00 UTC.
+        (at(MONDAY, 12, tz=MSK), True),
+        # 01:00 on Tuesday in Moscow is still Monday 22:00 UTC.
+        (at(MONDAY + datetime.timedelta(days=1), 1, tz=MSK), False),
+        (at(MONDAY + datetime.timedelta(days=1), 12), False),
+        (at(SATURDAY, 12), True),
+        (at(SATURDAY + datetime.timedelta(days=1), 12), False),
+    ],
+)
+def test_is_open(calendar: TradingCalendar, dt: datetime.datetime, is_open: bool) -> None:
+    assert calendar.is_open(dt) is is_open
+
+
+def test_holidays_and_extra_days_override_weekdays(calendar: TradingCalendar) -> None:
+    week = [MONDAY + datetime.timedelta(days=i) for i in range(7)]
+
+    assert [calendar.is_trading_day(day) for day in week] == [True, False, True, True, True, True, False]
+
+
+def test_any_session_opens_the_market() -> None:
+    calendar = TradingCalendar(
+        sessions=[(datetime.time(7), datetime.time(15, 40)), (datetime.time(16, 5), datetime.time(20, 50))],
+        weekdays={0, 1, 2, 3, 4},
+    )
+
+    assert calendar.is_open(at(MONDAY, 18))
+    assert not calendar.is_open(at(MONDAY, 15, 50))
@@ -0,0 +1,25 @@
+from services.watched_instruments import WatchedInstruments
+
+
+def test_finish_tick_keeps_only_what_the_tick_polled(redis_client) -> None:
+    watched = WatchedInstruments(redis_client)
+    watched.set_polled({1, 2, 3})
+
+    watched.add_tick_polled("tick", [3, 4])
+    watched.add_tick_polled("tick", [5])
+    watched.add_tick_polled("other", [6])
+    assert watched.get_polled() == {1, 2, 3}
+    watched.finish_tick("tick")
+
+    assert watched.get_polled() == {3, 4, 5}
+    assert not redis_client.exists("watched:tick_polled:tick")
+
+
+def test_finish_tick_without_polled_shards_clears_the_polled_set(redis_client) -> None:
+    watched = WatchedInstruments(redis_client)
+    watched.set_polled({1, 2})
+
+    watched.finish_tick("tick")
+
+    assert watched.get_polled() == set()
+    assert watched.watch(1) is False
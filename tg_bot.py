@@ -33,6 +33,7 @@ from worker import (
     handle_my_cmd,
     handle_price_cmd,
     handle_step_cmd,
+    repo_cache,
 )
 
 
@@ -45,6 +46,8 @@ class BotConfig(BaseSettings):
     BROKER_URL: str
     WEBAPP_PAGE_URL: str
     LOGGING_LEVEL: str = "INFO"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
 
     IS_SEND_PARSING_ERROR_MESSAGES_TO_BOT_OWNER: bool
 
@@ -87,7 +90,11 @@ async def get_parsing_error_callbacks(config: BotConfig) -> List[Callable[..., C
 @contextmanager
 def get_db_session():
     global cfg
-    session = session_factory(cfg.SQLALCHEMY_DATABASE_URI)()
+    session = session_factory(
+        cfg.SQLALCHEMY_DATABASE_URI,
+        pool_size=cfg.DB_POOL_SIZE,
+        max_overflow=cfg.DB_MAX_OVERFLOW,
+    )()
     try:
         yield session
     except Exception as e:
@@ -116,7 +123,7 @@ def msg_context(msg_type: MessageTypeEnum = MessageTypeEnum.TEXT):
         async def wrapper(message: types.Message) -> None:
             text = message.web_app_data.data if msg_type == MessageTypeEnum.WEB_APP_DATA else message.text
             with get_db_session() as session:
-                svc = DefaultUserService(user_repo=UserAlchemyRepo(session))
+                svc = DefaultUserService(user_repo=UserAlchemyRepo(session, cache=repo_cache))
                 user = svc.get_user_by_chat_id(message.from_user.id)
             await func(ctx=MessageContext(user=user, message=message, text=text))
 
@@ -128,7 +135,10 @@ def msg_context(msg_type: MessageTypeEnum = MessageTypeEnum.TEXT):
 async def process_start_command(message: types.Message) -> None:
     msg_builder = EnLocaleMessageBuilder()
     with get_db_session() as db_session:
-        svc = TelegramBotRegistrationService(uow=AlchemyUoW(db_session), user_repo=UserAlchemyRepo(db_session))
+        svc = TelegramBotRegistrationService(
+            uow=AlchemyUoW(db_session, cache=repo_cache),
+            user_repo=UserAlchemyRepo(db_session, cache=repo_cache),
+        )
         try:
             svc.register_user(
                 chat_id=message.from_user.id,
@@ -1,6 +1,28 @@
+import logging
+
+import redis
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from fastapi.templating import Jinja2Templates
+from pydantic_settings import BaseSettings
+
+from services.metrics import CONTENT_TYPE, RedisMetrics
+
+logger = logging.getLogger(__name__)
+
+
+class WebConfig(BaseSettings):
+    REDIS_HOST: str
+    REDIS_PORT: int
+    REDIS_PASSWORD: str
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"
+
+
+cfg = WebConfig()
+metrics = RedisMetrics(redis.Redis(host=cfg.REDIS_HOST, port=cfg.REDIS_PORT, db=0, password=cfg.REDIS_PASSWORD))
 
 app = FastAPI()
 
@@ -10,3 +32,13 @@ templates = Jinja2Templates(directory="templates")
 @app.get("/subscription", response_class=HTMLResponse)
 async def get_subscription_form(request: Request):
     return templates.TemplateResponse("subscription_form.html", {"request": request})
+
+
+@app.get("/metrics")
+def get_metrics() -> Response:
+    try:
+        content = metrics.render()
+    except redis.RedisError as e:
+        logger.warning(f"Metrics render failed: {e!r}")
+        return Response(content="Metrics are unavailable\n", status_code=503, media_type=CONTENT_TYPE)
+    return Response(content=content, media_type=CONTENT_TYPE)
@@ -1,20 +1,27 @@
 import datetime
 import logging
 import time
-from functools import wraps
-from typing import Callable, Type
+from collections import defaultdict
+from typing import Any, Callable, Type
+from urllib.parse import quote
 
 import celery
 import redis
 from celery import Celery
+from celery.signals import worker_init
 from pydantic_settings import BaseSettings
 from sqlalchemy.orm import Session
 
+from enums import CandleResolutionEnum, PriceSourceEnum
 from models.domain.instument import Instrument
 from models.domain.user import User
+from repo.cache import RepositoryCache
 from repo.instrument import InstrumentAlchemyRepo
 from repo.instrument_price import InstrumentPriceAlchemyRepo
+from repo.instrument_price_history import InstrumentPriceHistoryAlchemyRepo
+from repo.notification_outbox import NotificationOutboxAlchemyRepo
 from repo.subscription import SubscriptionAlchemyRepo
+from repo.subscription_change_outbox import SubscriptionChangeOutboxAlchemyRepo
 from repo.user import UserRepo, UserAlchemyRepo
 from services.commands.dto import (
     CommandAddData,
@@ -31,20 +38,42 @@ from services.commands.handler.delete_all import DefaultDeleteAllCommandHandler
 from services.commands.handler.my import DefaultMyCommandHandler
 from services.commands.handler.price import DefaultPriceCommandHandler
 from services.commands.handler.step import DefaultStepCommandHandler
-from services.database import session_factory
+from services.database import pool_stats, session_factory
+from services.digest import RedisAlertDigestBuffer
 from services.instrument import DefaultInstrumentService
-from services.instrument_finder import TinkoffInstrumentFinderService
+from services.instrument_finder import (
+    CachedInstrumentFinderService,
+    TinkoffInstrumentFinderService,
+    precision_from_increment,
+)
+from services.lock import RedisLock
 from services.message import get_locale_msg_builder
-from services.price import TinkoffPriceService
+from services.metrics import TICK_STAGE_SECONDS, RedisMetrics, start_metrics_server
+from services.outbox import OutboxRelay, SubscriptionChangesRelay
+from services.price import InstrumentPriceResult, PriceService, TinkoffPriceService
+from services.price_cache import CachedPrice, RedisHotPriceCache
+from services.price_changes import RedisPriceChangeFilter
 from services.price_updater import PriceUpdaterServiceImpl
-from services.subscriptions import DefaultSubscriptionsService
-from services.telegram import Telegram
+from services.rate_limit import RedisTokenBucketRateLimiter
+from services.sharding import partition
+from services.subscription_changes import (
+    OutboxSubscriptionChangesPublisher,
+    RedisSubscriptionChangesPublisher,
+    SubscriptionChangesPublisher,
+)
+from services.subscription_index import SubscriptionIndex, SubscriptionIndexSync
+from services.subscriptions import DefaultSubscriptionsService, SubscriptionMessage
+from services.telegram import AsyncTelegram, Telegram, TelegramMessage
+from services.trading_calendar import TradingCalendar
 from services.uow import AlchemyUoW
+from services.watched_instruments import WatchedInstruments
 from log import setup_logging
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
+TASK_TIME_LIMIT = 45
+
 
 class CeleryConfig(BaseSettings):
     SQLALCHEMY_DATABASE_URI: str
@@ -55,6 +84,42 @@ class CeleryConfig(BaseSettings):
     REDIS_PORT: int
     REDIS_PASSWORD: str
     MESSAGES_INTERVAL: float = 0.5
+    MESSAGES_BURST: float = 3
+    SUBSCRIPTION_INDEX_FULL_RELOAD_INTERVAL: float = 3600
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    TELEGRAM_BATCH_SIZE: int = 100
+    TELEGRAM_MAX_CONCURRENCY: int = 20
+    TELEGRAM_GLOBAL_RATE: float = 30
+    SEND_MESSAGE_MAX_RETRIES: int = 20
+    DIGEST_WINDOW_SECONDS: float = 0
+    DIGEST_FLUSH_INTERVAL: float = 5
+    PRICE_SOURCE: PriceSourceEnum = PriceSourceEnum.POLLING
+    TINKOFF_PRICES_CHUNK_SIZE: int = 300
+    TINKOFF_PRICES_MAX_WORKERS: int = 4
+    TINKOFF_PRICES_TIMEOUT: float = 10
+    # Leaves a shard the rest of TASK_TIME_LIMIT to store the prices and build the alerts.
+    TINKOFF_PRICES_DEADLINE: float = 30
+    PRICE_HISTORY_ENABLED: bool = True
+    PRICE_HISTORY_RETENTION_DAYS: int = 30
+    PRICE_HISTORY_PARTITIONS_AHEAD: int = 7
+    PRICE_CANDLES_ROLLUP_INTERVAL: float = 60
+    WATCHED_PRICE_REQUEST_TTL: float = 3600
+    METRICS_PORT: int | None = None
+    PRICE_TICK_INTERVAL: float = 15
+    TRADING_HOLIDAYS: set[datetime.date] = set()
+    TRADING_EXTRA_DAYS: set[datetime.date] = set()
+    PRICE_TICK_SHARDS: int = 4
+    OUTBOX_BATCH_SIZE: int = 1000
+    MAX_SUBSCRIPTIONS_PER_USER: int = 2000
+    OUTBOX_RELAY_INTERVAL: float = 5
+    OUTBOX_RETENTION_HOURS: float = 24
+    REPO_CACHE_TTL: float = 30
+    REPO_CACHE_MAXSIZE: int = 10_000
+    REPO_CACHE_REDIS_TTL: int = 3600
+    INSTRUMENT_FINDER_HIT_TTL: int = 86400
+    INSTRUMENT_FINDER_MISS_TTL: int = 600
+    INSTRUMENT_FINDER_CACHE_SIZE: int = 50_000
 
     class Config:
         env_file = ".env"
@@ -62,109 +127,472 @@ class CeleryConfig(BaseSettings):
 
 
 cfg = CeleryConfig()
+db_session = session_factory(
+    cfg.SQLALCHEMY_DATABASE_URI,
+    pool_size=cfg.DB_POOL_SIZE,
+    max_overflow=cfg.DB_MAX_OVERFLOW,
+)
 redis_client = redis.Redis(host=cfg.REDIS_HOST, port=cfg.REDIS_PORT, db=0, password=cfg.REDIS_PASSWORD)
+tinkoff_price_svc = TinkoffPriceService(
+    cfg.TINKOFF_TOKEN,
+    chunk_size=cfg.TINKOFF_PRICES_CHUNK_SIZE,
+    max_workers=cfg.TINKOFF_PRICES_MAX_WORKERS,
+    timeout=cfg.TINKOFF_PRICES_TIMEOUT,
+    deadline=cfg.TINKOFF_PRICES_DEADLINE,
+)
+price_change_filter = RedisPriceChangeFilter(redis_client)
+hot_price_cache = RedisHotPriceCache(redis_client)
+metrics = RedisMetrics(redis_client)
+repo_cache = RepositoryCache(
+    ttl=cfg.REPO_CACHE_TTL,
+    maxsize=cfg.REPO_CACHE_MAXSIZE,
+    redis_client=redis_client,
+    redis_ttl=cfg.REPO_CACHE_REDIS_TTL,
+    metrics=metrics,
+)
+price_sources: list[tuple[PriceService, TradingCalendar]] = [
+    (
+        tinkoff_price_svc,
+        TradingCalendar.from_price_service(
+            tinkoff_price_svc,
+            holidays=cfg.TRADING_HOLIDAYS,
+            extra_trading_days=cfg.TRADING_EXTRA_DAYS,
+        ),
+    ),
+]
+instrument_finder = CachedInstrumentFinderService(
+    TinkoffInstrumentFinderService(token=cfg.TINKOFF_TOKEN),
+    redis_client,
+    hit_ttl=cfg.INSTRUMENT_FINDER_HIT_TTL,
+    miss_ttl=cfg.INSTRUMENT_FINDER_MISS_TTL,
+    max_entries=cfg.INSTRUMENT_FINDER_CACHE_SIZE,
+    metrics=metrics,
+)
+# A tick holds the lock from dispatch until finish_price_tick or abort_price_tick. The timeout covers the whole chord
+# even when its tasks run one after another, and every shard restarts it, so it only expires if the chord is lost.
+price_tick_lock = RedisLock(
+    redis_client,
+    key="lock:run_all_tickers_together",
+    timeout=TASK_TIME_LIMIT * (cfg.PRICE_TICK_SHARDS * len(price_sources) + 2),
+)
+watched_instruments = WatchedInstruments(redis_client, price_request_ttl=cfg.WATCHED_PRICE_REQUEST_TTL)
+subscription_index_sync = SubscriptionIndexSync(
+    index=SubscriptionIndex(),
+    redis_client=redis_client,
+    full_reload_interval=cfg.SUBSCRIPTION_INDEX_FULL_RELOAD_INTERVAL,
+)
 
 
-def rate_limit_decorator(task: celery.Task) -> Callable:
-    @wraps(task)
-    def wrapper(*args, **kwargs):
-        chat_id = kwargs.get("chat_id")
-        if not chat_id:
-            chat_id = args[0]
-        key = f"last_sent:{chat_id}"
-
-        last_sent = redis_client.get(key)
-        while last_sent and time.time() - float(last_sent) < cfg.MESSAGES_INTERVAL:
-            logger.warning(f"Rate limit exceeded for chat_id {chat_id}")
-            time.sleep(cfg.MESSAGES_INTERVAL)
-            last_sent = redis_client.get(key)
-
-        redis_client.set(key, time.time())
-        result = task(*args, **kwargs)
-        redis_client.set(key, time.time())
-        return result
-
-    return wrapper
-
-
-app = Celery(__name__, broker=cfg.BROKER_URL)
+# The result backend only carries chord state and shard results; other tasks don't store results.
+app = Celery(
+    __name__,
+    broker=cfg.BROKER_URL,
+    backend=f"redis://:{quote(cfg.REDIS_PASSWORD)}@{cfg.REDIS_HOST}:{cfg.REDIS_PORT}/1",
+)
 
 app.conf.beat_schedule = {
-    "run_all_tickers_together": {
-        "task": "run_all_tickers_together",
-        "schedule": 15,
+    "flush_alert_digests": {
+        "task": "flush_alert_digests",
+        "schedule": cfg.DIGEST_FLUSH_INTERVAL,
+    },
+    "rollup_price_candles": {
+        "task": "rollup_price_candles",
+        "schedule": cfg.PRICE_CANDLES_ROLLUP_INTERVAL,
+    },
+    "maintain_price_history_partitions": {
+        "task": "maintain_price_history_partitions",
+        "schedule": 3600,
+    },
+    "relay_notification_outbox": {
+        "task": "relay_notification_outbox",
+        "schedule": cfg.OUTBOX_RELAY_INTERVAL,
+    },
+    "relay_subscription_change_outbox": {
+        "task": "relay_subscription_change_outbox",
+        "schedule": cfg.OUTBOX_RELAY_INTERVAL,
+    },
+    "purge_notification_outbox": {
+        "task": "purge_notification_outbox",
+        "schedule": 3600,
+    },
+    "backfill_instrument_price_increments": {
+        "task": "backfill_instrument_price_increments",
+        "schedule": 86400,
     },
 }
+if cfg.PRICE_SOURCE == PriceSourceEnum.POLLING:
+    app.conf.beat_schedule["run_all_tickers_together"] = {
+        "task": "run_all_tickers_together",
+        "schedule": cfg.PRICE_TICK_INTERVAL,
+        # A run still queued when the next one is due is dropped instead of stacking up behind it.
+        "options": {"expires": cfg.PRICE_TICK_INTERVAL},
+    }
 app.conf.update(
-    task_soft_time_limit=45,
-    task_time_limit=45,
+    task_soft_time_limit=TASK_TIME_LIMIT,
+    task_time_limit=TASK_TIME_LIMIT,
+    task_ignore_result=True,
+    result_expires=3600,
 )
 
+
+@worker_init.connect
+def start_worker_metrics_server(**kwargs) -> None:
+    if cfg.METRICS_PORT is not None:
+        start_metrics_server(metrics, port=cfg.METRICS_PORT)
+
+
 tg_client = Telegram(bot_token=cfg.BOT_TOKEN)
+rate_limiter = RedisTokenBucketRateLimiter(
+    redis_client=redis_client,
+    chat_rate=1 / cfg.MESSAGES_INTERVAL,
+    chat_capacity=cfg.MESSAGES_BURST,
+    global_rate=cfg.TELEGRAM_GLOBAL_RATE,
+    global_capacity=cfg.TELEGRAM_GLOBAL_RATE,
+)
+digest_buffer = RedisAlertDigestBuffer(
+    redis_client=redis_client,
+    window=cfg.DIGEST_WINDOW_SECONDS,
+    max_message_length=Telegram.MAX_MESSAGE_LENGTH,
+)
+tg_async_client = AsyncTelegram(
+    bot_token=cfg.BOT_TOKEN,
+    max_concurrency=cfg.TELEGRAM_MAX_CONCURRENCY,
+    chat_interval=cfg.MESSAGES_INTERVAL,
+    rate_limiter=rate_limiter,
+)
 loggger = logging.getLogger(__name__)
 
 
-@app.task(name="send_message_to_tg")
-@rate_limit_decorator
-def send_message_to_tg(chat_id: int, message: str) -> bool:
+@app.task(name="send_message_to_tg", bind=True, max_retries=cfg.SEND_MESSAGE_MAX_RETRIES)
+def send_message_to_tg(self: celery.Task, chat_id: int, message: str) -> bool:
+    wait = rate_limiter.acquire(chat_id)
+    if wait > 0:
+        logger.warning(f"Rate limit exceeded for chat_id {chat_id}, retry in {wait:.2f}s")
+        raise self.retry(countdown=wait)
     return tg_client.send_message(chat_id=chat_id, message=message)
 
 
+@app.task(name="send_messages_to_tg")
+def send_messages_to_tg(messages: list[dict], attempt: int = 0) -> list[bool]:
+    """
+    Send what the rate limiter allows right away; the rest of a throttled chat's messages
+    are rescheduled as one task instead of blocking the worker.
+    Tokens are taken per chat for as many messages as the buckets allow, so deferred messages cost nothing.
+    Messages still deferred after SEND_MESSAGE_MAX_RETRIES reschedules are dropped.
+    """
+    by_chat: dict[int, list[dict]] = defaultdict(list)
+    for msg in messages:
+        by_chat[msg["chat_id"]].append(msg)
+    grants = rate_limiter.acquire_many({chat_id: len(chat_messages) for chat_id, chat_messages in by_chat.items()})
+    allowed, deferred = [], []
+    throttled_chats, countdown = 0, 0.0
+    for chat_id, chat_messages in by_chat.items():
+        taken, wait = grants[chat_id]
+        allowed.extend(chat_messages[:taken])
+        if taken < len(chat_messages):
+            deferred.extend(chat_messages[taken:])
+            throttled_chats += 1
+            countdown = max(countdown, wait)
+    if deferred and attempt >= cfg.SEND_MESSAGE_MAX_RETRIES:
+        logger.error(
+            f"Rate limit exceeded for {throttled_chats} chats after {attempt} retries, dropped {len(deferred)} messages"
+        )
+    elif deferred:
+        logger.warning(f"Rate limit exceeded for {throttled_chats} chats, retry in {countdown:.2f}s")
+        send_messages_to_tg.apply_async(kwargs=dict(messages=deferred, attempt=attempt + 1), countdown=countdown)
+    return tg_async_client.send_messages_sync([TelegramMessage.model_validate(msg) for msg in allowed])
+
+
+def chunk_messages_by_chat(messages: list[SubscriptionMessage], size: int) -> list[list[SubscriptionMessage]]:
+    """Pack messages into chunks of about size, never splitting one chat across chunks."""
+    by_chat: dict[int, list[SubscriptionMessage]] = defaultdict(list)
+    for msg in messages:
+        by_chat[msg.user_chat_id].append(msg)
+    chunks: list[list[SubscriptionMessage]] = [[]]
+    for chat_messages in by_chat.values():
+        if chunks[-1] and len(chunks[-1]) + len(chat_messages) > size:
+            chunks.append([])
+        chunks[-1].extend(chat_messages)
+    return [chunk for chunk in chunks if chunk]
+
+
+def enqueue_messages(messages: list[SubscriptionMessage]) -> None:
+    """Publish one send_messages_to_tg task per chunk, all through a single producer from the pool."""
+    chunks = chunk_messages_by_chat(messages, size=cfg.TELEGRAM_BATCH_SIZE)
+    if not chunks:
+        return
+    with app.producer_or_acquire() as producer:
+        for chunk in chunks:
+            send_messages_to_tg.apply_async(
+                kwargs=dict(
+                    messages=[{"chat_id": msg.user_chat_id, "message": msg.message} for msg in chunk],
+                ),
+                producer=producer,
+            )
+    logger.debug(f"Enqueued {len(messages)} messages in {len(chunks)} tasks.")
+
+
+@app.task(name="flush_alert_digests")
+def flush_alert_digests() -> None:
+    with digest_buffer.pop_due() as messages:
+        if messages:
+            logger.info("Flushing alert digests", extra={"count": len(messages)})
+            enqueue_messages(messages)
+
+
+def relay_outbox(session: Session) -> None:
+    """Move committed alerts from the outbox to the digest buffer and send the digests that are due."""
+    OutboxRelay(
+        uow=AlchemyUoW(session),
+        outbox_repo=NotificationOutboxAlchemyRepo(session),
+        digest_buffer=digest_buffer,
+        batch_size=cfg.OUTBOX_BATCH_SIZE,
+    ).relay()
+    with digest_buffer.pop_due() as messages:
+        enqueue_messages(messages)
+
+
+@app.task(name="relay_notification_outbox")
+def relay_notification_outbox() -> None:
+    # Picks up alerts whose tick died after committing them; ticks relay their own alerts inline.
+    with db_session() as session:
+        relay_outbox(session)
+
+
+def relay_subscription_changes(session: Session) -> None:
+    """Publish committed subscription changes from their outbox to the changes stream."""
+    SubscriptionChangesRelay(
+        uow=AlchemyUoW(session),
+        outbox_repo=SubscriptionChangeOutboxAlchemyRepo(session),
+        publisher=RedisSubscriptionChangesPublisher(redis_client),
+        batch_size=cfg.OUTBOX_BATCH_SIZE,
+    ).relay()
+
+
+@app.task(name="relay_subscription_change_outbox")
+def relay_subscription_change_outbox() -> None:
+    # Picks up changes whose task died after committing them; the writers relay their own changes inline.
+    with db_session() as session:
+        relay_subscription_changes(session)
+
+
+@app.task(name="purge_notification_outbox")
+def purge_notification_outbox() -> None:
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    delivered_before = now - datetime.timedelta(hours=cfg.OUTBOX_RETENTION_HOURS)
+    with db_session() as session:
+        deleted = NotificationOutboxAlchemyRepo(session).delete_delivered_before(delivered_before)
+        session.commit()
+    logger.info("Purged delivered outbox messages", extra={"count": deleted})
+
+
+# Loads every instruments catalog, which takes longer than TASK_TIME_LIMIT when the API is slow.
+@app.task(name="backfill_instrument_price_increments", soft_time_limit=300, time_limit=300)
+def backfill_instrument_price_increments() -> None:
+    # Instruments created before min price increments were stored got their precision from candles.
+    with db_session() as session:
+        uow = AlchemyUoW(session, cache=repo_cache)
+        instrument_repo = InstrumentAlchemyRepo(session)
+        missing = [instrument for instrument in instrument_repo.find_by() if instrument.min_price_increment is None]
+        if not missing:
+            return
+        increments = instrument_finder.find_min_price_increments(instrument.figi for instrument in missing)
+        updated = [instrument for instrument in missing if instrument.figi in increments]
+        instrument_repo.update_min_price_increments(
+            [
+                (instrument.identity, increment, precision_from_increment(increment))
+                for instrument in updated
+                for increment in [increments[instrument.figi]]
+            ]
+        )
+        # Invalidates the instrument table in repo_cache; finder answers carry the old precision too.
+        uow.commit()
+        instrument_finder.invalidate(instrument.ticker for instrument in updated)
+    logger.info("Instrument price increments backfilled", extra={"count": len(increments), "missing": len(missing)})
+
+
+@app.task(name="rollup_price_candles")
+def rollup_price_candles() -> None:
+    # Buckets of the previous run are recomputed too, so ticks committed after it are not lost.
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    lookback = datetime.timedelta(seconds=cfg.PRICE_CANDLES_ROLLUP_INTERVAL * 2)
+    with db_session() as session:
+        history_repo = InstrumentPriceHistoryAlchemyRepo(session)
+        history_repo.rollup(CandleResolutionEnum.MINUTE, since=(now - lookback).replace(second=0, microsecond=0))
+        history_repo.rollup(
+            CandleResolutionEnum.HOUR,
+            since=(now - lookback).replace(minute=0, second=0, microsecond=0),
+        )
+        session.commit()
+
+
+@app.task(name="maintain_price_history_partitions")
+def maintain_price_history_partitions() -> None:
+    today = datetime.datetime.now(tz=datetime.timezone.utc).date()
+    with db_session() as session:
+        history_repo = InstrumentPriceHistoryAlchemyRepo(session)
+        history_repo.create_partitions(start=today, days=cfg.PRICE_HISTORY_PARTITIONS_AHEAD)
+        dropped = history_repo.drop_partitions_before(
+            today - datetime.timedelta(days=cfg.PRICE_HISTORY_RETENTION_DAYS)
+        )
+        session.commit()
+    logger.info("Price history partitions maintained", extra={"dropped": dropped})
+
+
+def process_prices(
+    session: Session,
+    prices_data: list[InstrumentPriceResult],
+    stale_ids: set[int] | None = None,
+) -> None:
+    """
+    Store new prices, match them against subscriptions and send the resulting alerts.
+    stale_ids are instruments whose stored price is too old to compare against; they don't trigger alerts.
+    """
+    with metrics.timer(TICK_STAGE_SECONDS, {"stage": "change_filter"}):
+        prices_data = price_change_filter.filter_changed(prices_data)
+    if not prices_data:
+        with metrics.timer(TICK_STAGE_SECONDS, {"stage": "enqueue"}):
+            relay_outbox(session)
+        return
+    uow = AlchemyUoW(session)
+    price_updater_svc = PriceUpdaterServiceImpl(
+        uow=uow,
+        instrument_prices_repo=InstrumentPriceAlchemyRepo(session),
+        price_history_repo=InstrumentPriceHistoryAlchemyRepo(session) if cfg.PRICE_HISTORY_ENABLED else None,
+    )
+    with metrics.timer(TICK_STAGE_SECONDS, {"stage": "price_upsert"}):
+        prices = price_updater_svc.update_prices(prices_data)
+    if stale_ids:
+        prices = [
+            row.model_copy(update={"old_price": None}) if row.instrument.identity in stale_ids else row
+            for row in prices
+        ]
+    subscription_repo = SubscriptionAlchemyRepo(session)
+    subscriptions_svc = DefaultSubscriptionsService(
+        uow=uow,
+        subscription_repo=subscription_repo,
+        user_repo=UserAlchemyRepo(session),
+        join_messages=False,
+        changes_publisher=get_subscription_changes_publisher(session),
+        subscription_index=subscription_index_sync.refresh(subscription_repo),
+        metrics=metrics,
+        outbox_repo=NotificationOutboxAlchemyRepo(session),
+    )
+    messages = subscriptions_svc.get_messages_and_update(prices=prices)
+    price_change_filter.remember(prices_data)
+    updated_at = datetime.datetime.now(tz=datetime.timezone.utc)
+    hot_price_cache.set_many(
+        [
+            CachedPrice(
+                instrument_id=row.instrument.identity,
+                ticker=row.instrument.ticker,
+                price=row.new_price,
+                precision=row.instrument.precision,
+                updated_at=updated_at,
+            )
+            for row in prices_data
+        ]
+    )
+    logger.info("The messages were built successfully", extra={"count": len(messages)})
+    metrics.inc("price_tick_messages_total", len(messages))
+    with metrics.timer(TICK_STAGE_SECONDS, {"stage": "enqueue"}):
+        relay_outbox(session)
+    relay_subscription_changes(session)
+
+
 @app.task(name="run_all_tickers_together")
 def run_all_tickers_together():
-    with session_factory(cfg.SQLALCHEMY_DATABASE_URI)() as session:
-        instrument_repo = InstrumentAlchemyRepo(session)
-        instruments: list[Instrument] = instrument_repo.find_by()
-        uow = AlchemyUoW(session)
-        prices_services = [
-            TinkoffPriceService(cfg.TINKOFF_TOKEN),
+    """
+    Split the watched instruments into PRICE_TICK_SHARDS shards by consistent hash and process
+    them in parallel shard tasks; finish_price_tick runs once all of them are done.
+    """
+    started_at = time.time()
+    current_dt = datetime.datetime.now(tz=datetime.timezone.utc)
+    sources = [i for i, (_, calendar) in enumerate(price_sources) if calendar.is_open(current_dt)]
+    if not sources:
+        logger.info("Skip tick: all markets are closed")
+        return
+    lock_token = price_tick_lock.acquire()
+    if lock_token is None:
+        logger.warning("Skip tick: the previous one is still running")
+        metrics.inc("price_tick_skipped_total", labels={"reason": "overlap"})
+        return
+    try:
+        with metrics.timer(TICK_STAGE_SECONDS, {"stage": "instrument_load"}), db_session() as session:
+            index = subscription_index_sync.refresh(SubscriptionAlchemyRepo(session))
+            instruments: list[Instrument] = watched_instruments.get(index, InstrumentAlchemyRepo(session))
+        instrument_ids = {instrument.identity for instrument in instruments}
+        stale_ids = instrument_ids - watched_instruments.get_polled()
+        shards = [shard for shard in partition(instrument_ids, cfg.PRICE_TICK_SHARDS) if shard]
+        if not shards:
+            price_tick_lock.release(lock_token)
+            return
+        header = [
+            process_price_shard.s(source, shard, [id_ for id_ in shard if id_ in stale_ids], lock_token=lock_token)
+            for source in sources
+            for shard in shards
         ]
-        current_dt = datetime.datetime.now(tz=datetime.timezone.utc)
-        for svc in prices_services:
-            if not svc.from_utc_time() <= current_dt.time() <= svc.to_utc_time():
-                logger.info(f"Skip service {type(svc).__name__}: working hours")
-                continue
-            if current_dt.weekday() not in svc.weekdays():
-                logger.info(f"Skip service {type(svc).__name__}: weekday")
-                continue
-
-            logger.info("Get instrument prices")
+        callback = finish_price_tick.s(lock_token=lock_token, started_at=started_at)
+        callback.link_error(abort_price_tick.s(lock_token=lock_token))
+        celery.chord(header)(callback)
+        logger.info("Price tick dispatched", extra={"shards": len(header), "instruments": len(instrument_ids)})
+    except Exception:
+        price_tick_lock.release(lock_token)
+        raise
+
+
+@app.task(name="process_price_shard", ignore_result=False)
+def process_price_shard(source: int, instrument_ids: list[int], stale_ids: list[int], lock_token: str) -> list[int]:
+    if not price_tick_lock.extend(lock_token):
+        logger.warning("The price tick lock expired before the shard started")
+    svc, _ = price_sources[source]
+    with db_session() as session:
+        instruments = watched_instruments.get_by_ids(instrument_ids, InstrumentAlchemyRepo(session))
+        logger.info("Get instrument prices", extra={"count": len(instruments)})
+        with metrics.timer(TICK_STAGE_SECONDS, {"stage": "price_fetch"}):
             prices_data = svc.get_prices(instruments=instruments)
+        metrics.inc("price_tick_polled_instruments_total", len(prices_data))
+        process_prices(session, prices_data, stale_ids=set(stale_ids))
+    watched_instruments.add_tick_polled(lock_token, instrument_ids)
+    logger.info("Database pool stats", extra={"pools": pool_stats()})
+    return instrument_ids
 
-            price_updater_svc = PriceUpdaterServiceImpl(
-                uow=uow,
-                instrument_prices_repo=InstrumentPriceAlchemyRepo(session),
-            )
-            prices = price_updater_svc.update_prices(prices_data)
-            subscriptions_svc = DefaultSubscriptionsService(
-                uow=uow,
-                subscription_repo=SubscriptionAlchemyRepo(session),
-                user_repo=UserAlchemyRepo(session),
-                join_messages=False,
-            )
-            messages = subscriptions_svc.get_messages_and_update(prices=prices)
-            logger.info("The messages were built successfully", extra={"count": len(messages)})
-            for msg in messages:
-                send_message_to_tg.apply_async(
-                    kwargs=dict(
-                        chat_id=msg.user_chat_id,
-                        message=msg.message,
-                    )
-                )
+
+@app.task(name="finish_price_tick")
+def finish_price_tick(shard_results: list[list[int]], lock_token: str, started_at: float) -> None:
+    watched_instruments.finish_tick(lock_token)
+    price_tick_lock.release(lock_token)
+    metrics.observe("price_tick_seconds", time.time() - started_at)
+
+
+@app.task(name="abort_price_tick")
+def abort_price_tick(request: Any, exc: Exception, traceback: Any, lock_token: str) -> None:
+    """Errback of the tick chord: keep what the successful shards polled and let the next tick start"""
+    logger.error(f"Price tick failed: {exc!r}")
+    metrics.inc("price_tick_failed_total")
+    watched_instruments.finish_tick(lock_token)
+    price_tick_lock.release(lock_token)
+
+
+def get_subscription_changes_publisher(session: Session) -> SubscriptionChangesPublisher:
+    return OutboxSubscriptionChangesPublisher(SubscriptionChangeOutboxAlchemyRepo(session))
 
 
 def get_price_cmd_handler(session: Session) -> DefaultPriceCommandHandler:
     return DefaultPriceCommandHandler(
-        instrument_repo=InstrumentAlchemyRepo(session),
+        instrument_repo=InstrumentAlchemyRepo(session, cache=repo_cache),
         instrument_price_repo=InstrumentPriceAlchemyRepo(session),
+        price_cache=hot_price_cache,
+        watched_instruments=watched_instruments,
+        price_service=tinkoff_price_svc,
     )
 
 
 def get_instrument_svc(session: Session) -> DefaultInstrumentService:
     return DefaultInstrumentService(
-        finders=[TinkoffInstrumentFinderService(token=cfg.TINKOFF_TOKEN)],
-        uow=AlchemyUoW(session),
-        instrument_repo=InstrumentAlchemyRepo(session),
+        finders=[instrument_finder],
+        uow=AlchemyUoW(session, cache=repo_cache),
+        instrument_repo=InstrumentAlchemyRepo(session, cache=repo_cache),
     )
 
 
@@ -173,6 +601,8 @@ def get_add_cmd_handler(session: Session) -> DefaultAddCommandHandler:
         instrument_svc=get_instrument_svc(session),
         uow=AlchemyUoW(session),
         subscription_repo=SubscriptionAlchemyRepo(session),
+        changes_publisher=get_subscription_changes_publisher(session),
+        max_subscriptions=cfg.MAX_SUBSCRIPTIONS_PER_USER,
     )
 
 
@@ -181,6 +611,7 @@ def get_delete_cmd_handler(session: Session) -> DefaultDeleteCommandHandler:
         instrument_svc=get_instrument_svc(session),
         uow=AlchemyUoW(session),
         subscription_repo=SubscriptionAlchemyRepo(session),
+        changes_publisher=get_subscription_changes_publisher(session),
     )
 
 
@@ -189,6 +620,8 @@ def get_step_cmd_handler(session: Session) -> DefaultStepCommandHandler:
         instrument_svc=get_instrument_svc(session),
         uow=AlchemyUoW(session),
         subscription_repo=SubscriptionAlchemyRepo(session),
+        changes_publisher=get_subscription_changes_publisher(session),
+        max_subscriptions=cfg.MAX_SUBSCRIPTIONS_PER_USER,
     )
 
 
@@ -196,6 +629,7 @@ def get_delete_all_cmd_handler(session: Session) -> DefaultDeleteAllCommandHandl
     return DefaultDeleteAllCommandHandler(
         uow=AlchemyUoW(session),
         subscription_repo=SubscriptionAlchemyRepo(session),
+        changes_publisher=get_subscription_changes_publisher(session),
     )
 
 
@@ -206,7 +640,7 @@ def get_my_cmd_handler(session: Session) -> DefaultMyCommandHandler:
 
 
 def get_user_repo(session: Session) -> UserRepo:
-    return UserAlchemyRepo(session)
+    return UserAlchemyRepo(session, cache=repo_cache)
 
 
 def handle_cmd(
@@ -217,9 +651,10 @@ def handle_cmd(
     command_model: Type[TickerCommandData],
     **kwargs,
 ) -> None:
-    with session_factory(cfg.SQLALCHEMY_DATABASE_URI)() as session:
+    with db_session() as session:
         svc = get_cmd_handler(session)
         result = svc.handle(user_id, command_model.model_validate(kwargs))
+        relay_subscription_changes(session)
         user: User = get_user_repo(session).get_by_id(user_id)
         response = get_locale_msg_builder(user.locale).add_cmd_msg(result)
         tg_client.send_message(chat_id=chat_id, reply_to_msg_id=message_id, message=response)
@@ -232,14 +667,21 @@ def handle_add_cmd(user_id: int, chat_id: int, message_id: int, **kwargs):
 
 @app.task(name="handle_step_cmd")
 def handle_step_cmd(user_id: int, chat_id: int, message_id: int, **kwargs):
-    handle_cmd(get_step_cmd_handler, user_id, chat_id, message_id, CommandStepData, **kwargs)
+    with db_session() as session:
+        svc = get_step_cmd_handler(session)
+        result = svc.handle(user_id, CommandStepData.model_validate(kwargs))
+        relay_subscription_changes(session)
+        user: User = get_user_repo(session).get_by_id(user_id)
+        response = get_locale_msg_builder(user.locale).step_cmd_msg(result)
+        tg_client.send_message(chat_id=chat_id, reply_to_msg_id=message_id, message=response)
 
 
 @app.task(name="handle_delete_cmd")
 def handle_delete_cmd(user_id: int, chat_id: int, message_id: int, **kwargs):
-    with session_factory(cfg.SQLALCHEMY_DATABASE_URI)() as session:
+    with db_session() as session:
         svc = get_delete_cmd_handler(session)
         result = svc.handle(user_id, CommandDeleteData.model_validate(kwargs))
+        relay_subscription_changes(session)
         user: User = get_user_repo(session).get_by_id(user_id)
         return tg_client.send_message(
             chat_id=chat_id,
@@ -250,7 +692,7 @@ def handle_delete_cmd(user_id: int, chat_id: int, message_id: int, **kwargs):
 
 @app.task(name="handle_price_cmd")
 def handle_price_cmd(user_id: int, chat_id: int, message_id: int, **kwargs):
-    with session_factory(cfg.SQLALCHEMY_DATABASE_URI)() as session:
+    with db_session() as session:
         svc = get_price_cmd_handler(session)
         user: User = get_user_repo(session).get_by_id(user_id)
         msg_builder = get_locale_msg_builder(user.locale)
@@ -262,6 +704,7 @@ def handle_price_cmd(user_id: int, chat_id: int, message_id: int, **kwargs):
                 reply_to_msg_id=message_id,
                 message=msg_builder.instrument_not_found_error_msg(),
             )
+            return
         tg_client.send_message(
             chat_id=chat_id,
             reply_to_msg_id=message_id,
@@ -271,9 +714,10 @@ def handle_price_cmd(user_id: int, chat_id: int, message_id: int, **kwargs):
 
 @app.task(name="handle_delete_all_cmd")
 def handle_delete_all_cmd(user_id: int, chat_id: int, message_id: int, **kwargs) -> None:
-    with session_factory(cfg.SQLALCHEMY_DATABASE_URI)() as session:
+    with db_session() as session:
         svc = get_delete_all_cmd_handler(session)
         result = svc.handle(user_id, CommandDeleteAllData.model_validate(kwargs))
+        relay_subscription_changes(session)
         user: User = get_user_repo(session).get_by_id(user_id)
         tg_client.send_message(
             chat_id=chat_id,
@@ -284,7 +728,7 @@ def handle_delete_all_cmd(user_id: int, chat_id: int, message_id: int, **kwargs)
 
 @app.task(name="handle_my_cmd")
 def handle_my_cmd(user_id: int, chat_id: int, message_id: int, **kwargs) -> None:
-    with session_factory(cfg.SQLALCHEMY_DATABASE_URI)() as session:
+    with db_session() as session:
         svc = get_my_cmd_handler(session)
         result = svc.handle(user_id, CommandMyData.model_validate(kwargs))
         user: User = get_user_repo(session).get_by_id(user_id)